@@ -4,7 +4,7 @@ import os
 from fastapi import APIRouter, HTTPException, Depends, Response, Request
 from fastapi.responses import RedirectResponse, HTMLResponse
 from server.database import get_db
-from auth.utils import hash_password, verify_password, generate_token, get_current_user
+from auth.utils import hash_password, verify_password, generate_token, get_current_user, invalidate_user_session
 from auth.schemas import RegisterRequest, LoginRequest, AuthResponse
 from users.schemas import UserResponse
 from auth.oauth_config import oauth
@@ -93,6 +93,7 @@ def login(body: LoginRequest, response: Response):
     db.execute("UPDATE users SET auth_token = ? WHERE id = ?", (token, row["id"]))
     db.commit()
     db.close()
+    invalidate_user_session(row["id"])
 
     # Set HttpOnly cookie
     is_production = os.environ.get("ENVIRONMENT") == "production"
@@ -116,6 +117,7 @@ def logout(response: Response, current_user: dict = Depends(get_current_user)):
     db.execute("UPDATE users SET auth_token = NULL WHERE id = ?", (current_user["id"],))
     db.commit()
     db.close()
+    invalidate_user_session(current_user["id"])
     
     # Clear the session cookie
     response.delete_cookie(key="session_token", httponly=True, samesite="lax", path="/")
@@ -204,6 +206,7 @@ async def google_callback(request: Request, response: Response):
         
     finally:
         db.close()
+    invalidate_user_session(user_id)
     
     # Set HttpOnly cookie
     is_production = os.environ.get("ENVIRONMENT") == "production"
@@ -3,9 +3,12 @@
 import hashlib
 import secrets
 import hmac
+import threading
+import time
+from collections import OrderedDict
 from fastapi import HTTPException, Request, Response
 from server.database import get_db
-from server.config import SESSION_SECRET_KEY
+from server.config import SESSION_SECRET_KEY, AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_MAX_ENTRIES
 
 def get_csrf_token(request: Request) -> str:
     """Return the CSRF token from cookies, or generate a new one if missing."""
@@ -45,12 +48,78 @@ def generate_token() -> str:
     return secrets.token_urlsafe(48)
 
 
+# ─── Session cache ───────────────────────────────────────────
+
+class _SessionCache:
+    """Thread-safe TTL + LRU map of session token → user row."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> dict | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, user: dict):
+        with self._lock:
+            self._entries[token] = (time.monotonic() + self.ttl_seconds, user)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_token(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            stale = [t for t, (_, u) in self._entries.items() if u["id"] == user_id]
+            for t in stale:
+                del self._entries[t]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_session_cache = _SessionCache(AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS)
+
+
+def invalidate_user_session(user_id: int):
+    """Drop every cached session for a user.  Call after writing to their users row."""
+    _session_cache.invalidate_user(user_id)
+
+
+def get_session_cache_stats() -> dict:
+    return _session_cache.stats()
+
+
 def get_current_user(request: Request):
     """FastAPI dependency: extract and validate auth token from cookie."""
     session_token = request.cookies.get("session_token")
     if not session_token:
         raise HTTPException(status_code=401, detail="Please log in to continue.")
 
+    cached = _session_cache.get(session_token)
+    if cached is not None:
+        # Callers mutate current_user (e.g. ExamBrain sets current_local_time),
+        # so never hand out the cached dict itself.
+        return dict(cached)
+
     db = get_db()
     try:
         user = db.execute(
@@ -61,4 +130,6 @@ def get_current_user(request: Request):
 
     if not user:
         raise HTTPException(status_code=401, detail="Your session has expired. Please log in again.")
+    user = dict(user)
+    _session_cache.put(session_token, user)
     return dict(user)
@@ -0,0 +1,261 @@
+"""Context packer — fits exam material into the Auditor's token budget.
+
+Instead of concatenating every uploaded file and cutting at a character limit,
+each file is:
+  1. cleaned of boilerplate (running headers/footers, slide and page numbers,
+     looked for only at the top and bottom of each page),
+  2. split into paragraph-aligned chunks,
+  3. ranked by how many still-uncovered syllabus topic terms a chunk adds
+     (greedy coverage, rarer terms weigh more),
+  4. packed until the token budget is used, then put back in document order.
+
+Syllabus files go first: they are both the source of the topic terms and the
+material the Auditor maps topics from. Pure functions, no DB access.
+"""
+
+import heapq
+import json
+import math
+import re
+from collections import Counter
+
+# Rough chars-per-token for mixed Hebrew/English course material
+# (Hebrew tokenizes noticeably denser than English's ~4).
+CHARS_PER_TOKEN = 3
+CHUNK_CHARS = 1500
+
+# Extracted text keeps its pages apart with this separator (see brain/routes.py
+# and exams/routes.py), so headers and footers can be told from body text.
+PAGE_BREAK = "\f"
+
+# A short line at the edge of this many pages of one file is a header/footer.
+BOILERPLATE_MIN_REPEATS = 3
+BOILERPLATE_MAX_LINE_CHARS = 80
+# Non-empty lines at the top and at the bottom of a page that count as its edge.
+BOILERPLATE_EDGE_LINES = 3
+
+OMITTED_MARKER = "[…]"
+# Worst-case cost of the separator and omission marker in front of a chunk.
+_JOIN_TOKENS = math.ceil(len(f"\n\n{OMITTED_MARKER}\n\n") / CHARS_PER_TOKEN)
+
+_PAGE_NUMBER_RE = re.compile(
+    r"^\s*(?:(?:page|slide|עמוד|שקף)\s*)?\d+(?:\s*(?:/|of|מתוך)\s*\d+)?\s*$", re.IGNORECASE
+)
+_WORD_RE = re.compile(r"\w{3,}")
+# Page references at the start or end of a header/footer line ("... page 12",
+# "4 / 30", "12 | ...", "... — 7"), blanked before comparing lines so every
+# page's footer matches. Numbers anywhere else are compared as they are.
+_PAGE_REF_RE = re.compile(
+    r"(?:[|·•—–-]\s*|(?:page|slide|p\.|עמוד|שקף)\s*)\d+(?:\s*(?:/|of|מתוך)\s*\d+)?\s*$"
+    r"|\d+\s*(?:/|of|מתוך)\s*\d+\s*$"
+    r"|^\s*(?:(?:page|slide|p\.|עמוד|שקף)\s*)?\d+(?:\s*(?:/|of|מתוך)\s*\d+)?\s*[|·•—–-]",
+    re.IGNORECASE,
+)
+
+_STOPWORDS = frozenset(
+    "the and for with that this from are was were have has not but you your all any can will "
+    "into about which their there these those what when where who how also use using used "
+    "של את על עם זה זו גם כל לא או אם כי אשר היא הוא הם הן יש אין בין כמו רק".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _terms(text: str) -> set[str]:
+    return {w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS and not w.isdigit()}
+
+
+def _edge_key(line: str) -> str:
+    return _PAGE_REF_RE.sub("#", line.strip().lower())
+
+
+def strip_boilerplate(text: str) -> str:
+    """Drop running headers/footers and page/slide-number lines.
+
+    Lines are peeled off the top and bottom of each page (at most
+    BOILERPLATE_EDGE_LINES non-empty lines per edge), stopping at the first
+    line that is neither a page-number line nor a short line found at the edge
+    of at least BOILERPLATE_MIN_REPEATS pages (page references ignored, so
+    "Lecture 3 — page 12" matches every page's footer). Body text is never
+    dropped, however often it repeats: numbered exercises and "Solution:"
+    lines are exactly what the Auditor ranks. Text without PAGE_BREAKs is one
+    page."""
+    pages = [page.splitlines() for page in text.split(PAGE_BREAK)]
+    tops, bottoms = [], []
+    for lines in pages:
+        filled = [i for i, line in enumerate(lines) if line.strip()]
+        tops.append(filled[:BOILERPLATE_EDGE_LINES])
+        bottoms.append(filled[:-BOILERPLATE_EDGE_LINES - 1:-1])
+
+    counts = Counter()
+    for lines, top, bottom in zip(pages, tops, bottoms):
+        counts.update({
+            _edge_key(lines[i]) for i in top + bottom if len(lines[i].strip()) <= BOILERPLATE_MAX_LINE_CHARS
+        })
+
+    def boilerplate(line: str) -> bool:
+        return bool(_PAGE_NUMBER_RE.match(line)) or (
+            len(line.strip()) <= BOILERPLATE_MAX_LINE_CHARS
+            and counts[_edge_key(line)] >= BOILERPLATE_MIN_REPEATS
+        )
+
+    kept = []
+    for lines, top, bottom in zip(pages, tops, bottoms):
+        # Peel from each edge inwards, stopping at the first line that stays.
+        dropped = set()
+        for edge in (top, bottom):
+            for i in edge:
+                if not boilerplate(lines[i]):
+                    break
+                dropped.add(i)
+        kept += [line for i, line in enumerate(lines) if i not in dropped]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip()
+
+
+def chunk_text(text: str, chunk_chars: int = CHUNK_CHARS) -> list[str]:
+    """Split on paragraph breaks and merge paragraphs up to ~chunk_chars.
+    Paragraphs longer than that are cut on line boundaries (or hard-cut as a last resort)."""
+    pieces = []
+    for para in re.split(r"\n\s*\n", text):
+        para = para.strip()
+        while len(para) > chunk_chars:
+            cut = para.rfind("\n", 0, chunk_chars)
+            if cut <= 0:
+                cut = chunk_chars
+            pieces.append(para[:cut].strip())
+            para = para[cut:].strip()
+        if para:
+            pieces.append(para)
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > chunk_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def topic_terms(parsed_context: str | None, files: list[dict]) -> set[str]:
+    """Topic vocabulary: the syllabus digest (parsed_context topics/objectives)
+    plus the text of every uploaded syllabus file."""
+    sources = []
+    if parsed_context:
+        try:
+            digest = json.loads(parsed_context)
+            sources += [str(t) for t in digest.get("topics", []) + digest.get("objectives", [])]
+        except (ValueError, TypeError, AttributeError):
+            sources.append(parsed_context)
+    sources += [f["extracted_text"] for f in files if f["file_type"] == "syllabus" and f["extracted_text"]]
+    terms = set()
+    for s in sources:
+        terms |= _terms(s)
+    return terms
+
+
+def _select(chunks: list[dict], topics: set[str], budget: int) -> list[dict]:
+    """Lazy greedy max-coverage: repeatedly take the chunk adding the most
+    uncovered topic weight that still fits; ties (and everything after full
+    coverage) go to chunks denser in topic terms, then earlier in their file."""
+    df = Counter(t for c in chunks for t in c["terms"] & topics)
+    weight = {t: math.log(1 + len(chunks) / n) for t, n in df.items()}
+
+    def gain(c, covered):
+        return sum(weight[t] for t in (c["terms"] & topics) - covered)
+
+    heap = [(-gain(c, set()), -c["density"], c["position"], i) for i, c in enumerate(chunks)]
+    heapq.heapify(heap)
+    covered, selected, used = set(), [], 0
+    while heap:
+        neg_gain, neg_density, position, i = heapq.heappop(heap)
+        c = chunks[i]
+        if c["tokens"] > budget - used:
+            continue
+        current = gain(c, covered)
+        if current < -neg_gain and heap and (-current, neg_density, position) > heap[0][:3]:
+            heapq.heappush(heap, (-current, neg_density, position, i))
+            continue
+        selected.append(c)
+        used += c["tokens"]
+        covered |= c["terms"] & topics
+    return selected
+
+
+def _section_header(f: dict) -> str:
+    return f"[{f['file_type'].upper()}: {f['filename']}]\n"
+
+
+def pack_files(files: list[dict], topics: set[str], token_budget: int) -> str:
+    """Pack exam files (dicts with file_type, filename, extracted_text) into at most
+    token_budget estimated tokens, formatted as "[TYPE: filename]" sections.
+    Section headers, separators and omission markers count against the budget."""
+    files = sorted(
+        (f for f in files if f["extracted_text"]),
+        key=lambda f: f["file_type"] != "syllabus",
+    )
+    token_budget -= sum(estimate_tokens(_section_header(f)) + _JOIN_TOKENS for f in files)
+    chunks, syllabus_chunks = [], []
+    for file_idx, f in enumerate(files):
+        file_chunks = chunk_text(strip_boilerplate(f["extracted_text"]))
+        for pos, text in enumerate(file_chunks):
+            terms = _terms(text)
+            c = {
+                "file": file_idx,
+                "order": pos,
+                "position": pos / len(file_chunks),
+                "text": text,
+                "terms": terms,
+                "tokens": estimate_tokens(text) + _JOIN_TOKENS,
+                "density": len(terms & topics) / max(1, len(terms)),
+            }
+            (syllabus_chunks if f["file_type"] == "syllabus" else chunks).append(c)
+
+    if sum(c["tokens"] for c in syllabus_chunks + chunks) <= token_budget:
+        # Everything fits; still drop the boilerplate.
+        selected = syllabus_chunks + chunks
+    else:
+        # Syllabus first, in order, capped at half the budget so course material still fits.
+        selected, used = [], 0
+        for c in syllabus_chunks:
+            if used + c["tokens"] > token_budget // 2:
+                chunks.append(c)
+                continue
+            selected.append(c)
+            used += c["tokens"]
+        selected += _select(chunks, topics, token_budget - used)
+
+    by_file = {}
+    for c in selected:
+        by_file.setdefault(c["file"], []).append(c)
+
+    sections = []
+    for file_idx, f in enumerate(files):
+        picked = sorted(by_file.get(file_idx, []), key=lambda c: c["order"])
+        if not picked:
+            continue
+        body, last = [], -1
+        for c in picked:
+            if c["order"] != last + 1:
+                body.append(OMITTED_MARKER)
+            body.append(c["text"])
+            last = c["order"]
+        sections.append(_section_header(f) + "\n\n".join(body))
+    return "\n\n".join(sections)
+
+
+def split_budget(sizes: list[int], token_budget: int) -> list[int]:
+    """Share a token budget between exams: small ones get what they need,
+    the rest is split evenly among the larger ones."""
+    budgets = [0] * len(sizes)
+    remaining = token_budget
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for n, i in enumerate(order):
+        share = remaining // (len(sizes) - n)
+        budgets[i] = min(sizes[i], share)
+        remaining -= budgets[i]
+    return budgets
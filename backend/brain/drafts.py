@@ -0,0 +1,114 @@
+"""Auditor drafts — the reviewed-but-not-yet-approved roadmap, one per user.
+
+auditor_drafts holds the header (version, gaps, topic_map) and
+auditor_draft_tasks one row per task, keyed by (draft_id, task_index). A new
+Auditor run replaces the draft; edits from the review screen go through
+patch_draft(), which touches only the rows that changed. Every write bumps
+`version`, and a patch made against an older version is rejected, so two
+tabs editing the same draft can't silently overwrite each other.
+
+All functions take the caller's connection and leave committing to it.
+"""
+
+import json
+
+from server.compression import pack_json, unpack_json
+
+
+class DraftConflict(Exception):
+    """The draft changed since the version the client edited."""
+
+
+def _task_rows(draft_id: int, tasks: list) -> list[tuple]:
+    rows = []
+    for pos, task in enumerate(tasks):
+        task_index = task.get("task_index", pos)
+        rows.append((draft_id, int(task_index), task.get("exam_id"), json.dumps(task, ensure_ascii=False)))
+    return rows
+
+
+def save_draft(db, user_id: int, draft: dict) -> int:
+    """Replace the user's draft with a fresh Auditor result; returns the new version."""
+    row = db.execute("SELECT id, version FROM auditor_drafts WHERE user_id = ?", (user_id,)).fetchone()
+    gaps, topic_map = pack_json(draft.get("gaps", [])), pack_json(draft.get("topic_map", {}))
+    if row:
+        draft_id, version = row["id"], row["version"] + 1
+        db.execute(
+            """UPDATE auditor_drafts SET version = ?, gaps = ?, topic_map = ?, updated_at = datetime('now')
+               WHERE id = ?""",
+            (version, gaps, topic_map, draft_id),
+        )
+        db.execute("DELETE FROM auditor_draft_tasks WHERE draft_id = ?", (draft_id,))
+    else:
+        version = 1
+        draft_id = db.execute(
+            "INSERT INTO auditor_drafts (user_id, version, gaps, topic_map) VALUES (?, ?, ?, ?)",
+            (user_id, version, gaps, topic_map),
+        ).lastrowid
+    db.executemany(
+        "INSERT OR REPLACE INTO auditor_draft_tasks (draft_id, task_index, exam_id, data) VALUES (?, ?, ?, ?)",
+        _task_rows(draft_id, draft.get("tasks", [])),
+    )
+    return version
+
+
+def load_draft(db, user_id: int) -> dict | None:
+    """{"tasks", "gaps", "topic_map", "version"}, or None when the user has no draft.
+    Tasks of exams that were deleted or are no longer upcoming are left out."""
+    row = db.execute(
+        "SELECT id, version, gaps, topic_map FROM auditor_drafts WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    if not row:
+        return None
+    tasks = [
+        json.loads(t["data"]) for t in db.execute(
+            """SELECT data FROM auditor_draft_tasks
+               WHERE draft_id = ?
+                 AND (exam_id IS NULL OR exam_id IN (
+                      SELECT id FROM exams WHERE user_id = ? AND status = 'upcoming'))
+               ORDER BY task_index""",
+            (row["id"], user_id),
+        ).fetchall()
+    ]
+    return {
+        "tasks": tasks,
+        "gaps": unpack_json(row["gaps"]) or [],
+        "topic_map": unpack_json(row["topic_map"]) or {},
+        "version": row["version"],
+    }
+
+
+def patch_draft(db, user_id: int, version: int | None, tasks: list = (), removed: list = ()) -> int | None:
+    """Upsert `tasks` (matched on task_index) and delete the `removed` task indices.
+
+    Returns the new version, or None when the user has no draft. Raises
+    DraftConflict if `version` is given and the draft has moved on since.
+    """
+    row = db.execute("SELECT id, version FROM auditor_drafts WHERE user_id = ?", (user_id,)).fetchone()
+    if not row:
+        return None
+    draft_id = row["id"]
+    expected = row["version"] if version is None else version
+    bumped = db.execute(
+        "UPDATE auditor_drafts SET version = version + 1, updated_at = datetime('now') WHERE id = ? AND version = ?",
+        (draft_id, expected),
+    ).rowcount
+    if not bumped:
+        raise DraftConflict()
+
+    if tasks:
+        db.executemany(
+            """INSERT INTO auditor_draft_tasks (draft_id, task_index, exam_id, data) VALUES (?, ?, ?, ?)
+               ON CONFLICT (draft_id, task_index) DO UPDATE SET exam_id = excluded.exam_id, data = excluded.data""",
+            _task_rows(draft_id, tasks),
+        )
+    if removed:
+        db.executemany(
+            "DELETE FROM auditor_draft_tasks WHERE draft_id = ? AND task_index = ?",
+            [(draft_id, int(i)) for i in removed],
+        )
+    return expected + 1
+
+
+def delete_draft(db, user_id: int) -> None:
+    db.execute("DELETE FROM auditor_drafts WHERE user_id = ?", (user_id,))
@@ -1,52 +1,25 @@
 """ExamBrain — AI core that builds day-by-day study calendars."""
 from __future__ import annotations
 import asyncio
+import hashlib
 import json
+import logging
 import os
-import random
 import time
 from datetime import datetime, timedelta, timezone
-import litellm
-import fitz  # PyMuPDF
 
-async def retry_acompletion(model, messages, **kwargs):
-    """Wrapper for litellm.acompletion with exponential backoff retry logic."""
-    max_retries = 3
-    base_delay = 2 # seconds
+from brain import llm
+from brain.json_stream import ArrayItemStream
+from brain.strategist import assign_days
+from brain.context_packer import estimate_tokens, pack_files, split_budget, topic_terms
 
-    for attempt in range(max_retries):
-        try:
-            return await litellm.acompletion(model=model, messages=messages, **kwargs)
-        except Exception as e:
-            # Handle rate limits (429) or overloaded servers (503/529)
-            error_str = str(e).lower()
-            is_retryable = any(msg in error_str for msg in ["429", "rate limit", "overloaded", "503", "529", "timeout"])
-
-            if attempt < max_retries - 1 and is_retryable:
-                # Calculate delay with jitter: base_delay * 2^attempt + jitter
-                delay = (base_delay * (2 ** attempt)) + (random.uniform(0, 1))
-                await asyncio.sleep(delay)
-            else:
-                raise e
+logger = logging.getLogger(__name__)
 
-CHAR_LIMIT = 700_000
+# Bump whenever the Auditor prompt or the result post-processing changes,
+# so results cached under the old prompt are no longer served.
+AUDITOR_PROMPT_VERSION = 1
 
 class ExamBrain:
-    @staticmethod
-    def extract_pdf_text(file_path: str, max_pages: int | None = None) -> str:
-        """Extract text from a PDF file using PyMuPDF (fitz)."""
-        try:
-            doc = fitz.open(file_path)
-            text = ""
-            for i, page in enumerate(doc):
-                if max_pages is not None and i >= max_pages:
-                    break
-                text += page.get_text() + "\n"
-            doc.close()
-            return text.strip()
-        except Exception as e:
-            return ""
-
     def __init__(self, user: dict, exams: list[dict]):
         self.user = user
         self.exams = exams
@@ -56,63 +29,69 @@ class ExamBrain:
     # Auditor helpers (Plan 02)
     # ------------------------------------------------------------------
 
+    @staticmethod
+    def _exam_header(exam: dict) -> str:
+        return (
+            f"\n### EXAM: {exam['name']} ({exam['subject']}) "
+            f"— Date: {exam['exam_date']} — Exam ID: {exam['id']}\n"
+        )
+
+    @staticmethod
+    def _with_text(row, texts: dict) -> dict:
+        """exam_files row (file_type, filename, text_hash) -> file dict with its extracted_text."""
+        return {"file_type": row["file_type"], "filename": row["filename"], "extracted_text": texts.get(row["text_hash"])}
+
+    @staticmethod
+    def _exam_material(exam: dict, files: list, token_budget: int) -> str:
+        """Exam files packed into token_budget (see brain/context_packer.py).
+        Falls back to parsed_context for legacy exams with no uploaded files."""
+        from server.compression import unpack_text
+
+        files = [f for f in files if f["extracted_text"]]
+        parsed_context = unpack_text(exam["parsed_context"])
+        if files:
+            return pack_files(files, topic_terms(parsed_context, files), token_budget)
+        if parsed_context:
+            return f"[LEGACY CONTEXT]\n{parsed_context}"
+        return ""
+
     def _build_all_exam_context(self) -> str:
-        """Concatenate all exams + all their extracted_text into a single string.
+        """Build the material section for all exams, one block per exam.
 
-        Iterates through self.exams, fetches associated exam_files from the DB,
-        and concatenates their extracted_text with clear headers.
-        Falls back to parsed_context for legacy exams with no uploaded files.
-        Enforces a hard CHAR_LIMIT with truncation.
+        Fetches every exam's exam_files in one query, shares the
+        AUDITOR_CONTEXT_TOKENS budget between the exams (small exams keep
+        everything, large ones split the rest) and packs each exam's files
+        into its share.
         """
         from server.database import get_db
+        from server.config import AUDITOR_CONTEXT_TOKENS
+        from brain.text_store import get_texts
 
+        if not self.exams:
+            return ""
         db = get_db()
-        parts = []
-        total_chars = 0
-
         try:
-            for exam in self.exams:
-                exam_header = (
-                    f"\n### EXAM: {exam['name']} ({exam['subject']}) "
-                    f"— Date: {exam['exam_date']} — Exam ID: {exam['id']}\n"
-                )
-
-                files = db.execute(
-                    "SELECT file_type, filename, extracted_text FROM exam_files WHERE exam_id = ?",
-                    (exam["id"],),
-                ).fetchall()
-
-                file_texts = []
-                for f in files:
-                    if f["extracted_text"]:
-                        file_texts.append(
-                            f"[{f['file_type'].upper()}: {f['filename']}]\n{f['extracted_text']}"
-                        )
-
-                # Fallback: use old parsed_context (topics/intensity/objectives)
-                if not file_texts and exam["parsed_context"]:
-                    file_texts.append(
-                        f"[LEGACY CONTEXT]\n{exam['parsed_context']}"
-                    )
-
-                exam_block = exam_header + "\n\n".join(file_texts)
-
-                # Truncate if adding this exam would exceed the character limit
-                if total_chars + len(exam_block) > CHAR_LIMIT:
-                    remaining = CHAR_LIMIT - total_chars
-                    if remaining <= 0:
-                        break
-                    exam_block = exam_block[:remaining] + "\n[TRUNCATED — file too large]"
-
-                parts.append(exam_block)
-                total_chars += len(exam_block)
-
-                if total_chars >= CHAR_LIMIT:
-                    break
+            placeholders = ",".join("?" * len(self.exams))
+            rows = db.execute(
+                f"SELECT exam_id, file_type, filename, text_hash FROM exam_files WHERE exam_id IN ({placeholders})",
+                [exam["id"] for exam in self.exams],
+            ).fetchall()
+            texts = get_texts(db, (r["text_hash"] for r in rows))
         finally:
             db.close()
-
-        return "\n\n".join(parts)
+        files_by_exam = {}
+        for r in rows:
+            files_by_exam.setdefault(r["exam_id"], []).append(self._with_text(r, texts))
+
+        sizes = [
+            sum(estimate_tokens(f["extracted_text"] or "") for f in files_by_exam.get(exam["id"], []))
+            for exam in self.exams
+        ]
+        budgets = split_budget(sizes, AUDITOR_CONTEXT_TOKENS)
+        return "\n\n".join(
+            self._exam_header(exam) + self._exam_material(exam, files_by_exam.get(exam["id"], []), budget)
+            for exam, budget in zip(self.exams, budgets)
+        )
 
     def _calculate_total_hours(self) -> float:
         """Sum up days_until * neto_study_hours for all exams to get global budget."""
@@ -211,36 +190,22 @@ RETURN ONLY VALID JSON — NO TEXT BEFORE OR AFTER:
     # ------------------------------------------------------------------
 
     def _build_exam_context_single(self, exam: dict) -> str:
-        """Build context string for a single exam only."""
+        """Build context string for a single exam only, packed to AUDITOR_CONTEXT_TOKENS."""
         from server.database import get_db
+        from server.config import AUDITOR_CONTEXT_TOKENS
+        from brain.text_store import get_texts
 
         db = get_db()
         try:
-            exam_header = (
-                f"\n### EXAM: {exam['name']} ({exam['subject']}) "
-                f"— Date: {exam['exam_date']} — Exam ID: {exam['id']}\n"
-            )
-            files = db.execute(
-                "SELECT file_type, filename, extracted_text FROM exam_files WHERE exam_id = ?",
+            rows = db.execute(
+                "SELECT file_type, filename, text_hash FROM exam_files WHERE exam_id = ?",
                 (exam["id"],),
             ).fetchall()
-
-            file_texts = []
-            for f in files:
-                if f["extracted_text"]:
-                    file_texts.append(
-                        f"[{f['file_type'].upper()}: {f['filename']}]\n{f['extracted_text']}"
-                    )
-
-            if not file_texts and exam["parsed_context"]:
-                file_texts.append(f"[LEGACY CONTEXT]\n{exam['parsed_context']}")
-
-            exam_block = exam_header + "\n\n".join(file_texts)
-            if len(exam_block) > CHAR_LIMIT:
-                exam_block = exam_block[:CHAR_LIMIT] + "\n[TRUNCATED — file too large]"
-            return exam_block
+            texts = get_texts(db, (r["text_hash"] for r in rows))
         finally:
             db.close()
+        files = [self._with_text(r, texts) for r in rows]
+        return self._exam_header(exam) + self._exam_material(exam, files, AUDITOR_CONTEXT_TOKENS)
 
     def _calculate_exam_hours(self, exam: dict) -> float:
         """Calculate the study hours budget for a single exam."""
@@ -327,8 +292,56 @@ RETURN ONLY VALID JSON — NO TEXT BEFORE OR AFTER:
   }}
 }}"""
 
-    async def _call_auditor_for_exam(self, exam: dict) -> dict:
-        """Run a single Auditor call for one exam. Returns validated tasks, gaps, topic_map."""
+    # ------------------------------------------------------------------
+    # Auditor result cache
+    # ------------------------------------------------------------------
+
+    def _auditor_fingerprint(self, prompt: str, user_message: str) -> str:
+        """Fingerprint of everything an Auditor result depends on.
+
+        The prompt already embeds the exam metadata, the packed file texts,
+        the hour budget (neto_study_hours × days until the exam) and the
+        peak window, so hashing it with the model and prompt version covers
+        every input.
+        """
+        raw = json.dumps([AUDITOR_PROMPT_VERSION, self.model, prompt, user_message], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _load_cached_audit(exam_id: int, fingerprint: str) -> dict | None:
+        from server.database import get_db
+
+        db = get_db()
+        try:
+            row = db.execute(
+                "SELECT result FROM auditor_cache WHERE exam_id = ? AND fingerprint = ?",
+                (exam_id, fingerprint),
+            ).fetchone()
+        finally:
+            db.close()
+        # Parsed fresh on every hit, so callers may mutate the result freely.
+        return json.loads(row["result"]) if row else None
+
+    @staticmethod
+    def _store_audit(exam_id: int, fingerprint: str, result: dict) -> None:
+        from server.database import get_db
+
+        db = get_db()
+        try:
+            db.execute(
+                """INSERT OR REPLACE INTO auditor_cache (exam_id, fingerprint, result, created_at)
+                   VALUES (?, ?, ?, datetime('now'))""",
+                (exam_id, fingerprint, json.dumps(result, ensure_ascii=False)),
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _auditor_request(self, exam: dict) -> tuple[list, str]:
+        """Messages for one exam's Auditor call, plus their cache fingerprint.
+
+        Reads and decompresses the exam's files and packs them, which takes
+        real CPU time for a large deck; async callers run it in a thread."""
         exam_context = self._build_exam_context_single(exam)
         exam_hours = self._calculate_exam_hours(exam)
         prompt = self._build_auditor_prompt_single(exam_context, exam_hours, exam)
@@ -336,17 +349,14 @@ RETURN ONLY VALID JSON — NO TEXT BEFORE OR AFTER:
         # Force Density Instruction added to User Message
         user_message = f"Generate the Knowledge Audit for Exam {exam['id']} ({exam['name']}). \n\nCRITICAL: You must generate a HIGH-DENSITY list of tasks. For this amount of syllabus material, I expect at least 40-60 granular sub-tasks to be generated to fill the {exam_hours} hour budget."
 
-        response = await retry_acompletion(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt + "\n\n" + user_message}],
-            max_tokens=8192,
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
-        raw_response = response.choices[0].message.content.strip()
+        messages = [{"role": "user", "content": prompt + "\n\n" + user_message}]
+        return messages, self._auditor_fingerprint(prompt, user_message)
 
+    @staticmethod
+    def _parse_auditor_response(raw_response: str, exam: dict) -> dict:
+        """Validate a raw Auditor response into tasks, gaps, topic_map (empty on unparsable JSON)."""
         # Robust JSON parsing
-        response_text = raw_response
+        response_text = raw_response.strip()
         if response_text.startswith("```"):
             response_text = response_text.split("\n", 1)[1] if "\n" in response_text else response_text[3:]
             response_text = response_text.rsplit("```", 1)[0]
@@ -396,18 +406,70 @@ RETURN ONLY VALID JSON — NO TEXT BEFORE OR AFTER:
             "topic_map": result.get("topic_map", {}),
         }
 
-    async def call_split_brain(self) -> dict:
-        """Auditor execution: one parallel API call per exam.
+    async def _call_auditor_for_exam(self, exam: dict) -> dict:
+        """Run a single Auditor call for one exam. Returns validated tasks, gaps, topic_map.
 
-        Runs N async Auditor calls concurrently (one per exam), merges results,
-        re-indexes task_index and dependency_id globally, then returns the
-        combined Auditor output for frontend review.
+        Results are cached per exam in auditor_cache; while the exam's material,
+        dates and the user's budget are unchanged the stored result is returned
+        without calling the LLM.
         """
-        exam_results = await asyncio.gather(*[
-            self._call_auditor_for_exam(exam) for exam in self.exams
-        ], return_exceptions=True)
+        messages, fingerprint = await asyncio.to_thread(self._auditor_request, exam)
+        cached = self._load_cached_audit(exam["id"], fingerprint)
+        if cached is not None:
+            return cached
 
-        # Merge all per-exam results with globally unique task_index + remapped dependency_id
+        response = await llm.acompletion(
+            model=self.model,
+            user_id=self.user.get("id"),
+            messages=messages,
+            max_tokens=8192,
+            temperature=0,
+            response_format={"type": "json_object"}
+        )
+        audit = self._parse_auditor_response(response.choices[0].message.content, exam)
+        if audit["tasks"]:  # an empty audit is most likely a bad response; retry next time
+            self._store_audit(exam["id"], fingerprint, audit)
+        return audit
+
+    async def _stream_auditor_for_exam(self, exam: dict):
+        """Streaming variant of _call_auditor_for_exam.
+
+        Yields ("task", raw_task) for every task object as soon as the model
+        has finished writing it, then ("result", audit) with the validated
+        result (same shape and caching as _call_auditor_for_exam).
+        """
+        messages, fingerprint = await asyncio.to_thread(self._auditor_request, exam)
+        cached = self._load_cached_audit(exam["id"], fingerprint)
+        if cached is not None:
+            for task in cached["tasks"]:
+                yield "task", task
+            yield "result", cached
+            return
+
+        items = ArrayItemStream("tasks")
+        parts = []
+        async for delta in llm.astream(
+            self.model,
+            messages,
+            user_id=self.user.get("id"),
+            max_tokens=8192,
+            temperature=0,
+            response_format={"type": "json_object"},
+        ):
+            parts.append(delta)
+            for task in items.feed(delta):
+                if isinstance(task, dict) and task.get("title"):
+                    yield "task", task
+
+        audit = self._parse_auditor_response("".join(parts), exam)
+        if audit["tasks"]:
+            self._store_audit(exam["id"], fingerprint, audit)
+        yield "result", audit
+
+    @staticmethod
+    def merge_audits(exam_results: list) -> dict:
+        """Merge per-exam Auditor results (in the given order) into one draft with
+        globally unique task_index and remapped dependency_id. Exceptions are skipped."""
         all_tasks = []
         all_gaps = []
         merged_topic_map = {}
@@ -429,19 +491,68 @@ RETURN ONLY VALID JSON — NO TEXT BEFORE OR AFTER:
         for i, task in enumerate(all_tasks):
             task["task_index"] = i
 
-        return {
-            "tasks": all_tasks,
-            "gaps": all_gaps,
-            "topic_map": merged_topic_map,
-            "raw_response": f"[{len(self.exams)} parallel Auditor calls]",
-        }
+        return {"tasks": all_tasks, "gaps": all_gaps, "topic_map": merged_topic_map}
+
+    async def call_split_brain(self) -> dict:
+        """Auditor execution: one parallel API call per exam.
+
+        Runs N async Auditor calls concurrently (one per exam), merges results,
+        re-indexes task_index and dependency_id globally, then returns the
+        combined Auditor output for frontend review.
+        """
+        exam_results = await asyncio.gather(*[
+            self._call_auditor_for_exam(exam) for exam in self.exams
+        ], return_exceptions=True)
+
+        merged = self.merge_audits(exam_results)
+        merged["raw_response"] = f"[{len(self.exams)} parallel Auditor calls]"
+        return merged
+
+    async def stream_split_brain(self):
+        """Streaming Auditor execution: the per-exam calls run concurrently and
+        their progress is yielded as events as it happens —
+
+          {"type": "task", "exam_id", "task"}     a task preview, as soon as the model wrote it
+          {"type": "exam", "exam_id", "tasks", "gaps", "topic_map"}
+                                                  one exam's validated result (exam-local indices)
+          {"type": "exam_error", "exam_id"}       that exam's call failed
+
+        Exams are reported in completion order, so the first result arrives
+        after the fastest exam instead of the slowest.
+        """
+        queue = asyncio.Queue()
+
+        async def _run(exam):
+            try:
+                async for kind, payload in self._stream_auditor_for_exam(exam):
+                    if kind == "task":
+                        await queue.put({"type": "task", "exam_id": exam["id"], "task": payload})
+                    else:
+                        await queue.put({"type": "exam", "exam_id": exam["id"], **payload})
+            except Exception:
+                await queue.put({"type": "exam_error", "exam_id": exam["id"]})
+
+        runners = [asyncio.create_task(_run(exam)) for exam in self.exams]
+        try:
+            finished = 0
+            while finished < len(runners):
+                event = await queue.get()
+                if event["type"] != "task":
+                    finished += 1
+                yield event
+        finally:
+            for runner in runners:
+                runner.cancel()
 
     # ------------------------------------------------------------------
     # Strategist helpers (Plan 03)
     # ------------------------------------------------------------------
 
-    def _build_strategist_prompt(self, approved_tasks: list, days_available: int) -> str:
-        """Build the system prompt for the Strategist (API Call 2)."""
+    def _build_strategist_prompt(self, approved_tasks: list, days_available: int, baseline: list | None = None) -> str:
+        """Build the system prompt for the Strategist (API Call 2).
+
+        `baseline` is the local planner's result, offered as a starting point.
+        """
         neto_h = float(self.user.get("neto_study_hours", 4.0))
         peak = self.user.get("peak_productivity", "Morning")
         buffer_days = int(self.user.get("buffer_days", 1))
@@ -476,6 +587,15 @@ RETURN ONLY VALID JSON — NO TEXT BEFORE OR AFTER:
                 continue
         exams_info_str = "\n".join(exams_info)
 
+        baseline_str = ""
+        if baseline:
+            plan = [[t.get("task_index", i), t["day_index"], t["internal_priority"]] for i, t in enumerate(baseline)]
+            baseline_str = (
+                "\nBASELINE PLAN ([task_index, day_index, priority]) — already respects buffer days, "
+                "dependencies and the daily quota. Keep it unless a change clearly serves the rules below:\n"
+                f"{json.dumps(plan)}\n"
+            )
+
         return f"""RETURN ONLY VALID JSON — NO TEXT BEFORE OR AFTER.
 
 You are a Strategic Schedule Architect.
@@ -493,7 +613,7 @@ EXAM DEADLINES (day_index):
 
 TASKS TO SCHEDULE (i=index, h=hours, f=focus, e=exam_id, d=dependency, t=topic):
 {task_list_json}
-
+{baseline_str}
 STRATEGIC RULES (CRITICAL):
 1. ANCHORING:
    - Topic "simulation": MUST be placed as late as possible, closest to the exam date (but before the buffer days).
@@ -512,12 +632,23 @@ RETURN FORMAT:
   ]
 }}"""
 
-    async def call_strategist(self, approved_tasks: list) -> list:
-        """Execute the Strategist API Call 2 of the Split-Brain architecture."""
-        from datetime import timezone
+    async def call_strategist(self, approved_tasks: list, mode: str | None = None) -> list:
+        """Execute the Strategist (Call 2 of the Split-Brain architecture).
+
+        mode "local" (the default, see STRATEGIST_MODE) assigns days with the
+        deterministic planner in brain/strategist.py — no LLM round-trip.
+        mode "llm" hands that plan to the model as a baseline to refine; tasks
+        the model drops or returns malformed keep their local assignment, and
+        if the call fails altogether the local plan is used as is.
+        """
+        from server.config import STRATEGIST_MODE
+
         tz_offset = self.user.get("timezone_offset", 0) or 0
         local_now = datetime.now(timezone.utc) - timedelta(minutes=tz_offset)
-        
+        baseline = assign_days(approved_tasks, self.exams, self.user, local_now)
+        if (mode or STRATEGIST_MODE) != "llm" or not approved_tasks:
+            return baseline
+
         days_available = 1
         for exam in self.exams:
             try:
@@ -530,25 +661,27 @@ RETURN FORMAT:
 
         self.user["current_local_time"] = local_now.strftime("%H:%M")
 
-        prompt = self._build_strategist_prompt(approved_tasks, days_available)
-        response = await retry_acompletion(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=8192,
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
-        raw_response = response.choices[0].message.content.strip()
-
+        prompt = self._build_strategist_prompt(approved_tasks, days_available, baseline)
         try:
-            data = json.loads(raw_response)
+            response = await llm.acompletion(
+                model=self.model,
+                user_id=self.user.get("id"),
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=8192,
+                temperature=0,
+                response_format={"type": "json_object"}
+            )
+            data = json.loads(response.choices[0].message.content.strip())
             assignments = data.get("schedule", [])
-        except json.JSONDecodeError as exc:
-            raise RuntimeError("Failed to process the study plan. Please try again.")
+        except Exception as exc:
+            logger.warning(f"Strategist LLM refinement failed, using the local plan: {exc}")
+            return baseline
 
-        result = []
-        seen_task_indices = set()
-        fallback_exam_id = self.exams[0]["id"] if self.exams else None
+        # The prompt identifies tasks by task_index, which differs from the list
+        # position once the user rejected some tasks.
+        pos_by_index = {}
+        for pos, t in enumerate(approved_tasks):
+            pos_by_index.setdefault(t.get("task_index", pos), pos)
 
         exam_deadlines = {}
         for e in self.exams:
@@ -559,54 +692,34 @@ RETURN FORMAT:
             except:
                 continue
 
-        for item in assignments:
+        result = list(baseline)
+        seen_positions = set()
+        for item in assignments if isinstance(assignments, list) else []:
             if not isinstance(item, list) or len(item) < 3:
                 continue
-            
-            task_index, day_index, internal_priority = item[0], item[1], item[2]
-            
+
             try:
-                day_index = int(day_index)
-                task_index = int(task_index)
-                internal_priority = int(internal_priority)
+                task_index = int(item[0])
+                day_index = int(item[1])
+                internal_priority = int(item[2])
             except (ValueError, TypeError):
                 continue
 
-            day_index = max(0, min(day_index, days_available - 1))
-            
-            current_exam_id = None
-            if task_index == -1:
-                # Padding handling (if any returned in this format)
-                continue 
-            elif 0 <= task_index < len(approved_tasks):
-                current_exam_id = approved_tasks[task_index].get("exam_id")
-            
-            if current_exam_id in exam_deadlines:
-                day_index = min(day_index, exam_deadlines[current_exam_id] - 1)
-                day_index = max(0, day_index)
-
-            internal_priority = max(1, min(100, internal_priority))
-
-            if task_index < 0 or task_index >= len(approved_tasks):
+            pos = pos_by_index.get(task_index)
+            if pos is None or pos in seen_positions:
                 continue
+            seen_positions.add(pos)
 
-            if task_index in seen_task_indices:
-                continue
-            seen_task_indices.add(task_index)
+            day_index = max(0, min(day_index, days_available - 1))
+            current_exam_id = approved_tasks[pos].get("exam_id")
+            if current_exam_id in exam_deadlines:
+                day_index = max(0, min(day_index, exam_deadlines[current_exam_id] - 1))
 
-            task = dict(approved_tasks[task_index])
+            task = dict(approved_tasks[pos])
             task["day_index"] = day_index
-            task["internal_priority"] = internal_priority
+            task["internal_priority"] = max(1, min(100, internal_priority))
             task["is_padding"] = False
-            result.append(task)
-
-        for idx, task in enumerate(approved_tasks):
-            if idx not in seen_task_indices:
-                fallback_task = dict(task)
-                fallback_task["day_index"] = 0
-                fallback_task["internal_priority"] = 10
-                fallback_task["is_padding"] = False
-                result.append(fallback_task)
+            result[pos] = task
 
         return result
 
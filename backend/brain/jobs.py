@@ -0,0 +1,284 @@
+"""Background jobs — Auditor and Strategist runs off the request path.
+
+A job is a row in the jobs table: the request that creates it returns
+immediately with the job id, and the client polls GET /brain/jobs/{id}.
+A few worker tasks started with the app claim queued rows and run the
+registered handler for the job's kind, so a slow LLM call holds neither a
+server worker nor a DB connection, and finishes even if the client went away.
+
+Claiming is an UPDATE ... WHERE status = 'queued', so several server
+processes can share the table. Jobs interrupted by a shutdown go back to
+the queue. While a job runs, its worker refreshes heartbeat_at; every
+worker process periodically re-queues jobs whose heartbeat is older than
+JOB_LEASE_SECONDS (their process died), up to MAX_ATTEMPTS runs. The attempt
+number is the lease: a worker that lost its job to such a re-queue can no
+longer heartbeat or finish it.
+
+Handlers are registered with @handler("kind") and receive (user, payload);
+they return a JSON-serialisable result. An HTTPException's detail becomes
+the job's error message; anything else is logged and reported generically.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+
+from server.config import JOB_LEASE_SECONDS, JOB_POLL_SECONDS, JOB_RETENTION_HOURS, JOB_WORKERS
+from server.database import get_db
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+HEARTBEAT_SECONDS = max(1.0, JOB_LEASE_SECONDS / 4)
+RECOVER_SECONDS = max(1.0, JOB_LEASE_SECONDS / 2)
+GENERIC_ERROR = "Something went wrong while building your study plan. Please try again."
+
+_handlers = {}
+_workers: list[asyncio.Task] = []
+_running: set[str] = set()  # ids of jobs this process is working on
+_wakeup: asyncio.Event | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+_last_recover = 0.0  # loop.time() of the last _recover() in this process
+
+
+def handler(kind: str):
+    """Register `async def fn(user: dict, payload: dict) -> result` for jobs of this kind."""
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+def _view(row) -> dict:
+    return {
+        "job_id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"],
+    }
+
+
+def enqueue(user_id: int, kind: str, payload: dict, idempotency_key: str | None = None) -> dict:
+    """Queue a job and return its status view.
+
+    With an idempotency_key, a repeated request (double-click, client retry)
+    gets the job created the first time instead of a new one.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job_id = uuid.uuid4().hex
+    db = get_db()
+    try:
+        db.execute(
+            """INSERT OR IGNORE INTO jobs (id, user_id, kind, idempotency_key, payload)
+               VALUES (?, ?, ?, ?, ?)""",
+            (job_id, user_id, kind, idempotency_key, json.dumps(payload, ensure_ascii=False)),
+        )
+        db.commit()
+        if idempotency_key is not None:
+            row = db.execute(
+                "SELECT * FROM jobs WHERE user_id = ? AND idempotency_key = ?", (user_id, idempotency_key)
+            ).fetchone()
+        else:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        db.close()
+
+    if _loop is not None and _wakeup is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
+    return _view(row)
+
+
+def get_job(job_id: str, user_id: int) -> dict | None:
+    db = get_db()
+    try:
+        row = db.execute("SELECT * FROM jobs WHERE id = ? AND user_id = ?", (job_id, user_id)).fetchone()
+    finally:
+        db.close()
+    return _view(row) if row else None
+
+
+def _claim():
+    """Atomically take the oldest queued job, or None."""
+    db = get_db()
+    try:
+        while True:
+            row = db.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at, rowid LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = db.execute(
+                """UPDATE jobs SET status = 'running', started_at = datetime('now'),
+                                  heartbeat_at = datetime('now'), attempts = attempts + 1
+                   WHERE id = ? AND status = 'queued'""",
+                (row["id"],),
+            ).rowcount
+            db.commit()
+            if claimed:
+                return db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            # Another worker got it first; try the next one.
+    finally:
+        db.close()
+
+
+def _finish(job, status: str, result=None, error: str | None = None):
+    db = get_db()
+    try:
+        finished = db.execute(
+            """UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = datetime('now')
+               WHERE id = ? AND status = 'running' AND attempts = ?""",
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error,
+             job["id"], job["attempts"]),
+        ).rowcount
+        db.commit()
+    finally:
+        db.close()
+    if not finished:
+        logger.warning(f"Job {job['id']} was re-queued while this worker ran it; result dropped")
+
+
+def _heartbeat(job) -> bool:
+    """Refresh the job's lease; False once it has been taken away."""
+    db = get_db()
+    try:
+        alive = db.execute(
+            "UPDATE jobs SET heartbeat_at = datetime('now') WHERE id = ? AND status = 'running' AND attempts = ?",
+            (job["id"], job["attempts"]),
+        ).rowcount
+        db.commit()
+    finally:
+        db.close()
+    return bool(alive)
+
+
+async def _keep_alive(job):
+    while True:
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        try:
+            if not _heartbeat(job):
+                return
+        except Exception as e:
+            logger.warning(f"Job {job['id']} heartbeat failed: {e}")
+
+
+def _load_user(user_id: int) -> dict | None:
+    db = get_db()
+    try:
+        row = db.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+    finally:
+        db.close()
+    return dict(row) if row else None
+
+
+async def _run(job):
+    user = _load_user(job["user_id"])
+    if user is None:
+        _finish(job, "failed", error="User not found.")
+        return
+    try:
+        result = await _handlers[job["kind"]](user, json.loads(job["payload"] or "{}"))
+    except asyncio.CancelledError:
+        raise  # shutting down: stop_workers() puts it back in the queue
+    except Exception as e:
+        detail = getattr(e, "detail", None)
+        if not isinstance(detail, str):
+            logger.exception(f"Job {job['id']} ({job['kind']}) failed")
+            detail = GENERIC_ERROR
+        _finish(job, "failed", error=detail)
+    else:
+        _finish(job, "done", result=result)
+
+
+async def _worker():
+    global _last_recover
+    while True:
+        if _loop.time() - _last_recover >= RECOVER_SECONDS:
+            _last_recover = _loop.time()
+            try:
+                _recover()
+            except Exception as e:
+                logger.warning(f"Job recovery failed: {e}")
+        try:
+            job = _claim()
+        except Exception as e:
+            logger.warning(f"Job claim failed: {e}")
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            continue
+        _running.add(job["id"])
+        keep_alive = asyncio.create_task(_keep_alive(job))
+        try:
+            await _run(job)
+        except Exception as e:
+            logger.warning(f"Job {job['id']} could not be finished: {e}")
+        finally:
+            keep_alive.cancel()
+        # Not reached on cancellation: the id stays in _running for stop_workers().
+        _running.discard(job["id"])
+
+
+def _recover():
+    """Re-queue jobs whose heartbeat stopped (their process died) and drop old finished ones."""
+    db = get_db()
+    try:
+        stale = f"-{JOB_LEASE_SECONDS} seconds"
+        db.execute(
+            """UPDATE jobs SET status = 'failed', error = ?, finished_at = datetime('now')
+               WHERE status = 'running' AND COALESCE(heartbeat_at, started_at) < datetime('now', ?)
+                 AND attempts >= ?""",
+            (GENERIC_ERROR, stale, MAX_ATTEMPTS),
+        )
+        requeued = db.execute(
+            """UPDATE jobs SET status = 'queued'
+               WHERE status = 'running' AND COALESCE(heartbeat_at, started_at) < datetime('now', ?)""",
+            (stale,),
+        ).rowcount
+        db.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < datetime('now', ?)",
+            (f"-{JOB_RETENTION_HOURS} hours",),
+        )
+        db.commit()
+    finally:
+        db.close()
+    if requeued:
+        logger.info(f"Re-queued {requeued} interrupted job(s)")
+
+
+def start_workers():
+    """Start the job workers on the running event loop (called from the app lifespan)."""
+    global _wakeup, _loop, _last_recover
+    _recover()
+    _loop = asyncio.get_running_loop()
+    _last_recover = _loop.time()
+    _wakeup = asyncio.Event()
+    for _ in range(JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+
+
+async def stop_workers():
+    global _wakeup, _loop
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    if _running:
+        db = get_db()
+        try:
+            db.executemany("UPDATE jobs SET status = 'queued' WHERE id = ? AND status = 'running'",
+                           [(job_id,) for job_id in _running])
+            db.commit()
+        finally:
+            db.close()
+        _running.clear()
+    _wakeup = _loop = None
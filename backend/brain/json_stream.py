@@ -0,0 +1,69 @@
+"""Incremental extraction of array items from a JSON document that is still being streamed.
+
+Used to hand Auditor tasks to the client while the model is still writing the
+rest of its {"tasks": [...], "gaps": [...], ...} response.
+"""
+
+import json
+import re
+
+
+class ArrayItemStream:
+    """Feed text chunks; get back each object of the `key` array as soon as it is complete.
+
+    Only the first occurrence of `"key": [` is followed. Items that fail to
+    parse are skipped — the full document is still parsed normally at the end.
+    """
+
+    def __init__(self, key: str):
+        self._start_re = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._buffer = ""
+        self._pos = -1        # scan position once the array was found
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+        self.finished = False
+
+    def feed(self, chunk: str) -> list:
+        self._buffer += chunk
+        if self.finished:
+            return []
+        if self._pos < 0:
+            match = self._start_re.search(self._buffer)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        items = []
+        buf = self._buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:  # the closing ] of the array itself
+                    self.finished = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._item_start is not None:
+                    try:
+                        items.append(json.loads(buf[self._item_start:i + 1]))
+                    except ValueError:
+                        pass
+                    self._item_start = None
+            i += 1
+        self._pos = i
+        return items
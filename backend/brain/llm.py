@@ -0,0 +1,248 @@
+"""LLM gateway — every language-model call in the backend goes through here.
+
+acompletion() is a drop-in for litellm.acompletion that adds:
+  * a process-wide concurrency limit (LLM_MAX_CONCURRENCY) and a per-user one
+    (LLM_MAX_CONCURRENCY_PER_USER), so exam-season peaks queue here instead
+    of piling onto the provider,
+  * coalescing: an identical request (model + messages + params) already in
+    flight is awaited instead of being sent again — double-clicks cost one call,
+  * retries on rate limits / overload / timeouts, honouring Retry-After,
+  * per-model latency and token counters (metrics_snapshot()).
+
+astream() is the streaming variant (text deltas) with the same limits.
+
+Server config is imported lazily so brain modules that import this stay
+importable on their own (scripts, eval).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+import weakref
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+
+import litellm
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying (529 = Anthropic "overloaded").
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+BASE_RETRY_DELAY = 2  # seconds, doubled per attempt when there is no Retry-After
+MAX_RETRY_AFTER = 60  # don't sleep longer than this on a provider's say-so
+
+
+class _LoopState:
+    """Semaphores and in-flight calls belong to one event loop."""
+
+    def __init__(self):
+        from server.config import LLM_MAX_CONCURRENCY, LLM_MAX_CONCURRENCY_PER_USER
+
+        self.global_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        self.per_user_limit = LLM_MAX_CONCURRENCY_PER_USER
+        self.user_slots = {}  # user_id -> [Semaphore, number of callers using it]
+        self.in_flight = {}   # request fingerprint -> Task
+
+
+_states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+_metrics: dict[str, dict] = {}
+
+
+def _state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    state = _states.get(loop)
+    if state is None:
+        state = _states[loop] = _LoopState()
+    return state
+
+
+def _model_metrics(model: str) -> dict:
+    m = _metrics.get(model)
+    if m is None:
+        m = _metrics[model] = {
+            "calls": 0, "errors": 0, "retries": 0, "coalesced": 0,
+            "latency_ms_total": 0.0, "latency_ms_max": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0,
+        }
+    return m
+
+
+def metrics_snapshot() -> dict:
+    """Per-model counters since process start, with average latency."""
+    snapshot = {}
+    for model, m in _metrics.items():
+        snapshot[model] = dict(m, latency_ms_avg=round(m["latency_ms_total"] / m["calls"], 1) if m["calls"] else 0.0)
+    return snapshot
+
+
+@asynccontextmanager
+async def _user_slot(state: _LoopState, user_id):
+    if user_id is None:
+        yield
+        return
+    entry = state.user_slots.get(user_id)
+    if entry is None:
+        entry = state.user_slots[user_id] = [asyncio.Semaphore(state.per_user_limit), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            state.user_slots.pop(user_id, None)
+
+
+def _fingerprint(model: str, messages: list, kwargs: dict) -> str:
+    raw = json.dumps([model, messages, kwargs], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (litellm.Timeout, litellm.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    return getattr(exc, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+def _retry_after(exc: Exception) -> float | None:
+    """Seconds the provider asked us to wait (Retry-After / retry-after-ms), if any."""
+    headers = getattr(exc, "litellm_response_headers", None)
+    if headers is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _record_usage(m: dict, response) -> None:
+    usage = getattr(response, "usage", None)
+    if usage:
+        m["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        m["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+
+def _retry_delay(error: Exception, attempt: int, m: dict) -> float:
+    """Seconds to wait before the next attempt; re-raises `error` when it isn't worth retrying."""
+    from server.config import LLM_MAX_RETRIES
+
+    delay = _retry_after(error)
+    if delay is None:
+        delay = BASE_RETRY_DELAY * (2 ** attempt) + random.uniform(0, 1)
+    if attempt >= LLM_MAX_RETRIES - 1 or not _is_retryable(error) or delay > MAX_RETRY_AFTER:
+        m["errors"] += 1
+        raise error
+    m["retries"] += 1
+    logger.warning(f"LLM call failed ({type(error).__name__}), retrying in {delay:.1f}s")
+    return delay
+
+
+def _record_call(m: dict, model: str, start: float, user_id, attempt: int) -> None:
+    latency_ms = (time.perf_counter() - start) * 1000
+    m["calls"] += 1
+    m["latency_ms_total"] += latency_ms
+    m["latency_ms_max"] = max(m["latency_ms_max"], latency_ms)
+    logger.info(f"LLM {model}: {latency_ms:.0f}ms (user {user_id}, attempt {attempt + 1})")
+
+
+async def _call(state: _LoopState, model: str, messages: list, user_id, kwargs: dict):
+    m = _model_metrics(model)
+    attempt = 0
+    while True:
+        # Slots are held per attempt only, never while backing off.
+        async with _user_slot(state, user_id), state.global_slots:
+            start = time.perf_counter()
+            try:
+                response = await litellm.acompletion(model=model, messages=messages, **kwargs)
+            except Exception as e:
+                error = e
+            else:
+                _record_call(m, model, start, user_id, attempt)
+                _record_usage(m, response)
+                return response
+        await asyncio.sleep(_retry_delay(error, attempt, m))
+        attempt += 1
+
+
+async def astream(model: str, messages: list, *, user_id: int | None = None, **kwargs):
+    """Streaming completion through the gateway: yields text deltas as they arrive.
+
+    Same concurrency limits and retries as acompletion(), but a failure is only
+    retried before the first delta was yielded, and streams are never coalesced.
+    """
+    state = _state()
+    m = _model_metrics(model)
+    kwargs.setdefault("stream_options", {"include_usage": True})
+    attempt = 0
+    while True:
+        started = False
+        async with _user_slot(state, user_id), state.global_slots:
+            start = time.perf_counter()
+            try:
+                response = await litellm.acompletion(model=model, messages=messages, stream=True, **kwargs)
+                async for chunk in response:
+                    _record_usage(m, chunk)
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        started = True
+                        yield delta
+            except Exception as e:
+                if started:
+                    m["errors"] += 1
+                    raise
+                error = e
+            else:
+                _record_call(m, model, start, user_id, attempt)
+                return
+        await asyncio.sleep(_retry_delay(error, attempt, m))
+        attempt += 1
+
+
+def _finish(state: _LoopState, key: str, task: asyncio.Task) -> None:
+    state.in_flight.pop(key, None)
+    if not task.cancelled():
+        task.exception()  # mark retrieved even if every waiter went away
+
+
+async def acompletion(model: str, messages: list, *, user_id: int | None = None, coalesce: bool = True, **kwargs):
+    """litellm.acompletion through the gateway. Returns the litellm response.
+
+    user_id puts the call under that user's concurrency limit. With coalesce
+    (the default) callers making the exact same request share one upstream
+    call and receive the same response object — treat it as read-only.
+    """
+    state = _state()
+    if not coalesce:
+        return await _call(state, model, messages, user_id, kwargs)
+
+    key = _fingerprint(model, messages, kwargs)
+    task = state.in_flight.get(key)
+    if task is not None:
+        _model_metrics(model)["coalesced"] += 1
+    else:
+        task = asyncio.ensure_future(_call(state, model, messages, user_id, kwargs))
+        state.in_flight[key] = task
+        task.add_done_callback(lambda t: _finish(state, key, t))
+    # Shielded: one caller going away (client disconnect) must not cancel the
+    # call the other callers are waiting on.
+    return await asyncio.shield(task)
+
+
+async def complete_text(model: str, prompt: str, *, user_id: int | None = None, **kwargs) -> str:
+    """Single user-message completion; returns the stripped reply text."""
+    response = await acompletion(model, [{"role": "user", "content": prompt}], user_id=user_id, **kwargs)
+    return response.choices[0].message.content.strip()
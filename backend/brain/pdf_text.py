@@ -0,0 +1,121 @@
+"""PDF text extraction service.
+
+Onboarding, exam file upload and the syllabus parser all need the text of
+uploaded PDFs, and students of the same course keep uploading the very same
+syllabus. Pages are extracted once per distinct file (keyed by the SHA-256 of
+its bytes) and stored in pdf_text_cache; every later request for the same
+bytes is a single indexed lookup. Callers format the page list themselves.
+Everything works from the saved file on disk — PyMuPDF reads it by path, so
+an upload is never held in memory as a whole.
+
+Request handlers use the async extract_file_pages(): on a cache miss the PDF
+is split into PDF_PAGES_PER_CHUNK page ranges that are extracted in parallel
+on a process pool, so a few 300-page decks don't freeze the event loop.
+"""
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from brain import pdf_worker
+from server.compression import pack_json, unpack_json
+from server.config import PDF_EXTRACT_WORKERS, PDF_PAGES_PER_CHUNK
+from server.database import get_db
+
+logger = logging.getLogger(__name__)
+
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # spawn, not fork: the server process runs thread pools and holds
+        # SQLite connections, neither of which survive a fork safely.
+        _process_pool = ProcessPoolExecutor(
+            max_workers=PDF_EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+def shutdown_pdf_executor():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def file_hash(file_path: str) -> str:
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_cached(key: str) -> list[str] | None:
+    try:
+        db = get_db()
+        try:
+            row = db.execute("SELECT pages FROM pdf_text_cache WHERE content_hash = ?", (key,)).fetchone()
+        finally:
+            db.close()
+    except sqlite3.Error as e:
+        logger.warning(f"PDF text cache lookup failed: {e}")
+        return None
+    return unpack_json(row["pages"]) if row else None
+
+
+def _store(key: str, pages: list[str]) -> None:
+    try:
+        db = get_db()
+        try:
+            db.execute(
+                "INSERT OR IGNORE INTO pdf_text_cache (content_hash, pages, page_count) VALUES (?, ?, ?)",
+                (key, pack_json(pages), len(pages)),
+            )
+            db.commit()
+        finally:
+            db.close()
+    except sqlite3.Error as e:
+        logger.warning(f"PDF text cache write failed: {e}")
+
+
+def extract_pages_from_file(file_path: str, digest: str | None = None) -> list[str]:
+    """Text of every page of the PDF at file_path, served from the cache when the same
+    bytes were seen before. Blocking — for code already running in a worker thread.
+    Raises if the file is not a readable PDF (nothing is cached then)."""
+    if digest is None:
+        digest = file_hash(file_path)
+    pages = _load_cached(digest)
+    if pages is None:
+        pages = pdf_worker.extract_file(file_path)
+        _store(digest, pages)
+    return pages
+
+
+async def extract_file_pages(file_path: str, digest: str | None = None) -> list[str]:
+    """Text of every page of the PDF at file_path, without blocking the event loop.
+    Pass `digest` (SHA-256 hex of the file) when the caller already has it."""
+    loop = asyncio.get_running_loop()
+    if digest is None:
+        digest = await loop.run_in_executor(None, file_hash, file_path)
+
+    pages = await loop.run_in_executor(None, _load_cached, digest)
+    if pages is not None:
+        return pages
+
+    pool = _get_process_pool()
+    total = await loop.run_in_executor(pool, pdf_worker.page_count, file_path)
+    ranges = await asyncio.gather(*(
+        loop.run_in_executor(pool, pdf_worker.extract_range, file_path, start, start + PDF_PAGES_PER_CHUNK)
+        for start in range(0, total, PDF_PAGES_PER_CHUNK)
+    ))
+    pages = [page for chunk in ranges for page in chunk]
+
+    await loop.run_in_executor(None, _store, digest, pages)
+    return pages
@@ -0,0 +1,32 @@
+"""PyMuPDF page extraction run inside the PDF process pool (see brain/pdf_text.py).
+
+Kept free of server imports: every worker process imports this module on
+start-up, and it should not pull in the app, the DB pool or the LLM clients.
+"""
+
+import fitz  # PyMuPDF
+
+
+def page_count(file_path: str) -> int:
+    doc = fitz.open(file_path)
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def extract_range(file_path: str, start: int, stop: int) -> list[str]:
+    """Text of pages [start, stop) of the PDF at file_path."""
+    doc = fitz.open(file_path)
+    try:
+        return [doc[i].get_text() for i in range(start, min(stop, doc.page_count))]
+    finally:
+        doc.close()
+
+
+def extract_file(file_path: str) -> list[str]:
+    doc = fitz.open(file_path)
+    try:
+        return [page.get_text() for page in doc]
+    finally:
+        doc.close()
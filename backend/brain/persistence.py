@@ -0,0 +1,198 @@
+"""Bulk persistence for generated tasks and schedule blocks.
+
+Shared by approve-and-schedule, schedule regeneration and brain chat so each
+of them writes tasks, dependency links and blocks with a handful of
+executemany() calls instead of one statement per row (tasks are the
+exception: one INSERT each, so their ids are known). None of these helpers
+commit — the caller owns the transaction.
+"""
+
+BLOCK_COLUMNS = (
+    "task_id", "exam_id", "exam_name", "task_title", "start_time", "end_time",
+    "day_date", "block_type", "is_delayed", "is_split", "part_number", "total_parts",
+)
+# Positions inside a block row tuple (same order as BLOCK_COLUMNS)
+ROW_TASK, ROW_START, ROW_DAY, ROW_TYPE, ROW_DELAYED, ROW_PART = 0, 4, 6, 7, 8, 10
+
+TASK_COLUMNS = (
+    "exam_id", "title", "topic", "subject", "deadline", "day_date",
+    "sort_order", "estimated_hours", "difficulty", "focus_score", "is_padding",
+)
+
+# The day to hand the Enforcer for task `t`. sync_task_days() moves day_date to
+# the task's last block and keeps the day the Enforcer was given in planned_day;
+# while day_date still matches that block nobody has moved the task since, so
+# the planned day is used again and an unchanged schedule regenerates as is.
+ENFORCER_DAY_SQL = """CASE WHEN t.planned_day IS NOT NULL
+        AND t.day_date = (SELECT MAX(b.day_date) FROM schedule_blocks b
+                          WHERE b.task_id = t.id AND b.is_manually_edited = 0)
+    THEN t.planned_day ELSE t.day_date END"""
+
+_INSERT_BLOCK_SQL = f"""INSERT INTO schedule_blocks
+    (user_id, {", ".join(BLOCK_COLUMNS)}, push_notified)
+    VALUES ({", ".join("?" * (len(BLOCK_COLUMNS) + 2))})"""
+
+_UPDATE_BLOCK_SQL = f"""UPDATE schedule_blocks
+    SET {", ".join(f"{c} = ?" for c in BLOCK_COLUMNS)}, push_notified = ?,
+        completed = 0, xp_awarded = 0, deferred_original_day = NULL
+    WHERE id = ?"""
+
+_INSERT_TASK_SQL = f"""INSERT INTO tasks
+    (user_id, {", ".join(TASK_COLUMNS)})
+    VALUES ({", ".join("?" * (len(TASK_COLUMNS) + 1))})"""
+
+
+def block_row(block) -> tuple:
+    """Column values (in BLOCK_COLUMNS order) for an Enforcer ScheduleBlock."""
+    return (
+        block.task_id if block.block_type != "hobby" else None,
+        block.exam_id,
+        block.exam_name,
+        block.task_title,
+        block.start_time,
+        block.end_time,
+        block.day_date,
+        block.block_type,
+        1 if block.is_delayed else 0,
+        block.is_split,
+        block.part_number,
+        block.total_parts,
+    )
+
+
+def block_rows(schedule, skip_task_ids=()) -> list[tuple]:
+    """Block rows for a schedule, dropping blocks of tasks in `skip_task_ids`
+    (tasks whose blocks the user edited by hand)."""
+    rows = [block_row(block) for block in schedule]
+    if skip_task_ids:
+        rows = [r for r in rows if not (r[ROW_TASK] and r[ROW_TASK] in skip_task_ids)]
+    return rows
+
+
+def manually_edited_task_ids(db, user_id: int) -> set[int]:
+    return {
+        r["task_id"] for r in db.execute(
+            """SELECT DISTINCT task_id FROM schedule_blocks
+               WHERE user_id = ? AND is_manually_edited = 1 AND task_id IS NOT NULL""",
+            (user_id,)
+        ).fetchall()
+    }
+
+
+def insert_tasks(db, user_id: int, tasks: list[dict]) -> list[int]:
+    """Insert task dicts (keys from TASK_COLUMNS, missing ones stored as NULL/defaults)
+    and return their new ids in the same order."""
+    # One INSERT per task so each id comes from its own cursor.lastrowid:
+    # re-reading "the newest ids" would depend on the caller's transaction
+    # state and on nobody else inserting tasks for this user meanwhile.
+    # The statement is prepared once and served from the statement cache.
+    return [
+        db.execute(
+            _INSERT_TASK_SQL,
+            (
+                user_id,
+                t.get("exam_id"),
+                t.get("title", "Study Task"),
+                t.get("topic"),
+                t.get("subject"),
+                t.get("deadline"),
+                t.get("day_date"),
+                t.get("sort_order", 0),
+                t.get("estimated_hours", 1.0),
+                t.get("difficulty", 3),
+                t.get("focus_score", 5),
+                1 if t.get("is_padding") else 0,
+            ),
+        ).lastrowid
+        for t in tasks
+    ]
+
+
+def link_task_dependencies(db, links: list[tuple[int, int]]) -> None:
+    """Set dependency_id for (task_id, depends_on_task_id) pairs."""
+    if links:
+        db.executemany(
+            "UPDATE tasks SET dependency_id = ? WHERE id = ?",
+            [(dep_id, task_id) for task_id, dep_id in links],
+        )
+
+
+def insert_blocks(db, user_id: int, rows: list[tuple], now_iso: str) -> None:
+    """Insert block rows; blocks that already started count as notified."""
+    if rows:
+        db.executemany(
+            _INSERT_BLOCK_SQL,
+            [(user_id,) + r + (1 if r[ROW_START] < now_iso else 0,) for r in rows],
+        )
+
+
+def apply_block_diff(db, user_id: int, rows: list[tuple], now_iso: str) -> dict:
+    """Make the user's auto-generated blocks equal `rows`, writing only what changed.
+
+    Stored rows identical to a wanted row are left alone (keeping their id,
+    completion and push_notified state).  Remaining wanted rows reuse a stored
+    row for the same task part via UPDATE, or are INSERTed; stored rows left
+    over after that are DELETEd.  Manually-edited blocks are never touched.
+    """
+    stored = db.execute(
+        f"""SELECT id, {", ".join(BLOCK_COLUMNS)} FROM schedule_blocks
+            WHERE user_id = ? AND is_manually_edited = 0""",
+        (user_id,)
+    ).fetchall()
+    unmatched_ids = {}
+    for r in stored:
+        unmatched_ids.setdefault(tuple(r)[1:], []).append(r["id"])
+
+    changed_rows = []
+    for row in rows:
+        ids = unmatched_ids.get(row)
+        if ids:
+            ids.pop()
+        else:
+            changed_rows.append(row)
+
+    reusable = {}
+    for content, ids in unmatched_ids.items():
+        for block_id in ids:
+            slot = (content[ROW_TASK], content[ROW_TYPE], content[ROW_PART])
+            reusable.setdefault(slot, []).append(block_id)
+
+    updates, inserts = [], []
+    for row in changed_rows:
+        ids = reusable.get((row[ROW_TASK], row[ROW_TYPE], row[ROW_PART]))
+        if ids:
+            updates.append(row + (1 if row[ROW_START] < now_iso else 0, ids.pop()))
+        else:
+            inserts.append(row)
+    deletes = [(block_id,) for ids in reusable.values() for block_id in ids]
+
+    if deletes:
+        db.executemany("DELETE FROM schedule_blocks WHERE id = ?", deletes)
+    if updates:
+        db.executemany(_UPDATE_BLOCK_SQL, updates)
+    insert_blocks(db, user_id, inserts, now_iso)
+    return {"inserted": len(inserts), "updated": len(updates), "deleted": len(deletes)}
+
+
+def sync_task_days(db, user_id: int, planned_days: dict[int, str | None]) -> None:
+    """Move each scheduled task's day_date to the day of its last auto-generated
+    block, in one statement (only rows whose date actually changes are written).
+
+    planned_days maps task id -> the day the Enforcer was given for it; it is
+    stored as planned_day (see ENFORCER_DAY_SQL), again only where it changed.
+    """
+    db.executemany(
+        "UPDATE tasks SET planned_day = ? WHERE id = ? AND planned_day IS NOT ?",
+        [(day, task_id, day) for task_id, day in planned_days.items()],
+    )
+    db.execute(
+        """UPDATE tasks
+           SET day_date = (SELECT MAX(b.day_date) FROM schedule_blocks b
+                           WHERE b.task_id = tasks.id AND b.is_manually_edited = 0)
+           WHERE user_id = ?
+             AND id IN (SELECT task_id FROM schedule_blocks
+                        WHERE user_id = ? AND is_manually_edited = 0 AND task_id IS NOT NULL)
+             AND day_date IS NOT (SELECT MAX(b.day_date) FROM schedule_blocks b
+                                  WHERE b.task_id = tasks.id AND b.is_manually_edited = 0)""",
+        (user_id, user_id),
+    )
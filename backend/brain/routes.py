@@ -2,35 +2,77 @@
 
 import json
 import os
-import shutil
 import asyncio
+import shutil
+import uuid
 import fitz  # PyMuPDF
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File, Form, Header
+from fastapi.responses import StreamingResponse
 from server.database import get_db
 from server.config import UPLOAD_DIR
-from auth.utils import get_current_user, verify_csrf_token
+from auth.utils import get_current_user, verify_csrf_token, invalidate_user_session
+from brain import jobs, llm
 from brain.schemas import BrainMessage, RegenerateDeltaRequest
+from brain.context_packer import PAGE_BREAK
+from brain.pdf_text import extract_file_pages
+from brain.text_store import put_text, release_texts
+from brain.drafts import DraftConflict, delete_draft, load_draft, patch_draft, save_draft
+from exams.utils import save_upload
+from brain.persistence import (
+    apply_block_diff, block_rows, insert_blocks, insert_tasks, link_task_dependencies,
+    manually_edited_task_ids, sync_task_days, ENFORCER_DAY_SQL, ROW_DELAYED, ROW_TASK,
+)
 from users.schemas import UserOnboardRequest, OnboardExam
-from notifications.utils import send_to_user
+from notifications.utils import send_to_users
+from notifications.scheduler import request_message_pregeneration
 
 router = APIRouter(dependencies=[Depends(verify_csrf_token)])
 
 
+ONBOARD_FILE_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+
+async def _stage_upload(upload_file: UploadFile, user_dir: str) -> dict:
+    """Stream one onboarding upload to a temporary path keyed by its digest and
+    extract its text, before any database write is made."""
+    partial_path = os.path.join(user_dir, f".upload_{uuid.uuid4().hex}.part")
+    file_size, content_digest = await save_upload(upload_file, partial_path)
+    tmp_path = os.path.join(user_dir, f".upload_{content_digest}")
+    os.replace(partial_path, tmp_path)
+
+    extracted_text = ""
+    if upload_file.filename.lower().endswith(".pdf"):
+        try:
+            extracted_text = PAGE_BREAK.join(await extract_file_pages(tmp_path, content_digest)).strip()
+        except Exception:
+            extracted_text = ""
+    return {"tmp_path": tmp_path, "size": file_size, "text": extracted_text}
+
+
 @router.post("/onboard")
 async def onboard_user(
     onboard_data: str = Form(...),
     files: List[UploadFile] = File(None),
+    run_auditor: bool = Form(True),
     current_user: dict = Depends(get_current_user)
 ):
-    """Unified onboarding: update profile, create exams, upload files, and run Auditor."""
+    """Unified onboarding: update profile, create exams, upload files, and run Auditor.
+
+    Uploads are saved and extracted before the write transaction starts, so the
+    SQLite write lock is never held across an await.
+    With run_auditor=false the Auditor is skipped and the client streams it
+    from /brain/generate-roadmap/stream instead.
+    """
     from brain.exam_brain import ExamBrain
     import traceback
 
     user_id = current_user["id"]
-    db = get_db()
-    
+    db = None
+    staged = {}
+    saved_paths = []
+
     try:
         # 1. Parse data
         try:
@@ -38,7 +80,23 @@ async def onboard_user(
         except Exception as e:
             raise HTTPException(status_code=422, detail="Some of the information provided is invalid. Please check your details and try again.")
 
-        # 2. Update user profile
+        # 2. Save and extract every referenced upload, outside any transaction
+        files = files or []
+        user_dir = os.path.join(UPLOAD_DIR, f"user_{user_id}")
+        os.makedirs(user_dir, exist_ok=True)
+        for exam_data in data.exams:
+            for file_idx in exam_data.file_indices:
+                if file_idx < 0 or file_idx >= len(files) or file_idx in staged:
+                    continue
+                upload_file = files[file_idx]
+                if upload_file.filename and not upload_file.filename.lower().endswith(ONBOARD_FILE_EXTENSIONS):
+                    continue
+                upload = await _stage_upload(upload_file, user_dir)
+                # Identical bytes share one temporary path, so share the entry too.
+                staged[file_idx] = next((u for u in staged.values() if u["tmp_path"] == upload["tmp_path"]), upload)
+
+        # 3. Update user profile (no awaits from here to the commit)
+        db = get_db()
         db.execute(
             """UPDATE users SET 
                name = COALESCE(?, name), wake_up_time = ?, sleep_time = ?, study_method = ?,
@@ -62,14 +120,17 @@ async def onboard_user(
             )
         )
 
-        # 3. Fresh start: Clear existing exams/tasks for this user
+        # 4. Fresh start: Clear existing exams/tasks for this user
         db.execute("DELETE FROM schedule_blocks WHERE user_id = ?", (user_id,))
         db.execute("DELETE FROM tasks WHERE user_id = ?", (user_id,))
+        old_text_hashes = [r["text_hash"] for r in db.execute(
+            "SELECT text_hash FROM exam_files WHERE exam_id IN (SELECT id FROM exams WHERE user_id = ?)", (user_id,)
+        ).fetchall()]
         db.execute("DELETE FROM exams WHERE user_id = ?", (user_id,))
+        release_texts(db, old_text_hashes)
 
-        # 4. Create exams and link files
+        # 5. Create exams and link the staged files
         created_exams = []
-        files = files or []
         
         buffer_days = data.buffer_days or 0
         for exam_data in data.exams:
@@ -91,88 +152,82 @@ async def onboard_user(
             
             # Handle files for this exam
             for i, file_idx in enumerate(exam_data.file_indices):
-                if file_idx < 0 or file_idx >= len(files):
+                upload = staged.get(file_idx)
+                if upload is None:
                     continue
-                
                 upload_file = files[file_idx]
-                # Validate file type
-                allowed_extensions = ('.pdf', '.png', '.jpg', '.jpeg', '.gif', '.webp')
-                if upload_file.filename and not upload_file.filename.lower().endswith(allowed_extensions):
-                    continue
                 file_type = exam_data.file_types[i] if i < len(exam_data.file_types) else 'other'
 
-                # Save file
-                user_dir = os.path.join(UPLOAD_DIR, f"user_{user_id}")
-                os.makedirs(user_dir, exist_ok=True)
                 # Use a safe filename or prefix with exam_id to avoid collisions
                 safe_filename = f"exam_{exam_id}_{upload_file.filename}"
                 file_path = os.path.join(user_dir, safe_filename)
-                
-                with open(file_path, "wb") as buffer:
-                    shutil.copyfileobj(upload_file.file, buffer)
-
-                # Extract text
-                extracted_text = ""
-                if upload_file.filename.lower().endswith(".pdf"):
-                    extracted_text = ExamBrain.extract_pdf_text(file_path)
-
-                try:
-                    db.execute(
-                        """INSERT INTO exam_files (exam_id, filename, file_path, file_type, file_size, extracted_text)
-                           VALUES (?, ?, ?, ?, ?, ?)""",
-                        (exam_id, upload_file.filename, file_path, file_type, os.path.getsize(file_path), extracted_text)
-                    )
-                except Exception:
-                    # Clean up orphaned file if DB insert fails
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                    raise
+                if "path" in upload:
+                    # Same upload attached to several exams: each exam owns a copy.
+                    shutil.copyfile(upload["path"], file_path)
+                else:
+                    os.replace(upload["tmp_path"], file_path)
+                    upload["path"] = file_path
+                saved_paths.append(file_path)
+
+                db.execute(
+                    """INSERT INTO exam_files (exam_id, filename, file_path, file_type, file_size, text_hash)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (exam_id, upload_file.filename, file_path, file_type, upload["size"], put_text(db, upload["text"]))
+                )
 
             # Fetch the newly created exam
             new_exam = db.execute("SELECT * FROM exams WHERE id = ?", (exam_id,)).fetchone()
             created_exams.append(dict(new_exam))
 
         db.commit()
-        
+        saved_paths = []
+        invalidate_user_session(user_id)
+
+        if not run_auditor:
+            return {"message": "Onboarding complete!", "tasks": [], "gaps": [], "topic_map": {}}
+
         # 5. Trigger Initial Roadmap Generation (Auditor)
         updated_user = db.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
         
         # Prepare exam list with files for ExamBrain
         exam_list_for_brain = []
         for exam in created_exams:
-            files_rows = db.execute("SELECT * FROM exam_files WHERE exam_id = ?", (exam["id"],)).fetchall()
+            files_rows = db.execute(
+                "SELECT id, exam_id, filename, file_type, file_size, text_hash FROM exam_files WHERE exam_id = ?", (exam["id"],)
+            ).fetchall()
             exam_list_for_brain.append({**exam, "files": [dict(f) for f in files_rows]})
             
+        # Release the connection while the Auditor runs; reopen to save the draft.
+        db.close()
+        db = None
         brain = ExamBrain(dict(updated_user), exam_list_for_brain)
         auditor_result = await brain.call_split_brain()
-        
+        db = get_db()
+
         # Persist Auditor draft
-        draft_json = json.dumps({
-            "tasks": auditor_result["tasks"],
-            "gaps": auditor_result["gaps"],
-            "topic_map": auditor_result["topic_map"],
-        })
-        exam_ids = [e["id"] for e in created_exams]
-        if exam_ids:
-            placeholders = ",".join("?" * len(exam_ids))
-            db.execute(
-                f"UPDATE exams SET auditor_draft = ? WHERE id IN ({placeholders})",
-                [draft_json] + exam_ids,
-            )
-            db.commit()
+        version = save_draft(db, user_id, auditor_result)
+        db.commit()
 
         return {
             "message": "Onboarding complete! Roadmap generated.",
             "tasks": auditor_result["tasks"],
             "gaps": auditor_result["gaps"],
             "topic_map": auditor_result["topic_map"],
+            "version": version,
         }
 
     except Exception as e:
         if db: db.rollback()
+        # Clean up orphaned files if the onboarding transaction did not commit
+        for path in saved_paths:
+            if os.path.exists(path):
+                os.remove(path)
         raise HTTPException(status_code=500, detail="Something went wrong while setting up your study plan. Please try again.")
     finally:
         if db: db.close()
+        for upload in staged.values():
+            if "path" not in upload and os.path.exists(upload["tmp_path"]):
+                os.remove(upload["tmp_path"])
 
 
 def rollover_tasks(db, user_id, tz_offset):
@@ -190,29 +245,29 @@ def rollover_tasks(db, user_id, tz_offset):
     return today_str
 
 
-@router.post("/generate-roadmap")
-async def generate_roadmap(current_user: dict = Depends(get_current_user)):
-    """Step 1 of Split-Brain: run the Auditor, persist the draft, return Auditor output."""
+async def _generate_roadmap(current_user: dict) -> dict:
+    """Run the Auditor over the user's upcoming exams and persist the draft.
+
+    The DB connection is released while the Auditor runs and reopened to save
+    the draft. Shared by /generate-roadmap and the "auditor" background job.
+    """
     from brain.exam_brain import ExamBrain
-    import traceback
 
     user_id = current_user["id"]
     db = get_db()
-
     try:
         exams = db.execute(
             "SELECT * FROM exams WHERE user_id = ? AND status = 'upcoming' ORDER BY exam_date",
             (user_id,)
         ).fetchall()
         if not exams:
-            db.close()
             raise HTTPException(status_code=400, detail="No upcoming exams found. Please add your exams first.")
 
         exam_list = []
         # Batch fetch all exam files to avoid N+1 query
         exam_ids_list = [exam["id"] for exam in exams]
         all_files = db.execute(
-            f"SELECT * FROM exam_files WHERE exam_id IN ({','.join('?' * len(exam_ids_list))})",
+            f"SELECT id, exam_id, filename, file_type, file_size, text_hash FROM exam_files WHERE exam_id IN ({','.join('?' * len(exam_ids_list))})",
             exam_ids_list
         ).fetchall()
         files_by_exam = {}
@@ -220,117 +275,205 @@ async def generate_roadmap(current_user: dict = Depends(get_current_user)):
             files_by_exam.setdefault(f["exam_id"], []).append(dict(f))
         for exam in exams:
             exam_list.append({**dict(exam), "files": files_by_exam.get(exam["id"], [])})
+    finally:
+        db.close()
 
-        exam_ids = [e["id"] for e in exams]
-
-        # Run the Auditor (API Call 1) — does NOT clear tasks or schedule blocks
-        brain = ExamBrain(current_user, exam_list)
+    # Run the Auditor (API Call 1) — does NOT clear tasks or schedule blocks
+    brain = ExamBrain(current_user, exam_list)
+    try:
         auditor_result = await brain.call_split_brain()
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to generate your study plan. Please try again.")
 
-        # Persist Auditor draft to all exams for this user so the review page survives refresh
-        draft_json = json.dumps({
-            "tasks": auditor_result["tasks"],
-            "gaps": auditor_result["gaps"],
-            "topic_map": auditor_result["topic_map"],
-        })
-        placeholders = ",".join("?" * len(exam_ids))
-        db.execute(
-            f"UPDATE exams SET auditor_draft = ? WHERE id IN ({placeholders})",
-            [draft_json] + exam_ids,
-        )
+    draft = {
+        "tasks": auditor_result["tasks"],
+        "gaps": auditor_result["gaps"],
+        "topic_map": auditor_result["topic_map"],
+    }
+    # Persist the Auditor draft so the review page survives refresh
+    db = get_db()
+    try:
+        draft["version"] = save_draft(db, user_id, draft)
         db.commit()
+    finally:
         db.close()
+    return draft
 
-        return {
-            "message": f"Auditor complete — {len(auditor_result['tasks'])} tasks, {len(auditor_result['gaps'])} gaps detected",
-            "tasks": auditor_result["tasks"],
-            "gaps": auditor_result["gaps"],
-            "topic_map": auditor_result["topic_map"],
-        }
-    except Exception as e:
-        if db: db.close()
-        raise HTTPException(status_code=500, detail="Failed to generate your study plan. Please try again.")
 
+@jobs.handler("auditor")
+async def _auditor_job(user: dict, payload: dict) -> dict:
+    return await _generate_roadmap(user)
 
-@router.get("/auditor-draft")
-def get_auditor_draft(current_user: dict = Depends(get_current_user)):
-    """Retrieve the stored Auditor draft for the current user.
 
-    Returns the first non-null auditor_draft found in the user's upcoming exams.
-    The draft is a JSON blob containing tasks, gaps, and topic_map as produced by
-    the Auditor (POST /brain/generate-roadmap). The frontend uses this to re-render
-    the Intermediate Review Page after a page refresh.
+@router.post("/generate-roadmap")
+async def generate_roadmap(current_user: dict = Depends(get_current_user)):
+    """Step 1 of Split-Brain: run the Auditor, persist the draft, return Auditor output."""
+    draft = await _generate_roadmap(current_user)
+    return {
+        "message": f"Auditor complete — {len(draft['tasks'])} tasks, {len(draft['gaps'])} gaps detected",
+        **draft,
+    }
+
+
+def _sse(event: dict) -> str:
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@router.post("/generate-roadmap/stream")
+async def generate_roadmap_stream(current_user: dict = Depends(get_current_user)):
+    """Streaming variant of /generate-roadmap (Server-Sent Events).
+
+    Forwards ExamBrain.stream_split_brain events (task previews, then each
+    exam's result as soon as that exam's Auditor call finishes), persists the
+    merged draft and ends with {"type": "done"}. Exams are merged in the order
+    they finished — the same order the client appends them in, so task
+    indices match. No DB connection is held while the Auditor runs.
     """
+    from brain.exam_brain import ExamBrain
+    import traceback
+
     user_id = current_user["id"]
     db = get_db()
+    try:
+        exams = db.execute(
+            "SELECT * FROM exams WHERE user_id = ? AND status = 'upcoming' ORDER BY exam_date",
+            (user_id,)
+        ).fetchall()
+    finally:
+        db.close()
+    if not exams:
+        raise HTTPException(status_code=400, detail="No upcoming exams found. Please add your exams first.")
 
-    row = db.execute(
-        """SELECT auditor_draft FROM exams
-           WHERE user_id = ? AND status = 'upcoming' AND auditor_draft IS NOT NULL
-           ORDER BY exam_date
-           LIMIT 1""",
-        (user_id,),
-    ).fetchone()
-    db.close()
+    exam_list = [dict(exam) for exam in exams]
+    brain = ExamBrain(current_user, exam_list)
 
-    if not row or not row["auditor_draft"]:
-        raise HTTPException(status_code=404, detail="No study plan draft found. Please generate a new plan.")
+    async def events():
+        yield _sse({"type": "start", "exam_count": len(exam_list)})
+        results = []
+        try:
+            async for event in brain.stream_split_brain():
+                yield _sse(event)
+                if event["type"] == "exam":
+                    results.append(event)
+
+            draft = ExamBrain.merge_audits(results)
+            db = get_db()
+            try:
+                version = save_draft(db, user_id, draft)
+                db.commit()
+            finally:
+                db.close()
+            yield _sse({
+                "type": "done", "task_count": len(draft["tasks"]), "gap_count": len(draft["gaps"]), "version": version,
+            })
+        except Exception:
+            traceback.print_exc()
+            yield _sse({"type": "error", "detail": "Failed to generate your study plan. Please try again."})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/auditor-draft")
+def get_auditor_draft(current_user: dict = Depends(get_current_user)):
+    """Retrieve the stored Auditor draft for the current user.
 
+    The draft holds tasks, gaps, topic_map and its version, as produced by the
+    Auditor (POST /brain/generate-roadmap) plus any edits saved with PATCH.
+    The frontend uses this to re-render the Intermediate Review Page after a
+    page refresh.
+    """
+    user_id = current_user["id"]
+    db = get_db()
     try:
-        draft = json.loads(row["auditor_draft"])
+        draft = load_draft(db, user_id)
     except json.JSONDecodeError:
         raise HTTPException(status_code=500, detail="Your study plan draft could not be loaded. Please generate a new one.")
+    finally:
+        db.close()
 
+    if not draft or not draft["tasks"]:
+        raise HTTPException(status_code=404, detail="No study plan draft found. Please generate a new plan.")
     return draft
 
 
+@router.patch("/auditor-draft")
+def patch_auditor_draft(body: dict, current_user: dict = Depends(get_current_user)):
+    """Save edits to the Auditor draft without rewriting it.
+
+    Body: {"version": n, "tasks": [task, ...], "removed": [task_index, ...]}.
+    Tasks are matched on task_index (new indices are added); only those rows
+    change. Returns the new version; 409 if the draft changed since `version`.
+    """
+    tasks = body.get("tasks") or []
+    removed = body.get("removed") or []
+    if any(not isinstance(t, dict) or not isinstance(t.get("task_index"), int) for t in tasks) \
+            or any(not isinstance(i, int) for i in removed):
+        raise HTTPException(status_code=400, detail="Invalid draft changes.")
+
+    db = get_db()
+    try:
+        version = patch_draft(db, current_user["id"], body.get("version"), tasks, removed)
+        if version is None:
+            raise HTTPException(status_code=404, detail="No study plan draft found. Please generate a new plan.")
+        db.commit()
+    except DraftConflict:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Your study plan draft was changed elsewhere. Please reload it.")
+    finally:
+        db.close()
+    return {"version": version}
+
+
 @router.delete("/auditor-draft")
 def dismiss_auditor_draft(current_user: dict = Depends(get_current_user)):
     """Clear the stored Auditor draft so the resume-banner stops appearing."""
     user_id = current_user["id"]
     db = get_db()
-    db.execute(
-        "UPDATE exams SET auditor_draft = NULL WHERE user_id = ? AND status = 'upcoming'",
-        (user_id,),
-    )
+    delete_draft(db, user_id)
     db.commit()
     db.close()
     return {"message": "Auditor draft dismissed"}
 
 
-@router.post("/approve-and-schedule")
-async def approve_and_schedule(body: dict, current_user: dict = Depends(get_current_user)):
-    """Step 2 of Split-Brain: accept approved tasks, run Strategist + Enforcer, save schedule."""
-    import traceback
+async def _approve_and_schedule(current_user: dict, approved_tasks: list, strategist_mode: str | None = None) -> dict:
+    """Run Strategist + Enforcer over the approved tasks and save the schedule.
+
+    No DB connection is held while the Strategist runs. Shared by
+    /approve-and-schedule and the "strategist" background job.
+    """
     from brain.exam_brain import ExamBrain
     from brain.scheduler import generate_multi_exam_schedule
 
     user_id = current_user["id"]
-    approved_tasks = body.get("approved_tasks", [])
 
     if not approved_tasks:
         raise HTTPException(status_code=400, detail="Please select at least one task to schedule.")
-
-    db = get_db()
+    if strategist_mode not in (None, "local", "llm"):
+        raise HTTPException(status_code=400, detail="Unknown strategist mode.")
 
     # Load the user's upcoming exams
-    exams = db.execute(
-        "SELECT * FROM exams WHERE user_id = ? AND status = 'upcoming' ORDER BY exam_date",
-        (user_id,)
-    ).fetchall()
-    if not exams:
+    db = get_db()
+    try:
+        exams = db.execute(
+            "SELECT * FROM exams WHERE user_id = ? AND status = 'upcoming' ORDER BY exam_date",
+            (user_id,)
+        ).fetchall()
+    finally:
         db.close()
+    if not exams:
         raise HTTPException(status_code=400, detail="No upcoming exams found. Please add your exams first.")
 
     exam_list = [dict(e) for e in exams]
-    exam_ids = [e["id"] for e in exams]
 
     # 1. Run Strategist (API Call 2) — assigns day_index and internal_priority
     brain = ExamBrain(current_user, exam_list)
     try:
-        scheduled_tasks = await brain.call_strategist(approved_tasks)
+        scheduled_tasks = await brain.call_strategist(approved_tasks, strategist_mode)
     except Exception as exc:
-        db.close()
         raise HTTPException(status_code=500, detail="Failed to build your schedule. Please try again.")
 
     # 2. Convert day_index → actual date string (day_index 0 = today)
@@ -348,10 +491,10 @@ async def approve_and_schedule(body: dict, current_user: dict = Depends(get_curr
         # Sort by internal_priority descending within each day so higher-priority tasks fill first
         scheduled_tasks.sort(key=lambda t: (t.get("day_date", ""), -t.get("internal_priority", 50)))
     except Exception as exc:
-        db.close()
         raise HTTPException(status_code=500, detail="Failed to process your tasks. Please try again.")
 
     # 3. DB Transaction for atomicity
+    db = get_db()
     try:
         db.execute("BEGIN TRANSACTION")
 
@@ -364,13 +507,9 @@ async def approve_and_schedule(body: dict, current_user: dict = Depends(get_curr
         valid_exam_ids = {e["id"] for e in exams}
         fallback_exam_id = exam_list[0]["id"] if exam_list else None
 
-        # Map AI task_index -> DB id for dependency resolution
-        ai_index_to_db_id = {}
-        
-        # Temporary list to hold task objects before dependency update
-        to_insert = []
-
         # Pass 1: Insert tasks
+        to_insert = []
+        ai_indexes = []
         for idx, task in enumerate(scheduled_tasks):
             exam_id = task.get("exam_id")
             if exam_id not in valid_exam_ids:
@@ -378,33 +517,25 @@ async def approve_and_schedule(body: dict, current_user: dict = Depends(get_curr
             if exam_id is None:
                 continue
 
-            focus_score = max(1, min(10, int(task.get("focus_score", 5))))
-            is_padding = 1 if task.get("is_padding") else 0
-            
-            cursor = db.execute(
-                """INSERT INTO tasks
-                (user_id, exam_id, title, topic, subject, deadline, day_date,
-                    sort_order, estimated_hours, focus_score, is_padding)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    user_id,
-                    exam_id,
-                    task.get("title", "Study Task"),
-                    task.get("topic", ""),
-                    task.get("subject", ""),
-                    task.get("day_date"),
-                    task.get("day_date"),
-                    task.get("sort_order", 0),
-                    max(0.5, min(6.0, float(task.get("estimated_hours", 1.0)))),
-                    focus_score,
-                    is_padding,
-                ),
-            )
-            db_id = cursor.lastrowid
-            ai_idx = task.get("task_index", idx)
-            ai_index_to_db_id[ai_idx] = db_id
+            to_insert.append({
+                "exam_id": exam_id,
+                "title": task.get("title", "Study Task"),
+                "topic": task.get("topic", ""),
+                "subject": task.get("subject", ""),
+                "deadline": task.get("day_date"),
+                "day_date": task.get("day_date"),
+                "sort_order": task.get("sort_order", 0),
+                "estimated_hours": max(0.5, min(6.0, float(task.get("estimated_hours", 1.0)))),
+                "focus_score": max(1, min(10, int(task.get("focus_score", 5)))),
+                "is_padding": task.get("is_padding"),
+            })
+            ai_indexes.append(task.get("task_index", idx))
+
+        # Map AI task_index -> DB id for dependency resolution
+        ai_index_to_db_id = dict(zip(ai_indexes, insert_tasks(db, user_id, to_insert)))
 
         # Pass 2: Update dependencies
+        dependency_links = []
         for task in scheduled_tasks:
             ai_idx = task.get("task_index")
             ai_dep_idx = task.get("dependency_id")
@@ -412,8 +543,9 @@ async def approve_and_schedule(body: dict, current_user: dict = Depends(get_curr
                 db_id = ai_index_to_db_id.get(ai_idx)
                 db_dep_id = ai_index_to_db_id.get(ai_dep_idx)
                 if db_id and db_dep_id:
-                    db.execute("UPDATE tasks SET dependency_id = ? WHERE id = ?", (db_dep_id, db_id))
-        
+                    dependency_links.append((db_id, db_dep_id))
+        link_task_dependencies(db, dependency_links)
+
         # Reload all saved tasks to pass to the scheduler (they are now in the DB but transaction not committed)
         saved_tasks = [
             dict(r) for r in db.execute("SELECT * FROM tasks WHERE user_id = ?", (user_id,)).fetchall()
@@ -422,36 +554,10 @@ async def approve_and_schedule(body: dict, current_user: dict = Depends(get_curr
         # 5. Run the Python Enforcer (generate_multi_exam_schedule)
         schedule = generate_multi_exam_schedule(current_user, exam_list, saved_tasks, start_buffer_hours=2.0)
 
-        # 6. Save schedule blocks
+        # 6. Save schedule blocks and move each task to the day of its last block
         now_iso = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
-        for block in schedule:
-            db_task_id = block.task_id if block.block_type != "hobby" else None
-            is_notified = 1 if block.start_time < now_iso else 0
-            db.execute(
-                """INSERT INTO schedule_blocks
-                (user_id, task_id, exam_id, exam_name, task_title,
-                    start_time, end_time, day_date, block_type,
-                    is_delayed, is_split, part_number, total_parts, push_notified)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    user_id,
-                    db_task_id,
-                    block.exam_id,
-                    block.exam_name,
-                    block.task_title,
-                    block.start_time,
-                    block.end_time,
-                    block.day_date,
-                    block.block_type,
-                    1 if block.is_delayed else 0,
-                    block.is_split,
-                    block.part_number,
-                    block.total_parts,
-                    is_notified,
-                ),
-            )
-            if db_task_id:
-                db.execute("UPDATE tasks SET day_date = ? WHERE id = ?", (block.day_date, db_task_id))
+        insert_blocks(db, user_id, block_rows(schedule), now_iso)
+        sync_task_days(db, user_id, {t["id"]: t["day_date"] for t in saved_tasks})
 
         # 7. Sync task dates with actual schedule
         # First, reset all tasks assigned to Today to Tomorrow if they have no blocks today
@@ -485,13 +591,8 @@ async def approve_and_schedule(body: dict, current_user: dict = Depends(get_curr
             dict(r) for r in db.execute("SELECT * FROM tasks WHERE user_id = ?", (user_id,)).fetchall()
         ]
 
-        # Clear auditor_draft
-        if exam_ids:
-            placeholders = ",".join("?" * len(exam_ids))
-            db.execute(
-                f"UPDATE exams SET auditor_draft = NULL WHERE id IN ({placeholders})",
-                exam_ids,
-            )
+        # Clear the Auditor draft
+        delete_draft(db, user_id)
 
         db.execute("COMMIT")
     except Exception as exc:
@@ -500,6 +601,7 @@ async def approve_and_schedule(body: dict, current_user: dict = Depends(get_curr
         raise HTTPException(status_code=500, detail="Something went wrong while creating your schedule. Please try again.")
 
     db.close()
+    request_message_pregeneration(user_id)
 
     schedule_dicts = [block.model_dump() for block in schedule]
     return {
@@ -509,30 +611,90 @@ async def approve_and_schedule(body: dict, current_user: dict = Depends(get_curr
     }
 
 
+@jobs.handler("strategist")
+async def _strategist_job(user: dict, payload: dict) -> dict:
+    return await _approve_and_schedule(user, payload.get("approved_tasks", []), payload.get("strategist_mode"))
+
+
+@router.post("/approve-and-schedule")
+async def approve_and_schedule(body: dict, current_user: dict = Depends(get_current_user)):
+    """Step 2 of Split-Brain: accept approved tasks, run Strategist + Enforcer, save schedule.
+
+    Optional "strategist_mode" ("local" or "llm") overrides STRATEGIST_MODE.
+    """
+    return await _approve_and_schedule(current_user, body.get("approved_tasks", []), body.get("strategist_mode"))
+
+
+@router.post("/jobs", status_code=202)
+async def create_job(
+    body: dict,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+):
+    """Queue Auditor or Strategist work to run in the background.
+
+    Body: {"kind": "auditor"} or {"kind": "strategist", "approved_tasks": [...],
+    optional "strategist_mode"}.
+    Returns the job status right away; poll GET /brain/jobs/{job_id} for the
+    result (the same payload /generate-roadmap or /approve-and-schedule returns).
+    Repeating a request with the same Idempotency-Key header returns the
+    original job instead of starting another one.
+    """
+    kind = body.get("kind")
+    if kind == "auditor":
+        payload = {}
+    elif kind == "strategist":
+        if not body.get("approved_tasks"):
+            raise HTTPException(status_code=400, detail="Please select at least one task to schedule.")
+        payload = {"approved_tasks": body["approved_tasks"], "strategist_mode": body.get("strategist_mode")}
+    else:
+        raise HTTPException(status_code=400, detail="Unknown job type.")
+    return jobs.enqueue(current_user["id"], kind, payload, idempotency_key)
+
+
+@router.get("/jobs/{job_id}")
+def get_job_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Status of a background job: queued, running, done (with result) or failed (with error)."""
+    job = jobs.get_job(job_id, current_user["id"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
 @router.post("/regenerate-schedule")
-def regenerate_schedule(current_user: dict = Depends(get_current_user)):
-    """Re-run the Enforcer on existing tasks and return refreshed calendar data."""
+def regenerate_schedule(full: bool = False, current_user: dict = Depends(get_current_user)):
+    """Re-run the Enforcer on existing tasks and return refreshed calendar data.
+
+    ?full=1 rewrites every auto-generated block instead of applying a diff.
+    """
     db = get_db()
     try:
-        result = internal_regenerate_schedule(current_user["id"], current_user, db)
+        result = internal_regenerate_schedule(current_user["id"], current_user, db, incremental=not full)
         return result
     finally:
         db.close()
 
-def internal_regenerate_schedule(user_id: int, current_user: dict, db) -> dict:
+
+def internal_regenerate_schedule(user_id: int, current_user: dict, db, incremental: bool = True) -> dict:
     """Internal logic to re-run the Enforcer on existing tasks. 
     Does NOT close the DB connection.
+
+    incremental=True diffs the new schedule against the stored blocks and only
+    writes the rows that changed; False deletes and re-inserts every
+    auto-generated block.  Either way the caller's pending writes are committed
+    in the same transaction.
     """
-    from server.config import DB_PATH
     from brain.scheduler import generate_multi_exam_schedule
-    import io, sys, threading
+    import io, sys, threading, traceback
 
 
+    # The Enforcer's input must not depend on the previous run's output, or an
+    # unchanged schedule never settles: plan_day undoes sync_task_days().
     tasks_rows = db.execute(
-        """SELECT t.*, e.name as exam_name FROM tasks t
+        f"""SELECT t.*, e.name as exam_name, {ENFORCER_DAY_SQL} AS plan_day FROM tasks t
            LEFT JOIN exams e ON t.exam_id = e.id
            WHERE t.user_id = ? AND t.status != 'done'
-           ORDER BY t.day_date, t.sort_order""",
+           ORDER BY plan_day, t.sort_order, t.id""",
         (user_id,)
     ).fetchall()
     all_tasks = [dict(t) for t in tasks_rows]
@@ -554,7 +716,7 @@ def internal_regenerate_schedule(user_id: int, current_user: dict, db) -> dict:
     exam_list = [dict(e) for e in exams_rows]
 
     # Re-run the Enforcer on non-done tasks
-    pending_tasks = [t for t in all_tasks if t.get("status") != "done"]
+    pending_tasks = [{**t, "day_date": t["plan_day"]} for t in all_tasks if t.get("status") != "done"]
     
     _scheduler_log = io.StringIO()
     _old_stdout = sys.stdout
@@ -582,79 +744,17 @@ def internal_regenerate_schedule(user_id: int, current_user: dict, db) -> dict:
 
     # Replace schedule blocks in DB, preserving manually-edited blocks
     try:
-        # Save manually-edited blocks before wiping the schedule.
-        manually_edited_rows = db.execute(
-            """SELECT * FROM schedule_blocks
-               WHERE user_id = ? AND is_manually_edited = 1""",
-            (user_id,)
-        ).fetchall()
-        manually_edited_blocks = [dict(r) for r in manually_edited_rows]
-        manually_edited_task_ids = {b["task_id"] for b in manually_edited_blocks if b["task_id"]}
-
-        db.execute("DELETE FROM schedule_blocks WHERE user_id = ?", (user_id,))
-
+        rows = block_rows(new_schedule, skip_task_ids=manually_edited_task_ids(db, user_id))
         now_iso = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
-        for block in new_schedule:
-            db_task_id = block.task_id if block.block_type != "hobby" else None
-            if db_task_id and db_task_id in manually_edited_task_ids:
-                continue
-            is_notified = 1 if block.start_time < now_iso else 0
-            db.execute(
-                """INSERT INTO schedule_blocks
-                (user_id, task_id, exam_id, exam_name, task_title,
-                    start_time, end_time, day_date, block_type,
-                    is_delayed, is_split, part_number, total_parts, push_notified)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    user_id,
-                    db_task_id,
-                    block.exam_id,
-                    block.exam_name,
-                    block.task_title,
-                    block.start_time,
-                    block.end_time,
-                    block.day_date,
-                    block.block_type,
-                    1 if block.is_delayed else 0,
-                    block.is_split,
-                    block.part_number,
-                    block.total_parts,
-                    is_notified,
-                ),
-            )
-            # Sync task day_date with the first block found for it
-            if db_task_id:
-                db.execute("UPDATE tasks SET day_date = ? WHERE id = ?", (block.day_date, db_task_id))
+        if incremental:
+            apply_block_diff(db, user_id, rows, now_iso)
+        else:
+            db.execute("DELETE FROM schedule_blocks WHERE user_id = ? AND is_manually_edited = 0", (user_id,))
+            insert_blocks(db, user_id, rows, now_iso)
 
-        for b in manually_edited_blocks:
-            is_notified = 1 if b["start_time"] < now_iso else 0
-            db.execute(
-                """INSERT INTO schedule_blocks
-                (user_id, task_id, exam_id, exam_name, task_title,
-                    start_time, end_time, day_date, block_type,
-                    is_delayed, is_split, part_number, total_parts,
-                    push_notified, is_manually_edited, completed)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    user_id,
-                    b["task_id"],
-                    b["exam_id"],
-                    b["exam_name"],
-                    b["task_title"],
-                    b["start_time"],
-                    b["end_time"],
-                    b["day_date"],
-                    b["block_type"],
-                    b["is_delayed"],
-                    b["is_split"],
-                    b["part_number"],
-                    b["total_parts"],
-                    is_notified,
-                    1,
-                    b["completed"],
-                ),
-            )
+        # Sync each task's day_date with its last scheduled block
+        sync_task_days(db, user_id, {t["id"]: t["day_date"] for t in pending_tasks})
 
         db.commit()
     except Exception as exc:
@@ -662,17 +762,14 @@ def internal_regenerate_schedule(user_id: int, current_user: dict, db) -> dict:
         traceback.print_exc()
         raise exc
 
+    request_message_pregeneration(user_id)
+
     final_schedule_rows = db.execute(
         "SELECT * FROM schedule_blocks WHERE user_id = ? ORDER BY day_date, start_time",
         (user_id,)
     ).fetchall()
     schedule_dicts = [dict(r) for r in final_schedule_rows]
 
-    study_blocks_by_day = {}
-    for b in schedule_dicts:
-        if b.get("block_type") == "study" and b.get("task_id"):
-            study_blocks_by_day[b["day_date"]] = study_blocks_by_day.get(b["day_date"], 0) + 1
-
     return {
         "tasks": all_tasks,
         "schedule": schedule_dicts,
@@ -689,7 +786,6 @@ async def regenerate_delta(body: RegenerateDeltaRequest, current_user: dict = De
     and surgically updates ONLY auto-generated FLX blocks that the AI says moved.
     FIX blocks (exams) and manually-edited blocks (is_manually_edited=1) are never touched.
     """
-    import litellm
     import re
     from datetime import datetime, timedelta, timezone
 
@@ -792,8 +888,9 @@ Output the delta using the format above. Remember: only output blocks that ACTUA
 
     # 4. Call AI API
     try:
-        response = await litellm.acompletion(
+        response = await llm.acompletion(
             model=model,
+            user_id=user_id,
             max_tokens=1000,
             temperature=0,
             messages=[
@@ -881,6 +978,7 @@ Output the delta using the format above. Remember: only output blocks that ACTUA
         updated_count += 1
 
     db.commit()
+    request_message_pregeneration(user_id)
 
     # 9. Return updated schedule for frontend to re-render
     schedule_rows = db.execute(
@@ -919,8 +1017,6 @@ def get_schedule(current_user: dict = Depends(get_current_user)):
 
 @router.post("/brain-chat")
 async def brain_chat(body: BrainMessage, current_user: dict = Depends(get_current_user)):
-    import litellm
-
     model = os.environ.get("LLM_MODEL", "openrouter/openai/gpt-4o-mini")
     user_id = current_user["id"]
     db = get_db()
@@ -996,8 +1092,9 @@ Return format:
 }}"""
 
     try:
-        response = await litellm.acompletion(
+        response = await llm.acompletion(
             model=model,
+            user_id=user_id,
             max_tokens=8192,
             temperature=0,
             messages=[{"role": "user", "content": prompt}],
@@ -1044,6 +1141,7 @@ Return format:
                 exam_ids
             )
 
+        to_insert = []
         for task in new_tasks:
             if task.get("status") == "done":
                 continue
@@ -1053,62 +1151,45 @@ Return format:
                     task_exam_id = list(valid_exam_ids)[0]
                 else:
                     continue
-            db.execute(
-                """INSERT INTO tasks (user_id, exam_id, title, topic, subject,
-                   deadline, day_date, sort_order, estimated_hours, difficulty, is_padding)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (user_id, task_exam_id, task["title"], task.get("topic"),
-                 task.get("subject"), task.get("day_date"),
-                 task.get("day_date"), task.get("sort_order", 0),
-                 task.get("estimated_hours", 2.0), task.get("difficulty", 3),
-                 1 if task.get("is_padding") else 0)
-            )
+            to_insert.append({
+                "exam_id": task_exam_id,
+                "title": task["title"],
+                "topic": task.get("topic"),
+                "subject": task.get("subject"),
+                "deadline": task.get("day_date"),
+                "day_date": task.get("day_date"),
+                "sort_order": task.get("sort_order", 0),
+                "estimated_hours": task.get("estimated_hours", 2.0),
+                "difficulty": task.get("difficulty", 3),
+                "is_padding": task.get("is_padding"),
+            })
+        insert_tasks(db, user_id, to_insert)
 
         # Roll over past tasks
         rollover_tasks(db, user_id, current_user.get("timezone_offset"))
 
         all_pending_tasks_rows = db.execute(
-            "SELECT * FROM tasks WHERE user_id = ? AND status != 'done' ORDER BY day_date, sort_order",
+            f"""SELECT t.*, {ENFORCER_DAY_SQL} AS plan_day FROM tasks t
+               WHERE t.user_id = ? AND t.status != 'done'
+               ORDER BY plan_day, t.sort_order, t.id""",
             (user_id,)
         ).fetchall()
-        all_pending_tasks = [dict(t) for t in all_pending_tasks_rows]
+        all_pending_tasks = [{**dict(t), "day_date": t["plan_day"]} for t in all_pending_tasks_rows]
 
         # Run Hourly Scheduler
         from brain.scheduler import generate_multi_exam_schedule
         schedule = generate_multi_exam_schedule(current_user, exams, all_pending_tasks, start_buffer_hours=0.0)
 
-        # Preserve manually-edited blocks before wiping
-        manually_edited_rows = db.execute(
-            "SELECT * FROM schedule_blocks WHERE user_id = ? AND is_manually_edited = 1",
-            (user_id,)
-        ).fetchall()
-        manually_edited_blocks = [dict(r) for r in manually_edited_rows]
-        manually_edited_task_ids = {b["task_id"] for b in manually_edited_blocks if b["task_id"]}
-
-        # Clear auto-generated schedule blocks
+        # Replace auto-generated schedule blocks, preserving manually-edited ones
+        rows = block_rows(schedule, skip_task_ids=manually_edited_task_ids(db, user_id))
         db.execute("DELETE FROM schedule_blocks WHERE user_id = ? AND is_manually_edited = 0", (user_id,))
 
         now_iso = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
-
-        for block in schedule:
-            db_task_id = block.task_id if block.block_type != "hobby" else None
-            if db_task_id and db_task_id in manually_edited_task_ids:
-                continue
-
-            is_notified = 1 if block.start_time < now_iso else 0
-
-            db.execute(
-                """INSERT INTO schedule_blocks (user_id, task_id, exam_id, exam_name, task_title,
-                   start_time, end_time, day_date, block_type, is_delayed, is_split, part_number, total_parts, push_notified)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (user_id, db_task_id, block.exam_id, block.exam_name, block.task_title,
-                 block.start_time, block.end_time, block.day_date, block.block_type,
-                 1 if block.is_delayed else 0, block.is_split, block.part_number, block.total_parts, is_notified)
-            )
-            if db_task_id:
-                db.execute("UPDATE tasks SET day_date = ? WHERE id = ?", (block.day_date, db_task_id))
-                if block.is_delayed:
-                    db.execute("UPDATE tasks SET is_delayed = 1 WHERE id = ?", (db_task_id,))
+        insert_blocks(db, user_id, rows, now_iso)
+        sync_task_days(db, user_id, {t["id"]: t["day_date"] for t in all_pending_tasks})
+        delayed_task_ids = {(r[ROW_TASK],) for r in rows if r[ROW_TASK] and r[ROW_DELAYED]}
+        if delayed_task_ids:
+            db.executemany("UPDATE tasks SET is_delayed = 1 WHERE id = ?", delayed_task_ids)
 
         # Reload up-to-date tasks
         final_tasks_rows = db.execute(
@@ -1123,8 +1204,12 @@ Return format:
         db.close()
         raise HTTPException(status_code=500, detail="Failed to update your schedule. Please try again.")
 
+    request_message_pregeneration(user_id)
+
     # Notify user that roadmap is ready
-    send_to_user(db, user_id, "הלוז עודכן! 🪄", "התוכנית שלך עודכנה על ידי המוח.", url="/")
+    await send_to_users(db, [{
+        "user_id": user_id, "title": "הלוז עודכן! 🪄", "body": "התוכנית שלך עודכנה על ידי המוח.", "url": "/",
+    }])
     db.close()
 
     return {
@@ -4,7 +4,10 @@ Decouples task prioritization (AI) from time allocation (Python).
 """
 from __future__ import annotations
 
+import heapq
 import json
+import math
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
 from brain.schemas import ScheduleBlock
 
@@ -16,13 +19,25 @@ PEAK_WINDOWS = {
 }
 
 
+MINUTES_PER_DAY = 24 * 60
+
+PREF_DEFINITIONS = {
+    "morning": (8, 14),
+    "afternoon": (14, 20),
+    "night": (20, 2), # wraps to next day
+}
+
+
 def _is_peak_window(window_start: datetime, peak_productivity: str) -> bool:
     """Return True if this time window overlaps the user's peak productivity hours."""
+    return _is_peak_hour(window_start.hour, peak_productivity)
+
+
+def _is_peak_hour(window_h: int, peak_productivity: str) -> bool:
     peak_range = PEAK_WINDOWS.get(peak_productivity)
     if not peak_range:
         return False  # unknown value → treat all as non-peak
     peak_start_h, peak_end_h = peak_range
-    window_h = window_start.hour
     if peak_start_h < peak_end_h:
         return peak_start_h <= window_h < peak_end_h
     else:
@@ -39,6 +54,102 @@ class WiredWindow:
     def __repr__(self):
         return f"WiredWindow({self.start_local.strftime('%H:%M')}-{self.end_local.strftime('%H:%M')})"
 
+def _safe_focus(t: dict) -> int:
+    try:
+        return int(t.get("focus_score", 5))
+    except (ValueError, TypeError):
+        return 5
+
+
+class _CandidatePool:
+    """
+    Indexed view of the schedulable tasks for the greedy fill.
+    Tasks are bucketed once into overdue / today / future heaps per focus class
+    (high = focus >= 8), keyed by their position in `tasks` (future: day_date
+    first). Exhausted tasks and tasks past their exam drop out lazily, so a
+    pick costs O(log n) instead of rescanning and re-sorting the task list.
+    """
+
+    def __init__(self, tasks: list[dict], remaining_task_min: dict):
+        self._remaining = remaining_task_min
+        self._overdue = ([], [])  # (high focus, low focus) heaps of (pos, task)
+        self._today = ([], [])
+        self._future = ([], [])   # heaps of (day_date, pos, task)
+        self._deferred = []
+        self._is_valid = lambda t: True
+        self.skipped = set()
+        for pos, t in enumerate(tasks):
+            if t.get("day_date") and self._is_open(t):
+                heapq.heappush(self._future[self._focus_class(t)], (t["day_date"], pos, t))
+
+    @staticmethod
+    def _focus_class(t: dict) -> int:
+        return 0 if _safe_focus(t) >= 8 else 1
+
+    def _is_open(self, t: dict) -> bool:
+        return self._remaining.get(t["id"], 0) > 0
+
+    def start_day(self, day_str: str, is_valid) -> None:
+        """Re-bucket for a new (later) scheduling day and reset its skip list."""
+        self._is_valid = is_valid
+        self.skipped.clear()
+        for day_date, pos, t in self._deferred:
+            heapq.heappush(self._future[self._focus_class(t)], (day_date, pos, t))
+        self._deferred.clear()
+        for c in (0, 1):
+            for entry in self._today[c]:
+                heapq.heappush(self._overdue[c], entry)
+            self._today[c].clear()
+            future = self._future[c]
+            while future and future[0][0] <= day_str:
+                day_date, pos, t = heapq.heappop(future)
+                target = self._today if day_date == day_str else self._overdue
+                heapq.heappush(target[c], (pos, t))
+
+    def _peek(self, heap: list):
+        while heap:
+            t = heap[0][-1]
+            if not self._is_open(t) or not self._is_valid(t):
+                heapq.heappop(heap)
+            elif t["id"] in self.skipped:
+                entry = heapq.heappop(heap)
+                self._deferred.append((t["day_date"], entry[-2], t))
+            else:
+                return heap[0]
+        return None
+
+    def pick(self, prefer_high_focus: bool) -> dict | None:
+        """
+        Overdue then today's tasks in list order, falling back to future tasks
+        by day_date; the first one of the preferred focus class wins.
+        """
+        want = 0 if prefer_high_focus else 1
+        overdue = [self._peek(h) for h in self._overdue]
+        today = [self._peek(h) for h in self._today]
+        if any(overdue) or any(today):
+            if overdue[want]:
+                return overdue[want][-1]
+            if today[want]:
+                return today[want][-1]
+            return min(e for e in (overdue if any(overdue) else today) if e)[-1]
+        future = [self._peek(h) for h in self._future]
+        if future[want]:
+            return future[want][-1]
+        other = future[1 - want]
+        return other[-1] if other else None
+
+
+def _parse_hhmm(value, default: tuple[int, int]) -> tuple[int, int]:
+    """'HH:MM' -> (hour, minute), falling back to `default` on bad input."""
+    try:
+        h, m = map(int, value.split(":"))
+    except (ValueError, TypeError, AttributeError):
+        return default
+    if not (0 <= h < 24 and 0 <= m < 60):
+        return default
+    return h, m
+
+
 def generate_multi_exam_schedule(
     user: dict,
     exams: list[dict],
@@ -48,67 +159,84 @@ def generate_multi_exam_schedule(
     """
     Generates a schedule by 'pouring' tasks into available time windows.
     Strictly deterministic and respects fixed breaks and neto study hours.
+
+    Internally every time is an integer minute offset from local midnight of
+    'today' (day d starts at d * MINUTES_PER_DAY); block times are only
+    converted to UTC ISO strings when the ScheduleBlock is built.
     """
     if not tasks:
         return []
 
     # User preferences
     neto_study_hours = user.get("neto_study_hours", 4.0)
-    tz_offset = user.get("timezone_offset", 0) or 0
+    tz_offset = int(user.get("timezone_offset", 0) or 0)
     hobby_name = user.get("hobby_name") or "Hobby"
     peak_productivity = user.get("peak_productivity", "Morning") or "Morning"
 
-    try:
-        sleep_h, sleep_m = map(int, user.get("sleep_time", "23:00").split(":"))
-    except (ValueError, TypeError):
-        sleep_h, sleep_m = 23, 0
-    try:
-        wake_h_default, wake_m_default = map(int, user.get("wake_up_time", "08:00").split(":"))
-    except (ValueError, TypeError):
-        wake_h_default, wake_m_default = 8, 0
+    sleep_h, sleep_m = _parse_hhmm(user.get("sleep_time", "23:00"), (23, 0))
+    wake_h, wake_m = _parse_hhmm(user.get("wake_up_time", "08:00"), (8, 0))
     STUDY_CUTOFF_HOUR = (sleep_h - 1) % 24
     MIN_BLOCK_MIN = 30
     TASK_BUFFER_MIN = 10
+    # Sleep time relative to its day's midnight (next day if before wake-up)
+    sleep_offset = sleep_h * 60 + sleep_m + (MINUTES_PER_DAY if sleep_h < wake_h else 0)
 
     # 'Today' in user's local time
     now_utc = datetime.now(timezone.utc)
     local_now = now_utc - timedelta(minutes=tz_offset)
-    
-    # Calculate natural day start (wake-up time + 1 hour)
-    wake_h, wake_m = map(int, user.get("wake_up_time", "08:00").split(":"))
-    day_start_natural = local_now.replace(hour=wake_h, minute=wake_m, second=0, microsecond=0) + timedelta(hours=1)
-    
-    # today_start_buffer should be the LATER of natural day start OR (local_now + buffer)
-    # This prevents the "moving target" drift when refreshing during the day.
-    today_start_buffer = max(day_start_natural, local_now + timedelta(hours=start_buffer_hours))
     today_local = local_now.replace(hour=0, minute=0, second=0, microsecond=0)
-    
+    today_date = today_local.date()
+
+    # today_start_buffer is the LATER of natural day start (wake-up + 1h) OR
+    # (local_now + buffer), rounded up to the next whole minute. This prevents
+    # the "moving target" drift when refreshing during the day.
+    day_start_natural = wake_h * 60 + wake_m + 60
+    now_min = math.ceil((local_now - today_local).total_seconds() / 60 + start_buffer_hours * 60)
+    today_start_buffer = max(day_start_natural, now_min)
+
+    # ISO formatting happens only here; the UTC date string per day is cached.
+    utc_dates: dict[int, str] = {}
+
+    def _iso(local_min: int) -> str:
+        day, minute = divmod(local_min + tz_offset, MINUTES_PER_DAY)
+        date_str = utc_dates.get(day)
+        if date_str is None:
+            date_str = utc_dates[day] = (today_date + timedelta(days=day)).isoformat()
+        return f"{date_str}T{minute // 60:02d}:{minute % 60:02d}:00Z"
+
     # Exam lookup
     exam_map = {e["id"]: e for e in exams}
-    
-    # Task state
-    remaining_task_hours = {t["id"]: float(t.get("estimated_hours", 2.0)) for t in tasks if t.get("id") is not None}
+
+    # Task state (whole minutes left per task)
+    remaining_task_min = {t["id"]: round(float(t.get("estimated_hours", 2.0)) * 60) for t in tasks if t.get("id") is not None}
 
     # Determine schedule range
     if exams:
         last_exam_date_str = max(e["exam_date"] for e in exams)
         last_exam_date_str = last_exam_date_str.replace('Z', '+00:00')
         last_exam_date = datetime.fromisoformat(last_exam_date_str)
-        total_days = max(1, (last_exam_date.date() - today_local.date()).days + 1)
+        total_days = max(1, (last_exam_date.date() - today_date).days + 1)
     else:
         total_days = 14
 
     range_limit = total_days if exams else total_days + 14
-    
-    all_windows: list[tuple[str, list[WiredWindow]]] = []
+
+    week_windows = _week_windows(user, MIN_BLOCK_MIN)
+    first_weekday = today_date.weekday()
+    all_windows: list[tuple[int, list[tuple[int, int]]]] = []
     for d in range(range_limit):
-        day_local = today_local + timedelta(days=d)
-        windows = _get_windows_for_day(user, day_local, MIN_BLOCK_MIN)
+        windows = week_windows[(first_weekday + d) % 7]
         if windows:
-            all_windows.append((day_local.strftime("%Y-%m-%d"), windows))
+            base = d * MINUTES_PER_DAY
+            all_windows.append((d, [(base + s, base + e) for s, e in windows]))
 
     schedule: list[ScheduleBlock] = []
     task_splits = {}
+    candidates = _CandidatePool(tasks, remaining_task_min)
+    padding_by_day: dict[str, list[dict]] = {}
+    for t in tasks:
+        if t.get("is_padding") and t.get("day_date"):
+            padding_by_day.setdefault(t["day_date"], []).append(t)
 
     # Pre-calculation
     exam_dates_only = set()
@@ -122,17 +250,18 @@ def generate_multi_exam_schedule(
         except:
             continue
 
-    for day_str, windows in all_windows:
-        day_limit_min = neto_study_hours * 60
+    day_limit_min = round(neto_study_hours * 60)
+    current_time = None
+
+    for day_idx, windows in all_windows:
         used_on_day_min = 0
         long_break_taken = False
         last_task_was_simulation = False
         last_block_end = None
 
-        # Reconstruct day_local for this scheduling day (the loop variable from
-        # the all_windows construction above is stale by now).
-        day_local = today_local + timedelta(days=(datetime.strptime(day_str, "%Y-%m-%d").date() - today_local.date()).days)
-        current_day_date = day_local.date()
+        current_day_date = today_date + timedelta(days=day_idx)
+        day_str = current_day_date.isoformat()
+        day_base = day_idx * MINUTES_PER_DAY
 
         if current_day_date in exam_dates_only:
             continue
@@ -146,137 +275,87 @@ def generate_multi_exam_schedule(
                 return True
             return _day < exam_date_lookup[eid]
 
-        skipped_this_day = set()
-        cutoff_dt = None  # initialized here so padding/motivation can use it safely
+        candidates.start_day(day_str, _is_task_valid)
+        skipped_this_day = candidates.skipped
+        cutoff = None  # initialized here so padding/motivation can use it safely
+        if is_day_before_exam:
+            cutoff = day_base + sleep_offset - 5 * 60
 
-        for window in windows:
+        for window_start, window_end in windows:
             if used_on_day_min >= day_limit_min:
                 break
 
-            window_is_peak = _is_peak_window(window.start_local, peak_productivity)
-            window_remaining_min = min(window.capacity_min, day_limit_min - used_on_day_min)
-            current_time = window.start_local
+            window_start_h = (window_start - day_base) % MINUTES_PER_DAY // 60
+            window_is_peak = _is_peak_hour(window_start_h, peak_productivity)
+            window_remaining_min = min(window_end - window_start, day_limit_min - used_on_day_min)
+            current_time = window_start
 
             if is_day_before_exam:
-                if sleep_h < wake_h_default:
-                    sleep_dt = (day_local + timedelta(days=1)).replace(hour=sleep_h, minute=sleep_m)
-                else:
-                    sleep_dt = day_local.replace(hour=sleep_h, minute=sleep_m)
-
-                cutoff_dt = sleep_dt - timedelta(hours=5)
-                
-                if window.start_local >= cutoff_dt:
+                if window_start >= cutoff:
                     window_remaining_min = 0
-                elif window.end_local > cutoff_dt:
-                    window_remaining_min = min(window_remaining_min, (cutoff_dt - window.start_local).total_seconds() / 60)
-            
-            if day_str == today_local.strftime("%Y-%m-%d"):
-                if window.end_local <= today_start_buffer:
+                elif window_end > cutoff:
+                    window_remaining_min = min(window_remaining_min, cutoff - window_start)
+
+            if day_idx == 0:
+                if window_end <= today_start_buffer:
                     window_remaining_min = 0
-                elif window.start_local < today_start_buffer:
-                    remaining_in_window = (window.end_local - today_start_buffer).total_seconds() / 60
-                    window_remaining_min = min(remaining_in_window, day_limit_min - used_on_day_min)
+                elif window_start < today_start_buffer:
+                    window_remaining_min = min(window_end - today_start_buffer, day_limit_min - used_on_day_min)
                     current_time = today_start_buffer
 
-            while window_remaining_min >= 1.0: # Minimum window to try scheduling
-                if current_time.hour >= STUDY_CUTOFF_HOUR and current_time.hour > window.start_local.hour:
+            while window_remaining_min >= 1: # Minimum window to try scheduling
+                current_h = (current_time - day_base) % MINUTES_PER_DAY // 60
+                if current_h >= STUDY_CUTOFF_HOUR and current_h > window_start_h:
                     break
 
-                overdue_tasks = [
-                    t for t in tasks
-                    if t.get("day_date") and t.get("day_date") < day_str
-                    and remaining_task_hours.get(t["id"], 0) > 0.01
-                    and _is_task_valid(t)
-                ]
-
-                assigned_to_today = [
-                    t for t in tasks 
-                    if t.get("day_date") == day_str 
-                    and remaining_task_hours.get(t["id"], 0) > 0.01 
-                    and _is_task_valid(t)
-                ]
-
-                candidates = [t for t in (overdue_tasks + assigned_to_today) if t["id"] not in skipped_this_day]
-
-                # If no overdue/today tasks, pull forward future tasks whose exam
-                # hasn't happened yet.  This fills empty gap days (e.g. between
-                # two exams) instead of leaving them blank.
-                if not candidates:
-                    future_tasks = [
-                        t for t in tasks
-                        if t.get("day_date") and t.get("day_date") > day_str
-                        and remaining_task_hours.get(t["id"], 0) > 0.01
-                        and _is_task_valid(t)
-                        and t["id"] not in skipped_this_day
-                    ]
-                    # Sort by day_date (earliest first) so closer deadlines fill first
-                    future_tasks.sort(key=lambda t: t.get("day_date", ""))
-                    candidates = future_tasks
-
-                if not candidates:
+                task = candidates.pick(prefer_high_focus=window_is_peak)
+                if task is None:
                     window_remaining_min = 0
                     continue
 
-                def _safe_focus(t):
-                    try:
-                        return int(t.get("focus_score", 5))
-                    except (ValueError, TypeError):
-                        return 5
-
-                if window_is_peak:
-                    high_focus = [t for t in candidates if _safe_focus(t) >= 8]
-                    task = high_focus[0] if high_focus else candidates[0]
-                else:
-                    low_focus = [t for t in candidates if _safe_focus(t) < 8]
-                    task = low_focus[0] if low_focus else candidates[0]
-
                 tid = task["id"]
-                rem_h = remaining_task_hours[tid]
+                rem_min = remaining_task_min[tid]
                 is_simulation = any(keyword in task["title"] for keyword in ["סימולציה", "Simulation"])
-                
+
                 if is_simulation:
-                    take_min = rem_h * 60
+                    take_min = rem_min
                     if take_min > window_remaining_min:
                         skipped_this_day.add(tid)
                         continue
                 else:
-                    take_min = min(rem_h * 60, window_remaining_min)
-                
+                    take_min = min(rem_min, window_remaining_min)
+
                 # Fragmentation logic:
                 # If task is large but window is small, break and leave gap for padding.
                 # If task is small (fragment), schedule it anyway as long as it fits.
-                if take_min < MIN_BLOCK_MIN and (rem_h * 60) > (take_min + 0.01):
+                if take_min < MIN_BLOCK_MIN and rem_min > take_min:
                     window_remaining_min = 0 # Exit while loop for this window
                     break
-                
-                if take_min < 1.0:
-                    skipped_this_day.add(tid)
-                    continue
-                
-                end_time = current_time + timedelta(minutes=take_min)
-                
+
+                end_time = current_time + take_min
+
                 block = ScheduleBlock(
                     task_id=tid,
                     exam_id=task.get("exam_id"),
                     exam_name=exam_map.get(task.get("exam_id"), {}).get("name", "General"),
                     task_title=task["title"],
                     subject=task.get("subject"),
-                    start_time=(current_time + timedelta(minutes=tz_offset)).replace(tzinfo=timezone.utc, microsecond=0).isoformat().replace('+00:00', 'Z'),
-                    end_time=(end_time + timedelta(minutes=tz_offset)).replace(tzinfo=timezone.utc, microsecond=0).isoformat().replace('+00:00', 'Z'),
+                    start_time=_iso(current_time),
+                    end_time=_iso(end_time),
                     day_date=day_str,
                     block_type="study",
                     is_delayed=False
                 )
-                
-                if take_min >= (rem_h * 60) - 0.01 and tid not in task_splits:
+
+                if take_min >= rem_min and tid not in task_splits:
                     schedule.append(block)
                 else:
                     if tid not in task_splits:
                         task_splits[tid] = []
                     task_splits[tid].append(block)
-                
+
                 last_block_end = end_time
-                remaining_task_hours[tid] -= take_min / 60
+                remaining_task_min[tid] -= take_min
                 window_remaining_min -= take_min
                 used_on_day_min += take_min
 
@@ -287,126 +366,122 @@ def generate_multi_exam_schedule(
                 elif used_on_day_min >= (day_limit_min / 2) and not long_break_taken:
                     current_break = 60
                     long_break_taken = True
-                
+
                 last_task_was_simulation = is_simulation
-                current_time = end_time + timedelta(minutes=current_break)
+                current_time = end_time + current_break
                 window_remaining_min -= current_break
-                
-                if current_time >= window.end_local:
+
+                if current_time >= window_end:
                     break
-        
+
         # Padding
         if used_on_day_min > 0 and (day_limit_min - used_on_day_min) >= MIN_BLOCK_MIN:
             upcoming_exams = sorted([(eid, edate) for eid, edate in exam_date_lookup.items() if edate >= current_day_date], key=lambda x: x[1])
             target_exam_id = upcoming_exams[0][0] if upcoming_exams else None
 
-            padding_task = next((t for t in tasks if t.get("is_padding") and t.get("day_date") == day_str and remaining_task_hours.get(t["id"], 0) > 0.01), None)
+            padding_task = next((t for t in padding_by_day.get(day_str, ()) if remaining_task_min.get(t["id"], 0) > 0), None)
             gap_min = day_limit_min - used_on_day_min
-            
+            last_win_end = windows[-1][1]
+
             if padding_task:
-                take_min = min(remaining_task_hours[padding_task["id"]] * 60, gap_min)
+                take_min = min(remaining_task_min[padding_task["id"]], gap_min)
                 if take_min >= MIN_BLOCK_MIN:
-                    pad_end = windows[-1].end_local - timedelta(hours=1)
+                    pad_end = last_win_end - 60
                     if is_day_before_exam:
-                        pad_end = min(pad_end, cutoff_dt - timedelta(minutes=45)) # Leave room for Motivation
-                    pad_start = pad_end - timedelta(minutes=take_min)
-                    
+                        pad_end = min(pad_end, cutoff - 45) # Leave room for Motivation
+                    pad_start = pad_end - take_min
+
                     tid = padding_task["id"]
                     block = ScheduleBlock(
                         task_id=tid, exam_id=padding_task.get("exam_id"),
                         exam_name=exam_map.get(padding_task.get("exam_id"), {}).get("name", "General"),
                         task_title=padding_task["title"], subject=padding_task.get("subject", ""),
-                        start_time=(pad_start + timedelta(minutes=tz_offset)).replace(tzinfo=timezone.utc, microsecond=0).isoformat().replace("+00:00", "Z"),
-                        end_time=(pad_end + timedelta(minutes=tz_offset)).replace(tzinfo=timezone.utc, microsecond=0).isoformat().replace("+00:00", "Z"),
+                        start_time=_iso(pad_start),
+                        end_time=_iso(pad_end),
                         day_date=day_str, block_type="study"
                     )
                     if tid not in task_splits: task_splits[tid] = []
                     task_splits[tid].append(block)
-                    remaining_task_hours[padding_task["id"]] -= take_min / 60
+                    remaining_task_min[padding_task["id"]] -= take_min
                     if last_block_end is None or pad_end > last_block_end:
                         last_block_end = pad_end
-            elif windows and last_block_end is not None:
-                last_win = windows[-1]
+            elif last_block_end is not None:
                 pad_exam_id = target_exam_id
                 pad_exam = exam_map.get(pad_exam_id, {}) if pad_exam_id else (exams[0] if exams else {})
                 pad_exam_id = pad_exam.get("id")
                 pad_exam_name = pad_exam.get("name", "General")
 
                 fill_gap_min = gap_min
-                pad_start = last_block_end + timedelta(minutes=TASK_BUFFER_MIN)
+                pad_start = last_block_end + TASK_BUFFER_MIN
                 while fill_gap_min >= MIN_BLOCK_MIN:
-                    if pad_start >= last_win.end_local: break
-                    if is_day_before_exam and pad_start >= cutoff_dt - timedelta(minutes=30): break
-                    
-                    max_avail = (last_win.end_local - pad_start).total_seconds() / 60
+                    if pad_start >= last_win_end: break
+                    if is_day_before_exam and pad_start >= cutoff - 30: break
+
+                    max_avail = last_win_end - pad_start
                     if is_day_before_exam:
-                        max_avail = min(max_avail, (cutoff_dt - timedelta(minutes=35) - pad_start).total_seconds() / 60)
-                    
+                        max_avail = min(max_avail, cutoff - 35 - pad_start)
+
                     block_min = min(fill_gap_min, 120, max_avail)
                     if block_min < MIN_BLOCK_MIN: break
-                    pad_end = pad_start + timedelta(minutes=block_min)
+                    pad_end = pad_start + block_min
                     schedule.append(ScheduleBlock(
                         task_id=None, exam_id=pad_exam_id, exam_name=pad_exam_name,
                         task_title=f"חזרה מרווחת (Spaced Repetition): {pad_exam_name}",
                         subject="Review",
-                        start_time=(pad_start + timedelta(minutes=tz_offset)).replace(tzinfo=timezone.utc, microsecond=0).isoformat().replace("+00:00", "Z"),
-                        end_time=(pad_end + timedelta(minutes=tz_offset)).replace(tzinfo=timezone.utc, microsecond=0).isoformat().replace("+00:00", "Z"),
+                        start_time=_iso(pad_start),
+                        end_time=_iso(pad_end),
                         day_date=day_str, block_type="study"
                     ))
                     fill_gap_min -= block_min
                     last_block_end = pad_end
-                    pad_start = pad_end + timedelta(minutes=TASK_BUFFER_MIN)
+                    pad_start = pad_end + TASK_BUFFER_MIN
 
         # End of day sequence: Motivation -> Hobby
         mot_start = None
         mot_end = None
         if is_day_before_exam:
             # Use last_block_end if available, otherwise current_time or today_start_buffer
-            mot_start = (last_block_end + timedelta(minutes=TASK_BUFFER_MIN)) if last_block_end else current_time
-            
+            mot_start = (last_block_end + TASK_BUFFER_MIN) if last_block_end is not None else current_time
+
             # Final safety check against cutoff
-            if cutoff_dt and mot_start > cutoff_dt - timedelta(minutes=30):
-                mot_start = cutoff_dt - timedelta(minutes=30)
-            
-            mot_end = mot_start + timedelta(minutes=30)
+            if mot_start > cutoff - 30:
+                mot_start = cutoff - 30
+
+            mot_end = mot_start + 30
             schedule.append(ScheduleBlock(
                 task_id=None, exam_id=None, exam_name="Ready",
                 task_title="Finish Line: You are ready! 🏁", subject="Motivation",
-                start_time=(mot_start + timedelta(minutes=tz_offset)).replace(tzinfo=timezone.utc, microsecond=0).isoformat().replace('+00:00', 'Z'),
-                end_time=(mot_end + timedelta(minutes=tz_offset)).replace(tzinfo=timezone.utc, microsecond=0).isoformat().replace('+00:00', 'Z'),
+                start_time=_iso(mot_start),
+                end_time=_iso(mot_end),
                 day_date=day_str, block_type="study"
             ))
 
         # Hobby placement: 1 hour before sleep, but MUST be after Motivation or last study block
-        if sleep_h < wake_h_default:
-            h_end_local = (day_local + timedelta(days=1)).replace(hour=sleep_h, minute=sleep_m)
-        else:
-            h_end_local = day_local.replace(hour=sleep_h, minute=sleep_m)
-        
-        h_start_local = h_end_local - timedelta(hours=1)
-        
+        h_end_local = day_base + sleep_offset
+        h_start_local = h_end_local - 60
+
         # Guard against hobby overlapping with Motivation or last study block
-        limit_start = mot_end if mot_end else last_block_end
-        if limit_start and h_start_local < limit_start + timedelta(minutes=TASK_BUFFER_MIN):
-            h_start_local = limit_start + timedelta(minutes=TASK_BUFFER_MIN)
-            h_end_local = h_start_local + timedelta(hours=1)
+        limit_start = mot_end if mot_end is not None else last_block_end
+        if limit_start is not None and h_start_local < limit_start + TASK_BUFFER_MIN:
+            h_start_local = limit_start + TASK_BUFFER_MIN
+            h_end_local = h_start_local + 60
 
         schedule.append(ScheduleBlock(
             task_id=None, exam_id=None, exam_name="Relax",
             task_title=hobby_name, subject="Hobby",
-            start_time=(h_start_local + timedelta(minutes=tz_offset)).replace(tzinfo=timezone.utc, microsecond=0).isoformat().replace('+00:00', 'Z'),
-            end_time=(h_end_local + timedelta(minutes=tz_offset)).replace(tzinfo=timezone.utc, microsecond=0).isoformat().replace('+00:00', 'Z'),
+            start_time=_iso(h_start_local),
+            end_time=_iso(h_end_local),
             day_date=day_str, block_type="hobby"
         ))
 
     # Resolve split tasks (ensure parts are correctly labeled and avoid duplication)
     final_schedule = []
-    
+
     # First, add all blocks that were NOT split
     for block in schedule:
         if block.task_id not in task_splits:
             final_schedule.append(block)
-            
+
     # Then, add all parts of split tasks
     for tid, blocks in task_splits.items():
         total_parts = len(blocks)
@@ -420,55 +495,77 @@ def generate_multi_exam_schedule(
     final_schedule.sort(key=lambda b: (b.day_date, b.start_time))
     return final_schedule
 
+
 def _get_windows_for_day(user: dict, day_local: datetime, min_block_min: int = 45) -> list[WiredWindow]:
+    midnight = day_local.replace(hour=0, minute=0, second=0, microsecond=0)
+    return [
+        WiredWindow(midnight + timedelta(minutes=s), midnight + timedelta(minutes=e))
+        for s, e in _day_windows(user, day_local.weekday(), min_block_min)
+    ]
+
+
+def _day_windows(user: dict, weekday: int, min_block_min: int = 45) -> list[tuple[int, int]]:
+    """
+    Study windows for one day as (start, end) minute offsets from that day's
+    midnight; values past MINUTES_PER_DAY run into the next day.
+    """
+    return list(_week_windows(user, min_block_min)[weekday])
+
+
+def _week_windows(user: dict, min_block_min: int) -> tuple[tuple[tuple[int, int], ...], ...]:
+    """
+    The 7 weekday window templates (Monday first) for this user's settings.
+    Memoized on the settings themselves, so a profile change simply misses
+    the cache instead of needing explicit invalidation.
+    """
+    key = (
+        user.get("wake_up_time", "08:00"),
+        user.get("sleep_time", "23:00"),
+        user.get("study_hours_preference", '["morning", "afternoon"]'),
+        user.get("fixed_breaks", "[]"),
+        bool(user.get("hobby_name")),
+        min_block_min,
+    )
     try:
-        wake_h, wake_m = map(int, user.get("wake_up_time", "08:00").split(":"))
-    except (ValueError, TypeError):
-        wake_h, wake_m = 8, 0
-    try:
-        sleep_h, sleep_m = map(int, user.get("sleep_time", "23:00").split(":"))
-    except (ValueError, TypeError):
-        sleep_h, sleep_m = 23, 0
-        
-    start_time_natural = day_local.replace(hour=wake_h, minute=wake_m) + timedelta(hours=1)
+        return _week_windows_cached(*key)
+    except TypeError:  # unhashable settings (not from the DB) - skip the cache
+        return _week_windows_cached.__wrapped__(*key)
+
+
+@lru_cache(maxsize=256)
+def _week_windows_cached(wake_up_time, sleep_time, study_hours_preference, fixed_breaks_json,
+                         has_hobby: bool, min_block_min: int) -> tuple[tuple[tuple[int, int], ...], ...]:
+    wake_h, wake_m = _parse_hhmm(wake_up_time, (8, 0))
+    sleep_h, sleep_m = _parse_hhmm(sleep_time, (23, 0))
+
+    start_time_natural = wake_h * 60 + wake_m + 60
+    end_time_natural = sleep_h * 60 + sleep_m
     if sleep_h < wake_h:
-        end_time_natural = (day_local + timedelta(days=1)).replace(hour=sleep_h, minute=sleep_m)
-    else:
-        end_time_natural = day_local.replace(hour=sleep_h, minute=sleep_m)
-    
-    if start_time_natural >= end_time_natural: return []
+        end_time_natural += MINUTES_PER_DAY
+
+    if start_time_natural >= end_time_natural: return ((),) * 7
 
     # Intersection with study_hours_preference
     try:
-        pref_str = user.get("study_hours_preference", '["morning", "afternoon"]')
-        preferences = [p.lower() for p in json.loads(pref_str)]
+        preferences = [p.lower() for p in json.loads(study_hours_preference)]
     except:
         preferences = ["morning", "afternoon"]
-    
+
     if not preferences:
         preferences = ["morning", "afternoon", "night"]
 
-    PREF_DEFINITIONS = {
-        "morning": (8, 14),
-        "afternoon": (14, 20),
-        "night": (20, 2), # wraps to next day
-    }
-
     preference_windows = []
     for pref in preferences:
         if pref not in PREF_DEFINITIONS: continue
         ph_start, ph_end = PREF_DEFINITIONS[pref]
-        
-        p_start = day_local.replace(hour=ph_start, minute=0)
-        if ph_end < ph_start:
-            p_end = (day_local + timedelta(days=1)).replace(hour=ph_end, minute=0)
-        else:
-            p_end = day_local.replace(hour=ph_end, minute=0)
-            
+
+        p_start = ph_start * 60
+        p_end = ph_end * 60 + (MINUTES_PER_DAY if ph_end < ph_start else 0)
+
         # Intersect [p_start, p_end] with [start_time_natural, end_time_natural]
         intersect_start = max(p_start, start_time_natural)
         intersect_end = min(p_end, end_time_natural)
-        
+
         if intersect_start < intersect_end:
             preference_windows.append((intersect_start, intersect_end))
 
@@ -479,45 +576,47 @@ def _get_windows_for_day(user: dict, day_local: datetime, min_block_min: int = 4
         # Merge overlapping preference windows and sort them
         preference_windows.sort()
         merged = []
-        if preference_windows:
-            curr_s, curr_e = preference_windows[0]
-            for i in range(1, len(preference_windows)):
-                next_s, next_e = preference_windows[i]
-                if next_s <= curr_e:
-                    curr_e = max(curr_e, next_e)
-                else:
-                    merged.append((curr_s, curr_e))
-                    curr_s, curr_e = next_s, next_e
-            merged.append((curr_s, curr_e))
+        curr_s, curr_e = preference_windows[0]
+        for next_s, next_e in preference_windows[1:]:
+            if next_s <= curr_e:
+                curr_e = max(curr_e, next_e)
+            else:
+                merged.append((curr_s, curr_e))
+                curr_s, curr_e = next_s, next_e
+        merged.append((curr_s, curr_e))
         windows = merged
 
-    # Subtract fixed breaks
+    # Hobby (last 1 hour before sleep) is blocked every day
+    if has_hobby:
+        windows = _subtract_range(windows, end_time_natural - 60, end_time_natural)
+
+    # Subtract fixed breaks per weekday
     try:
-        fixed_breaks = json.loads(user.get("fixed_breaks", "[]"))
+        fixed_breaks = json.loads(fixed_breaks_json)
     except:
         fixed_breaks = []
-    py_day = day_local.weekday()
-    for brk in fixed_breaks:
-        if py_day in brk.get("days", []):
+    week = []
+    for weekday in range(7):
+        day_windows = windows
+        for brk in fixed_breaks:
             try:
-                b_start = day_local.replace(hour=int(brk["start"].split(":")[0]), minute=int(brk["start"].split(":")[1]))
-                b_end = day_local.replace(hour=int(brk["end"].split(":")[0]), minute=int(brk["end"].split(":")[1]))
+                if weekday not in brk.get("days", []):
+                    continue
+                b_start = _parse_hhmm(brk["start"], None)
+                b_end = _parse_hhmm(brk["end"], None)
+                if b_start is None or b_end is None:
+                    continue
+                b_start = b_start[0] * 60 + b_start[1]
+                b_end = b_end[0] * 60 + b_end[1]
                 if b_end <= b_start:
-                    b_end = b_end + timedelta(days=1)
-                windows = _subtract_range(windows, b_start, b_end)
+                    b_end += MINUTES_PER_DAY
+                day_windows = _subtract_range(day_windows, b_start, b_end)
             except: continue
-    
-    # Subtract hobby (last 1 hour before sleep)
-    hobby_name = user.get("hobby_name")
-    if hobby_name:
-        h_end = end_time_natural
-        h_start = h_end - timedelta(hours=1)
-        windows = _subtract_range(windows, h_start, h_end)
-        
-    res = [WiredWindow(s, e) for s, e in windows if (e - s).total_seconds() >= min_block_min * 60]
-    return res
-
-def _subtract_range(windows: list[tuple[datetime, datetime]], s: datetime, e: datetime) -> list[tuple[datetime, datetime]]:
+        week.append(tuple((s, e) for s, e in day_windows if e - s >= min_block_min))
+    return tuple(week)
+
+
+def _subtract_range(windows: list[tuple], s, e) -> list[tuple]:
     new_windows = []
     for w_start, w_end in windows:
         if s < w_end and e > w_start:
@@ -0,0 +1,226 @@
+"""
+Deterministic Strategist — assigns approved tasks to study days without an LLM.
+
+Same contract as the Strategist LLM call in ExamBrain.call_strategist: every
+approved task comes back as a copy with day_index (0 = today),
+internal_priority (1-100, higher goes first within a day) and is_padding=False.
+The Enforcer (brain/scheduler.py) then turns days into time blocks.
+
+Rules, roughly in the order they bind:
+  1. Buffer days — an exam's tasks end by exam_day - buffer_days - 1.
+  2. Dependencies — a task never lands on a day before the task it depends on.
+  3. Anchoring — topic "simulation" goes as late as possible, "review" first.
+  4. Daily quota — days fill up to neto_study_hours (today: only until sleep time).
+  5. Single focus — exams are planned earliest-first, so consecutive days
+     belong to one exam instead of alternating.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+SIMULATION = "simulation"
+REVIEW = "review"
+
+
+def _anchor(task: dict) -> str | None:
+    topic = str(task.get("topic") or "").strip().lower()
+    if topic == SIMULATION:
+        return SIMULATION
+    if topic == REVIEW:
+        return REVIEW
+    return None
+
+
+def _hours(task: dict) -> float:
+    try:
+        return max(0.5, min(6.0, float(task.get("estimated_hours", 1.0))))
+    except (ValueError, TypeError):
+        return 1.0
+
+
+def _focus(task: dict) -> int:
+    try:
+        return int(task.get("focus_score", 5))
+    except (ValueError, TypeError):
+        return 5
+
+
+def _exam_days(exams: list[dict], today) -> dict:
+    """exam_id -> days from today until the exam (exams with unparseable dates are left out)."""
+    days = {}
+    for e in exams:
+        try:
+            exam_date = datetime.fromisoformat(e["exam_date"].replace("Z", "+00:00"))
+            days[e["id"]] = (exam_date.date() - today).days
+        except (KeyError, ValueError, TypeError, AttributeError):
+            continue
+    return days
+
+
+def _hours_left_today(user: dict, local_now: datetime, quota: float) -> float:
+    try:
+        h, m = map(int, str(user.get("sleep_time") or "23:00").split(":"))
+    except ValueError:
+        h, m = 23, 0
+    if h < 6:  # sleeping after midnight
+        h += 24
+    left = (h * 60 + m - (local_now.hour * 60 + local_now.minute)) / 60
+    return max(0.0, min(quota, left))
+
+
+def _topological(tasks: list[dict], deps: list[int | None]) -> list[int]:
+    """Task positions ordered so every task comes after its dependency (stable;
+    tasks caught in a dependency cycle keep their original order at the end)."""
+    children = {}
+    for pos, dep in enumerate(deps):
+        if dep is not None:
+            children.setdefault(dep, []).append(pos)
+    order, seen = [], set()
+    for pos in range(len(tasks)):
+        if deps[pos] is not None or pos in seen:
+            continue
+        stack = [pos]
+        while stack:
+            p = stack.pop()
+            if p in seen:
+                continue
+            seen.add(p)
+            order.append(p)
+            stack.extend(reversed(children.get(p, [])))
+    order += [p for p in range(len(tasks)) if p not in seen]
+    return order
+
+
+def assign_days(approved_tasks: list[dict], exams: list[dict], user: dict, local_now: datetime) -> list[dict]:
+    """Assign every approved task a day_index and internal_priority (see module docstring)."""
+    if not approved_tasks:
+        return []
+
+    today = local_now.date()
+    quota = float(user.get("neto_study_hours") or 4.0)
+    buffer_days = int(user.get("buffer_days") or 0)
+
+    exam_days = _exam_days(exams, today)
+    days_available = max([1] + list(exam_days.values()))
+    last_day = days_available - 1
+
+    def window(exam_id) -> tuple[int, int]:
+        """[first, last] study day for an exam's tasks."""
+        if exam_id not in exam_days:
+            return 0, last_day
+        exam_day = exam_days[exam_id]
+        last = min(exam_day - buffer_days - 1, last_day)
+        if last < 0:
+            # Too close to the exam to honour the buffer: use whatever is left before it.
+            last = max(0, min(exam_day - 1, last_day))
+        return 0, last
+
+    capacity = [quota] * days_available
+    capacity[0] = _hours_left_today(user, local_now, quota)
+    load = [0.0] * days_available
+
+    pos_by_index = {}
+    for pos, t in enumerate(approved_tasks):
+        pos_by_index.setdefault(t.get("task_index", pos), pos)
+    deps = []
+    for pos, t in enumerate(approved_tasks):
+        dep = pos_by_index.get(t.get("dependency_id")) if t.get("dependency_id") is not None else None
+        deps.append(dep if dep != pos else None)
+    has_dependents = {d for d in deps if d is not None}
+
+    # Earliest exam first; tasks whose exam has no date go last.
+    exam_rank = {eid: (day, eid) for eid, day in exam_days.items()}
+
+    def exam_key(pos):
+        return exam_rank.get(approved_tasks[pos].get("exam_id"), (days_available, 0))
+
+    day_of = {}
+
+    def fits(d, hours):
+        return load[d] + hours <= capacity[d] + 1e-9
+
+    def place(pos, d):
+        day_of[pos] = d
+        load[d] += _hours(approved_tasks[pos])
+
+    # Pass 1: simulations, latest day with room first (leaving the exam's last
+    # study day to the follow-up review when the simulation has one).
+    simulations = sorted(
+        (p for p, t in enumerate(approved_tasks) if _anchor(t) == SIMULATION),
+        key=lambda p: (exam_key(p), p),
+    )
+    for pos in simulations:
+        first, last = window(approved_tasks[pos].get("exam_id"))
+        latest = last - 1 if pos in has_dependents and last > first else last
+        hours = _hours(approved_tasks[pos])
+        candidates = range(latest, first - 1, -1)
+        d = next((d for d in candidates if fits(d, hours)), None)
+        if d is None:
+            d = min(candidates, key=lambda d: (load[d] - capacity[d], -d))
+        place(pos, d)
+
+    # Pass 2: everything else, exam by exam (earliest exam first, reviews at the
+    # front), each on the earliest day with room after its prerequisite.
+    topo = _topological(approved_tasks, deps)
+    topo_rank = {p: i for i, p in enumerate(topo)}
+    depth = {}
+    for pos in topo:
+        depth[pos] = depth.get(deps[pos], -1) + 1 if deps[pos] is not None else 0
+
+    def place_earliest(pos):
+        """Place pos, after first placing its unplaced prerequisites (iteratively,
+        stopping where the chain loops back on itself)."""
+        chain, in_chain = [pos], {pos}
+        while (dep := deps[chain[-1]]) is not None and dep not in day_of and dep not in in_chain:
+            chain.append(dep)
+            in_chain.add(dep)
+        for p in reversed(chain):
+            place_after_prerequisite(p)
+
+    def place_after_prerequisite(pos):
+        dep = deps[pos]
+        first, last = window(approved_tasks[pos].get("exam_id"))
+        earliest = min(max(first, day_of.get(dep, first)), last)
+        hours = _hours(approved_tasks[pos])
+        candidates = range(earliest, last + 1)
+        d = next((d for d in candidates if fits(d, hours)), None)
+        if d is None:
+            d = min(candidates, key=lambda d: (load[d] - capacity[d], d))
+        place(pos, d)
+
+    rest = sorted(
+        (p for p in range(len(approved_tasks)) if p not in day_of),
+        key=lambda p: (exam_key(p), _anchor(approved_tasks[p]) != REVIEW, topo_rank[p]),
+    )
+    for pos in rest:
+        if pos not in day_of:
+            place_earliest(pos)
+
+    # Pass 3: enforce dependency order wherever the dependent's window allows it
+    # (a simulation placed before a late prerequisite moves after it).
+    for pos in topo:
+        dep = deps[pos]
+        if dep is not None and day_of[pos] < day_of[dep]:
+            _, last = window(approved_tasks[pos].get("exam_id"))
+            moved = max(day_of[pos], min(day_of[dep], last))
+            load[day_of[pos]] -= _hours(approved_tasks[pos])
+            place(pos, moved)
+
+    # Priority within a day: prerequisites first, then exam order, then higher focus.
+    by_day = {}
+    for pos, d in day_of.items():
+        by_day.setdefault(d, []).append(pos)
+    priority = {}
+    for d, positions in by_day.items():
+        positions.sort(key=lambda p: (depth[p], exam_key(p), -_focus(approved_tasks[p]), topo_rank[p]))
+        for rank, pos in enumerate(positions):
+            priority[pos] = max(1, 100 - rank)
+
+    result = []
+    for pos, t in enumerate(approved_tasks):
+        task = dict(t)
+        task["day_index"] = day_of[pos]
+        task["internal_priority"] = priority[pos]
+        task["is_padding"] = False
+        result.append(task)
+    return result
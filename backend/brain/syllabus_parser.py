@@ -1,25 +1,24 @@
-"""Syllabus Parser — Extracts study tasks from PDF using PyMuPDF + Claude AI."""
+"""Syllabus Parser — Extracts study tasks from PDF using PyMuPDF + Claude AI (via brain/llm.py)."""
 from __future__ import annotations
 
+import asyncio
 import json
 import os
-import fitz
-import anthropic
 
+from brain import llm
+from brain.pdf_text import extract_pages_from_file
 
-def extract_text_from_pdf(pdf_bytes: bytes, max_pages: int = None) -> str:
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    text = ""
-    for i, page in enumerate(doc):
-        if max_pages is not None and i >= max_pages:
-            break
-        text += page.get_text() + "\n"
-    doc.close()
-    return text
 
+def extract_text_from_pdf(file_path: str, max_pages: int = None, digest: str = None) -> str:
+    pages = extract_pages_from_file(file_path, digest)
+    if max_pages is not None:
+        pages = pages[:max_pages]
+    return "".join(page + "\n" for page in pages)
 
-def extract_syllabus_context_with_ai(pdf_bytes: bytes) -> dict:
-    text = extract_text_from_pdf(pdf_bytes, max_pages=5)
+
+async def extract_syllabus_context_with_ai(file_path: str, digest: str = None, user_id: int = None) -> dict:
+    loop = asyncio.get_running_loop()
+    text = await loop.run_in_executor(None, extract_text_from_pdf, file_path, 5, digest)
     if len(text.strip()) < 50:
         return {"topics": [], "intensity": 3, "objectives": []}
 
@@ -28,7 +27,6 @@ def extract_syllabus_context_with_ai(pdf_bytes: bytes) -> dict:
         # Fallback if no API key
         return {"topics": [], "intensity": 3, "objectives": ["Syllabus uploaded (no AI analysis)"]}
 
-    client = anthropic.Anthropic(api_key=api_key)
     prompt = f"""Analyze this university syllabus and create a pedagogical digest for study planning.
 Focus on:
 1. Topics: Key subjects/modules covered.
@@ -42,12 +40,9 @@ Syllabus text:
 {text[:10000]}
 ---"""
 
-    message = client.messages.create(
-        model="claude-3-haiku-20240307",
-        max_tokens=1000,
-        messages=[{"role": "user", "content": prompt}],
+    response_text = await llm.complete_text(
+        "anthropic/claude-3-haiku-20240307", prompt, user_id=user_id, max_tokens=1000,
     )
-    response_text = message.content[0].text.strip()
     if response_text.startswith("```"):
         response_text = response_text.split("\n", 1)[1]
         response_text = response_text.rsplit("```", 1)[0]
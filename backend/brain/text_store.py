@@ -0,0 +1,61 @@
+"""Content-addressed store for the extracted text of exam files.
+
+The text lives in text_blobs, keyed by the SHA-256 of the text; exam_files
+rows only carry that text_hash. Listing or joining exam_files therefore never
+drags whole documents through SQLite, identical uploads (the same syllabus
+from every student of a course) are stored once, and the Auditor loads the
+text it actually packs with get_texts(). Large texts are stored zlib-compressed
+(server/compression.py).
+
+All functions take the caller's connection and leave committing to it.
+"""
+
+import hashlib
+
+from server.compression import pack_text, unpack_text
+
+# Stay well under SQLite's bound-parameter limit.
+_IN_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def put_text(db, text: str | None) -> str | None:
+    """Store text (if not already stored) and return its hash; None for empty text."""
+    if not text:
+        return None
+    key = text_hash(text)
+    db.execute(
+        "INSERT OR IGNORE INTO text_blobs (hash, text, char_count) VALUES (?, ?, ?)",
+        (key, pack_text(text), len(text)),
+    )
+    return key
+
+
+def get_texts(db, hashes) -> dict[str, str]:
+    """hash -> text for the given hashes (None and unknown hashes are skipped)."""
+    keys = list({h for h in hashes if h})
+    texts = {}
+    for start in range(0, len(keys), _IN_BATCH):
+        batch = keys[start:start + _IN_BATCH]
+        rows = db.execute(
+            f"SELECT hash, text FROM text_blobs WHERE hash IN ({','.join('?' * len(batch))})", batch
+        ).fetchall()
+        texts.update((row["hash"], unpack_text(row["text"])) for row in rows)
+    return texts
+
+
+def release_texts(db, hashes) -> None:
+    """Delete the given blobs unless another exam file still points to them.
+    Call after deleting exam_files rows, with the hashes those rows carried."""
+    keys = list({h for h in hashes if h})
+    for start in range(0, len(keys), _IN_BATCH):
+        batch = keys[start:start + _IN_BATCH]
+        db.execute(
+            f"""DELETE FROM text_blobs
+                WHERE hash IN ({','.join('?' * len(batch))})
+                  AND NOT EXISTS (SELECT 1 FROM exam_files WHERE exam_files.text_hash = text_blobs.hash)""",
+            batch,
+        )
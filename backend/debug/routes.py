@@ -5,9 +5,11 @@ from pydantic import BaseModel
 from typing import Optional, Any
 from datetime import datetime, timezone, timedelta
 from server.database import get_db
-from auth.utils import get_current_user
+from auth.utils import get_current_user, invalidate_user_session
 from notifications.utils import send_to_user
 from gamification.utils import update_user_xp, update_streak, _today_in_tz
+from brain import llm
+from brain.text_store import release_texts
 
 router = APIRouter()
 
@@ -247,10 +249,15 @@ def reset_onboarding(current_user: dict = Depends(get_current_user)):
     try:
         db.execute("DELETE FROM schedule_blocks WHERE user_id = ?", (user_id,))
         db.execute("DELETE FROM tasks WHERE user_id = ?", (user_id,))
+        text_hashes = [r["text_hash"] for r in db.execute(
+            "SELECT text_hash FROM exam_files WHERE exam_id IN (SELECT id FROM exams WHERE user_id = ?)", (user_id,)
+        ).fetchall()]
         db.execute("DELETE FROM exam_files WHERE exam_id IN (SELECT id FROM exams WHERE user_id = ?)", (user_id,))
+        release_texts(db, text_hashes)
         db.execute("DELETE FROM exams WHERE user_id = ?", (user_id,))
         db.execute("UPDATE users SET onboarding_completed = 0 WHERE id = ?", (user_id,))
         db.commit()
+        invalidate_user_session(user_id)
         return {"status": "ok", "message": "Onboarding state reset. All exams, tasks, and blocks deleted."}
     finally:
         db.close()
@@ -264,6 +271,13 @@ def restore_onboarding(current_user: dict = Depends(get_current_user)):
     try:
         db.execute("UPDATE users SET onboarding_completed = 1 WHERE id = ?", (user_id,))
         db.commit()
+        invalidate_user_session(user_id)
         return {"status": "ok", "message": "Onboarding flag restored. Dashboard will load on next visit."}
     finally:
         db.close()
+
+
+@router.get("/llm-metrics")
+def llm_metrics(current_user: dict = Depends(get_current_user)):
+    """Per-model LLM gateway counters: calls, errors, retries, coalesced duplicates, latency, tokens."""
+    return llm.metrics_snapshot()
@@ -2,31 +2,31 @@
 
 import os
 import shutil
-import json
-import asyncio
-import fitz  # PyMuPDF
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
 from typing import List
 from server.database import get_db
+from server.compression import pack_json
 from server.config import UPLOAD_DIR
 from auth.utils import get_current_user
 from exams.schemas import ExamCreate, ExamUpdate, ExamResponse, ExamFileResponse
 from brain.syllabus_parser import extract_syllabus_context_with_ai
+from brain.context_packer import PAGE_BREAK
+from brain.pdf_text import extract_file_pages
+from brain.text_store import put_text, release_texts
+from exams.utils import save_upload
 
 router = APIRouter()
 
 
-async def process_syllabus_background(exam_id: int, content: bytes):
+async def process_syllabus_background(exam_id: int, user_id: int, file_path: str, content_digest: str):
     """Process syllabus in background and save context to DB."""
     try:
-        # Run synchronous PDF/AI logic in threadpool to avoid blocking event loop
-        loop = asyncio.get_event_loop()
-        digest = await loop.run_in_executor(None, extract_syllabus_context_with_ai, content)
+        digest = await extract_syllabus_context_with_ai(file_path, content_digest, user_id)
         
         db = get_db()
         db.execute(
             "UPDATE exams SET parsed_context = ? WHERE id = ?",
-            (json.dumps(digest), exam_id)
+            (pack_json(digest), exam_id)
         )
         db.commit()
         db.close()
@@ -96,7 +96,11 @@ def delete_exam(exam_id: int, current_user: dict = Depends(get_current_user)):
     if os.path.exists(exam_dir):
         shutil.rmtree(exam_dir)
 
+    text_hashes = [
+        r["text_hash"] for r in db.execute("SELECT text_hash FROM exam_files WHERE exam_id = ?", (exam_id,)).fetchall()
+    ]
     db.execute("DELETE FROM exams WHERE id = ?", (exam_id,))
+    release_texts(db, text_hashes)
     db.commit()
     db.close()
     return {"message": "Exam deleted"}
@@ -164,35 +168,28 @@ async def upload_exam_file(
     safe_name = file.filename.replace("/", "_").replace("\\", "_")
     file_path = os.path.join(exam_dir, safe_name)
 
-    content = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
+    # Streamed to disk chunk by chunk; the upload is never held in memory as a whole.
+    file_size, content_digest = await save_upload(file, file_path)
 
     # Process syllabus in background if it's a PDF and type is syllabus
     if file_type == "syllabus" and safe_name.lower().endswith(".pdf"):
-        background_tasks.add_task(process_syllabus_background, exam_id, content)
+        background_tasks.add_task(
+            process_syllabus_background, exam_id, current_user["id"], file_path, content_digest
+        )
 
     # Extract full PDF text at upload time for ALL PDF files (stored for Auditor use)
     extracted_text = None
     if safe_name.lower().endswith(".pdf"):
-        def _extract_pdf_text(pdf_bytes: bytes) -> str:
-            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-            texts = [page.get_text() for page in doc]
-            doc.close()
-            return "\n".join(texts)
-
         try:
-            loop = asyncio.get_event_loop()
-            extracted_text = await loop.run_in_executor(None, _extract_pdf_text, content)
+            extracted_text = PAGE_BREAK.join(await extract_file_pages(file_path, content_digest))
         except Exception:
             extracted_text = ""
 
-    file_size = len(content)
     try:
         cursor = db.execute(
-            """INSERT INTO exam_files (exam_id, filename, file_path, file_type, file_size, extracted_text)
+            """INSERT INTO exam_files (exam_id, filename, file_path, file_type, file_size, text_hash)
                VALUES (?, ?, ?, ?, ?, ?)""",
-            (exam_id, safe_name, file_path, file_type, file_size, extracted_text)
+            (exam_id, safe_name, file_path, file_type, file_size, put_text(db, extracted_text))
         )
         db.commit()
         file_id = cursor.lastrowid
@@ -209,7 +206,7 @@ async def upload_exam_file(
 def get_exam_files(exam_id: int, current_user: dict = Depends(get_current_user)):
     db = get_db()
     rows = db.execute(
-        """SELECT ef.* FROM exam_files ef
+        """SELECT ef.id, ef.exam_id, ef.filename, ef.file_type, ef.file_size FROM exam_files ef
            JOIN exams e ON ef.exam_id = e.id
            WHERE ef.exam_id = ? AND e.user_id = ?""",
         (exam_id, current_user["id"])
@@ -222,7 +219,7 @@ def get_exam_files(exam_id: int, current_user: dict = Depends(get_current_user))
 def delete_exam_file(file_id: int, current_user: dict = Depends(get_current_user)):
     db = get_db()
     row = db.execute(
-        """SELECT ef.* FROM exam_files ef
+        """SELECT ef.file_path, ef.text_hash FROM exam_files ef
            JOIN exams e ON ef.exam_id = e.id
            WHERE ef.id = ? AND e.user_id = ?""",
         (file_id, current_user["id"])
@@ -235,6 +232,7 @@ def delete_exam_file(file_id: int, current_user: dict = Depends(get_current_user
         os.remove(row["file_path"])
 
     db.execute("DELETE FROM exam_files WHERE id = ?", (file_id,))
+    release_texts(db, [row["text_hash"]])
     db.commit()
     db.close()
     return {"message": "File deleted"}
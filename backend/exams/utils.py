@@ -0,0 +1,28 @@
+"""Upload helpers shared by exam file upload and onboarding."""
+
+import hashlib
+import os
+from fastapi import UploadFile
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def save_upload(upload: UploadFile, file_path: str) -> tuple[int, str]:
+    """Stream an upload to file_path in fixed-size chunks, hashing as it goes.
+
+    Memory use stays at one chunk no matter how large the file is.
+    Returns (size in bytes, SHA-256 hex digest); the partial file is removed on failure.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(file_path, "wb") as f:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return size, digest.hexdigest()
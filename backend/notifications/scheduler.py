@@ -2,21 +2,27 @@
 Push notification scheduler.
 Runs as a background task inside FastAPI using APScheduler.
 Every minute: scans upcoming schedule_blocks, determines which users need a notification
-based on their notif_timing offset, generates a Claude WhatsApp-friend message, and sends
-it via Web Push using pywebpush.
+based on their notif_timing offset, and sends them via Web Push (pywebpush on a thread pool).
+The Claude WhatsApp-friend texts are generated ahead of time (when schedules are written and
+periodically) into the notification_messages cache, so sending never waits on the LLM.
 """
 
+import asyncio
+import hashlib
 import json
 import os
 import logging
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from typing import Optional
 
-import anthropic
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
+from server.config import (
+    NOTIF_LLM_CONCURRENCY, NOTIF_MESSAGE_TTL_HOURS, NOTIF_PREGEN_HORIZON_HOURS, NOTIF_PREGEN_INTERVAL_MINUTES,
+)
 from server.database import get_db
-from notifications.utils import send_to_user
+from brain import llm
+from notifications.utils import send_to_users
 
 logger = logging.getLogger(__name__)
 
@@ -27,165 +33,245 @@ TIMING_OFFSETS = {
     "30_before": 30,
 }
 
-_anthropic = anthropic.AsyncAnthropic()
+# Reminder lead time per user, in SQL (mirrors TIMING_OFFSETS).
+_LEAD_MINUTES_SQL = "CASE u.notif_timing " + " ".join(
+    f"WHEN '{timing}' THEN {minutes}" for timing, minutes in TIMING_OFFSETS.items()
+) + " ELSE 0 END"
+
+# Bump when the prompt below changes so cached messages are regenerated.
+MESSAGE_PROMPT_VERSION = 1
+MESSAGE_MODEL = "anthropic/claude-haiku-4-5-20251001"
+
+_scheduler: Optional[AsyncIOScheduler] = None
+
+
+def _start_message(task_title: str) -> str:
+    return f"הלוז מתחיל! {task_title} — מתחילים עכשיו 📚"
+
+
+def _fallback_message(task_title: str, minutes_until: int) -> str:
+    return f"Hey! {task_title} in {minutes_until} min. You got this 💪"
 
 
 async def _generate_message(subject: str, task_title: str, minutes_until: int) -> str:
-    """Call Claude to generate a WhatsApp-friend style motivational message."""
-    if minutes_until <= 0:
-        return f"הלוז מתחיל! {task_title} — מתחילים עכשיו 📚"
+    """Call Claude to generate a WhatsApp-friend style motivational message.
+    Raises on failure so callers can decide whether to cache a fallback."""
+    prompt = (
+        f"Write a very short, humorous, WhatsApp-style message reminding the user about "
+        f"their upcoming study session for {task_title} ({subject}) in {minutes_until} minutes. "
+        f"Use emojis. Sound like a funny, slightly sarcastic friend, NOT a robot app. "
+        f"Keep it under 120 characters. One sentence only."
+    )
+    return await llm.complete_text(MESSAGE_MODEL, prompt, max_tokens=80, timeout=15.0)
+
+
+def _message_key(subject: str, task_title: str, minutes_until: int) -> str:
+    """Content address of a reminder text: same title/subject/lead time → same message,
+    shared across blocks and users."""
+    raw = json.dumps([MESSAGE_PROMPT_VERSION, MESSAGE_MODEL, subject, task_title, minutes_until], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _block_message_params(block: dict) -> tuple[str, str]:
+    return block["exam_name"] or "your exam", block["task_title"] or "Study session"
+
+
+# ─── Message pre-generation ──────────────────────────────────
+
+async def _pregenerate_messages(user_id: Optional[int] = None):
+    """
+    Write reminder texts for upcoming, un-notified blocks into notification_messages
+    ahead of time, so the minute tick never waits on the LLM.
+    Runs for one user right after their schedule is written, and periodically
+    for everybody to cover TTL expiry and blocks written elsewhere.
+    """
+    now_epoch = int(datetime.now(timezone.utc).timestamp())
+    db = get_db()
     try:
-        prompt = (
-            f"Write a very short, humorous, WhatsApp-style message reminding the user about "
-            f"their upcoming study session for {task_title} ({subject}) in {minutes_until} minutes. "
-            f"Use emojis. Sound like a funny, slightly sarcastic friend, NOT a robot app. "
-            f"Keep it under 120 characters. One sentence only."
+        db.execute("DELETE FROM notification_messages WHERE expires_at < ?", (now_epoch,))
+        db.commit()
+
+        params = [now_epoch, now_epoch + NOTIF_PREGEN_HORIZON_HOURS * 3600]
+        user_filter = ""
+        if user_id is not None:
+            user_filter = "AND b.user_id = ?"
+            params.append(user_id)
+        rows = db.execute(
+            f"""SELECT DISTINCT b.task_title, b.exam_name, {_LEAD_MINUTES_SQL} AS lead_min
+               FROM schedule_blocks b
+               JOIN users u ON u.id = b.user_id
+               WHERE b.push_notified = 0
+                 AND b.start_utc_epoch BETWEEN ? AND ?
+                 AND b.block_type IN ('study', 'hobby')
+                 AND b.completed = 0
+                 AND u.notif_per_task = 1
+                 AND EXISTS (SELECT 1 FROM push_subscriptions ps WHERE ps.user_id = u.id)
+                 {user_filter}""",
+            params
+        ).fetchall()
+
+        wanted = {}
+        for r in rows:
+            if r["lead_min"] <= 0:
+                continue  # "starting now" messages are a fixed template
+            subject, task_title = _block_message_params(dict(r))
+            wanted[_message_key(subject, task_title, r["lead_min"])] = (subject, task_title, r["lead_min"])
+        if not wanted:
+            return
+
+        keys = list(wanted)
+        placeholders = ",".join("?" * len(keys))
+        cached = {
+            r["cache_key"] for r in db.execute(
+                f"SELECT cache_key FROM notification_messages WHERE cache_key IN ({placeholders})", keys
+            ).fetchall()
+        }
+        missing = [k for k in keys if k not in cached]
+        if not missing:
+            return
+
+        semaphore = asyncio.Semaphore(NOTIF_LLM_CONCURRENCY)
+
+        async def _one(key):
+            async with semaphore:
+                try:
+                    return key, await _generate_message(*wanted[key])
+                except Exception as e:
+                    logger.warning(f"Claude message generation failed: {e}")
+                    return key, None
+
+        results = await asyncio.gather(*(_one(k) for k in missing))
+        expires_at = now_epoch + NOTIF_MESSAGE_TTL_HOURS * 3600
+        db.executemany(
+            "INSERT OR REPLACE INTO notification_messages (cache_key, body, created_at, expires_at) VALUES (?, ?, ?, ?)",
+            [(key, body, now_epoch, expires_at) for key, body in results if body],
         )
-        msg = await _anthropic.messages.create(
-            model="claude-haiku-4-5-20251001",
-            max_tokens=80,
-            timeout=15.0,
-            messages=[{"role": "user", "content": prompt}]
+        db.commit()
+    except Exception as e:
+        logger.error(f"Notification pre-generation error: {e}")
+    finally:
+        db.close()
+
+
+def request_message_pregeneration(user_id: int):
+    """
+    Queue reminder pre-generation for a user whose schedule just changed.
+    Safe to call from sync route handlers (worker threads); repeated calls for
+    the same user collapse into one pending job.
+    """
+    if _scheduler is None or not _scheduler.running:
+        return
+    try:
+        _scheduler.add_job(
+            _pregenerate_messages,
+            args=[user_id],
+            id=f"notif_pregen_{user_id}",
+            replace_existing=True,
         )
-        return msg.content[0].text.strip()
     except Exception as e:
-        logger.warning(f"Claude message generation failed: {e}")
-        return f"Hey! {task_title} in {minutes_until} min. You got this 💪"
+        logger.warning(f"Could not queue message pre-generation for user {user_id}: {e}")
 
 
-def _parse_block_start(start_time_str: str, tz_offset_min: int) -> Optional[datetime]:
-    """Parse start_time from DB to UTC datetime for comparison.
+# Catch-up limit: never notify for a block that started more than this long ago.
+CATCH_UP_SECONDS = 5 * 60
 
-    The DB stores times in two formats:
-      - "YYYY-MM-DDTHH:MM:SS" (no timezone suffix) — written by the frontend
-        drag/edit PATCH using toLocalISO().  These are LOCAL times, not UTC.
-      - "YYYY-MM-DDTHH:MM:SSZ" or "YYYY-MM-DDTHH:MM:SS+HH:MM" — true UTC/tz-aware.
-      - "YYYY-MM-DD HH:MM:SS" (space separator, no Z) — legacy format, also local.
 
-    tz_offset_min follows JS getTimezoneOffset() convention:
-        offset = UTC − local  →  local = UTC − offset
-    So to convert local→UTC:  utc_dt = local_dt - timedelta(minutes=tz_offset_min)
+def _collect_due_blocks(db, now_utc: datetime) -> list[dict]:
     """
-    if not start_time_str:
-        return None
-    try:
-        s = start_time_str.strip()
-        if "T" in s:
-            # Check for explicit timezone info (Z suffix or +HH:MM / -HH:MM offset)
-            has_tz = s.endswith("Z") or "+" in s[10:] or (s.count("-") > 2)
-            if has_tz:
-                # Tz-aware: parse directly
-                dt = datetime.fromisoformat(s.replace("Z", "+00:00"))
-                return dt.astimezone(timezone.utc)
-            else:
-                # No timezone info — this is a local time written by the frontend.
-                # Convention matches brain/scheduler.py: UTC = local + tz_offset
-                # (tz_offset follows JS getTimezoneOffset(): -120 for UTC+2)
-                dt = datetime.fromisoformat(s.split(".")[0])
-                utc_dt = dt + timedelta(minutes=tz_offset_min)
-                return utc_dt.replace(tzinfo=timezone.utc)
-        # Naive "YYYY-MM-DD HH:MM:SS" (space separator) = legacy local time
-        dt = datetime.strptime(s.split(".")[0], "%Y-%m-%d %H:%M:%S")
-        utc_dt = dt + timedelta(minutes=tz_offset_min)
-        return utc_dt.replace(tzinfo=timezone.utc)
-    except Exception:
-        return None
+    All blocks, across every user, whose notification is due this tick.
+
+    One indexed range scan over (push_notified, start_utc_epoch): a block is due
+    once now >= start - lead time (user's notif_timing), unless it started more
+    than CATCH_UP_SECONDS ago. push_notified = 0 keeps it from firing twice.
+    """
+    now_epoch = now_utc.timestamp()
+    rows = db.execute(
+        f"""SELECT b.id, b.user_id, b.task_title, b.exam_name, b.start_utc_epoch,
+                  {_LEAD_MINUTES_SQL} AS lead_min
+           FROM schedule_blocks b
+           JOIN users u ON u.id = b.user_id
+           WHERE b.push_notified = 0
+             AND b.start_utc_epoch BETWEEN ? AND ?
+             AND b.start_utc_epoch - 60 * ({_LEAD_MINUTES_SQL}) <= ?
+             AND b.block_type IN ('study', 'hobby')
+             AND b.completed = 0
+             AND u.notif_per_task = 1
+             AND EXISTS (SELECT 1 FROM push_subscriptions ps WHERE ps.user_id = u.id)""",
+        (now_epoch - CATCH_UP_SECONDS, now_epoch + 60 * max(TIMING_OFFSETS.values()), now_epoch)
+    ).fetchall()
+
+    due = []
+    for block in rows:
+        block = dict(block)
+        # Actual minutes remaining (could be negative if catching up)
+        block["mins_rem"] = int((block["start_utc_epoch"] - now_epoch) / 60)
+        due.append(block)
+    return due
+
+
+def _compose_pushes(db, due_blocks: list[dict]) -> list[dict]:
+    """Build push payloads from pre-generated texts only — no LLM call on the hot path."""
+    lead_keys = {
+        b["id"]: _message_key(*_block_message_params(b), b["lead_min"])
+        for b in due_blocks if b["mins_rem"] > 0
+    }
+    cached = {}
+    keys = list(set(lead_keys.values()))
+    if keys:
+        placeholders = ",".join("?" * len(keys))
+        cached = {
+            r["cache_key"]: r["body"] for r in db.execute(
+                f"SELECT cache_key, body FROM notification_messages WHERE cache_key IN ({placeholders})", keys
+            ).fetchall()
+        }
+
+    messages = []
+    for b in due_blocks:
+        subject, task_title = _block_message_params(b)
+        mins_rem = b["mins_rem"]
+        if mins_rem <= 0:
+            body = _start_message(task_title)
+        else:
+            body = cached.get(lead_keys[b["id"]]) or _fallback_message(task_title, mins_rem)
+        messages.append({
+            "user_id": b["user_id"],
+            "title": "הלוז מתחיל 📚" if mins_rem <= 0 else "StudyFlow 📚",
+            "body": body,
+            "url": "/",
+            "block_id": b["id"],
+        })
+    return messages
 
 
 async def _check_and_send_notifications():
     """
     Called by scheduler every minute.
-    For each user, find study blocks starting within their configured notification window,
-    generate a motivational message, and send a push to all their registered devices.
+    Pipeline: collect every due block across all users in one query, look up
+    their pre-generated texts, then hand all pushes to the push thread pool at
+    once and mark the blocks notified.
     """
     now_utc = datetime.now(timezone.utc)
-    # Truncate to the minute so the window is always [HH:MM:00, HH:MM+1:00).
-    # Without this, a block at 14:30:00 is missed if the scheduler fires at 14:30:15.
-    now_minute_utc = now_utc.replace(second=0, microsecond=0)
     db = get_db()
     try:
-        # We query all users who have at least one push subscription
-        users = db.execute(
-            """SELECT DISTINCT u.id, u.notif_timing, u.timezone_offset
-               FROM users u
-               JOIN push_subscriptions ps ON u.id = ps.user_id
-               WHERE u.notif_per_task = 1"""
-        ).fetchall()
+        due_blocks = _collect_due_blocks(db, now_utc)
+        if not due_blocks:
+            return
 
-        for user in users:
-            user = dict(user)
-            offset_min = TIMING_OFFSETS.get(user["notif_timing"] or "at_start", 0)
-            tz_offset = user.get("timezone_offset") or 0
-
-            # Window in UTC: blocks that start in [now_minute + offset, now_minute + offset + 1 min)
-            window_start_utc = now_minute_utc + timedelta(minutes=offset_min)
-            window_end_utc = window_start_utc + timedelta(minutes=1)
-
-
-            # User's local "today" and "tomorrow" for the day_date filter.
-            # tz_offset follows JS getTimezoneOffset() convention: offset = UTC - local,
-            # so local = UTC - offset  (e.g. UTC+2 → offset=-120 → local = UTC + 2h)
-            now_local = now_utc - timedelta(minutes=tz_offset)
-            user_today = now_local.strftime("%Y-%m-%d")
-            user_tomorrow = (now_local + timedelta(days=1)).strftime("%Y-%m-%d")
-            
-
-            blocks = db.execute(
-                """SELECT id, task_title, exam_name, start_time FROM schedule_blocks
-                   WHERE user_id = ? AND block_type IN ('study', 'hobby')
-                   AND completed = 0 AND push_notified = 0
-                   AND day_date IN (?, ?)""",
-                (user["id"], user_today, user_tomorrow)
-            ).fetchall()
+        messages = _compose_pushes(db, due_blocks)
 
-            
-            for block in blocks:
-                block = dict(block)
-                start_utc = _parse_block_start(block["start_time"], tz_offset)
-                if start_utc is None:
-                    continue
-                
-                # CATCH-UP LOGIC:
-                # Trigger if: (current_time + offset) >= block_start_time
-                # AND it's not too old (within the last 5 minutes) to prevent spamming old tasks.
-                # AND it hasn't been notified yet (push_notified = 0, handled in SQL query above).
-                
-                trigger_time_utc = start_utc - timedelta(minutes=offset_min)
-                
-                is_time_to_notify = trigger_time_utc <= now_utc
-                # Limit catch-up to 5 minutes after the task starts to avoid spamming old tasks
-                is_too_old = start_utc < (now_utc - timedelta(minutes=5))
-                
-
-                if is_time_to_notify and not is_too_old:
-                    task_title = block["task_title"] or "Study session"
-                    subject = block["exam_name"] or "your exam"
-                    
-                    # Calculate actual minutes remaining (could be negative if catching up)
-                    diff = start_utc - now_utc
-                    mins_rem = int(diff.total_seconds() / 60)
-                    
-                    body = await _generate_message(subject, task_title, mins_rem if mins_rem > 0 else 0)
-                    title = "הלוז מתחיל 📚" if mins_rem <= 0 else "StudyFlow 📚"
-                    
-                    # Send to all devices for this user
-                    try:
-                        send_to_user(
-                            db,
-                            user["id"],
-                            title,
-                            body,
-                            url="/",
-                            block_id=block["id"]
-                        )
-                        # Mark as notified ONLY after successful push delivery
-                        db.execute("UPDATE schedule_blocks SET push_notified = 1 WHERE id = ?", (block["id"],))
-                    except Exception as push_err:
-                        logger.warning(f"Push delivery failed for block {block['id']}: {push_err}")
-                    logger.info(f"Triggered push for user {user['id']} for block {block['id']} (Catch-up: {mins_rem}m)")
+        try:
+            await send_to_users(db, messages)
+        except Exception as push_err:
+            logger.warning(f"Push delivery failed for blocks {[b['id'] for b in due_blocks]}: {push_err}")
 
         # Single commit for all push_notified updates in this cycle
+        db.executemany(
+            "UPDATE schedule_blocks SET push_notified = 1 WHERE id = ?",
+            [(b["id"],) for b in due_blocks],
+        )
         db.commit()
+        for b in due_blocks:
+            logger.info(f"Triggered push for user {b['user_id']} for block {b['id']} (Catch-up: {b['mins_rem']}m)")
     except Exception as e:
         logger.error(f"Notification scheduler error: {e}")
     finally:
@@ -194,6 +280,7 @@ async def _check_and_send_notifications():
 
 def start_scheduler() -> AsyncIOScheduler:
     """Create, configure, and start the APScheduler background scheduler."""
+    global _scheduler
     scheduler = AsyncIOScheduler()
     scheduler.add_job(
         _check_and_send_notifications,
@@ -202,6 +289,15 @@ def start_scheduler() -> AsyncIOScheduler:
         id="push_notification_job",
         replace_existing=True
     )
+    scheduler.add_job(
+        _pregenerate_messages,
+        trigger="interval",
+        minutes=NOTIF_PREGEN_INTERVAL_MINUTES,
+        next_run_time=datetime.now(timezone.utc),
+        id="notif_pregen_all",
+        replace_existing=True
+    )
     scheduler.start()
+    _scheduler = scheduler
     logger.info("[Scheduler] Push notification scheduler started")
     return scheduler
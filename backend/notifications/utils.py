@@ -1,23 +1,23 @@
+import asyncio
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pywebpush import webpush, WebPushException
-from server.config import VAPID_PUBLIC_KEY, VAPID_PRIVATE_KEY, VAPID_CLAIMS
+from server.config import (
+    VAPID_PUBLIC_KEY, VAPID_PRIVATE_KEY, VAPID_CLAIMS, PUSH_TIMEOUT_SECONDS, PUSH_MAX_WORKERS,
+)
 
 logger = logging.getLogger(__name__)
 
-def send_to_user(db, user_id, title, body, url=None, block_id=None, extra_data=None):
-    """
-    Send a push notification to all registered devices for a given user.
-    """
-    cursor = db.execute(
-        "SELECT id, endpoint, p256dh, auth FROM push_subscriptions WHERE user_id = ?",
-        (user_id,)
-    )
-    subscriptions = cursor.fetchall()
+# pywebpush is blocking (requests under the hood); every delivery runs here so
+# a slow push endpoint never stalls the event loop or the other deliveries.
+_push_executor = ThreadPoolExecutor(max_workers=PUSH_MAX_WORKERS, thread_name_prefix="webpush")
+
+# Subscriptions answering with one of these are permanently invalid.
+STALE_STATUS_CODES = (400, 403, 404, 410)
 
-    if not subscriptions:
-        return
 
+def _build_payload(title, body, url=None, block_id=None, extra_data=None) -> str:
     payload_data = {
         "url": url,
         "blockId": block_id
@@ -25,50 +25,111 @@ def send_to_user(db, user_id, title, body, url=None, block_id=None, extra_data=N
     if extra_data:
         payload_data.update(extra_data)
 
-    payload = {
+    return json.dumps({
         "title": title,
         "body": body,
         "data": payload_data
-    }
-    payload_json = json.dumps(payload)
-
-    for sub in subscriptions:
-        sub_info = {
-            "endpoint": sub["endpoint"],
-            "keys": {
-                "p256dh": sub["p256dh"],
-                "auth": sub["auth"]
-            }
+    })
+
+
+def _deliver(sub, payload_json: str) -> bool:
+    """Send one push (runs in the executor). Returns True if the subscription is stale."""
+    sub_info = {
+        "endpoint": sub["endpoint"],
+        "keys": {
+            "p256dh": sub["p256dh"],
+            "auth": sub["auth"]
         }
+    }
+    try:
+        # Pass a copy of VAPID_CLAIMS so pywebpush cannot mutate the
+        # module-level dict (pywebpush adds "aud" and "exp" in-place;
+        # without copying, a cached "aud" from a previous endpoint leaks
+        # into all subsequent calls with different endpoints).
+        webpush(
+            subscription_info=sub_info,
+            data=payload_json,
+            vapid_private_key=VAPID_PRIVATE_KEY,
+            vapid_claims=dict(VAPID_CLAIMS),
+            timeout=PUSH_TIMEOUT_SECONDS,
+        )
+        logger.info(f"Successfully sent push to {sub['endpoint']}")
+    except WebPushException as ex:
+        status_code = getattr(ex.response, 'status_code', 'Unknown')
+        resp_body = getattr(ex.response, 'text', 'No body')
+        logger.error(f"Failed to send push Status: {status_code}, Body: {resp_body}")
+        if status_code in STALE_STATUS_CODES:
+            logger.info(f"Removing stale subscription {sub['id']} (HTTP {status_code})")
+            return True
+    except Exception as e:
+        logger.error(f"Unexpected error sending push: {e}")
+    return False
+
+
+def _load_subscriptions(db, user_ids) -> dict:
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    placeholders = ",".join("?" * len(user_ids))
+    by_user = {}
+    for sub in db.execute(
+        f"SELECT id, user_id, endpoint, p256dh, auth FROM push_subscriptions WHERE user_id IN ({placeholders})",
+        user_ids,
+    ).fetchall():
+        by_user.setdefault(sub["user_id"], []).append(sub)
+    return by_user
+
+
+def _remove_stale(db, stale_ids) -> None:
+    if stale_ids:
+        db.executemany("DELETE FROM push_subscriptions WHERE id = ?", [(i,) for i in stale_ids])
+        db.commit()
+
+
+def send_to_user(db, user_id, title, body, url=None, block_id=None, extra_data=None):
+    """
+    Send a push notification to all registered devices for a given user.
+    Devices are pushed in parallel; this call returns once all of them finished.
+    """
+    subscriptions = _load_subscriptions(db, [user_id]).get(user_id)
+    if not subscriptions:
+        return
+
+    if not VAPID_PRIVATE_KEY:
+        logger.warning("VAPID_PRIVATE_KEY not set, skipping push.")
+        return
+
+    payload_json = _build_payload(title, body, url, block_id, extra_data)
+    futures = [(sub["id"], _push_executor.submit(_deliver, sub, payload_json)) for sub in subscriptions]
+    _remove_stale(db, [sub_id for sub_id, f in futures if f.result()])
+
+
+async def send_to_users(db, messages: list[dict]) -> None:
+    """
+    Deliver a batch of pushes without blocking the event loop.
+    Each message is a dict with user_id, title, body and optional url / block_id /
+    extra_data; every device of every user is pushed concurrently on the push
+    thread pool, and stale subscriptions are removed in one statement afterwards.
+    """
+    if not messages:
+        return
+    if not VAPID_PRIVATE_KEY:
+        logger.warning("VAPID_PRIVATE_KEY not set, skipping push.")
+        return
+
+    subscriptions = _load_subscriptions(db, {m["user_id"] for m in messages})
+    loop = asyncio.get_running_loop()
+    jobs = []
+    for m in messages:
+        payload_json = _build_payload(
+            m["title"], m["body"], m.get("url"), m.get("block_id"), m.get("extra_data")
+        )
+        for sub in subscriptions.get(m["user_id"], ()):
+            jobs.append((sub["id"], loop.run_in_executor(_push_executor, _deliver, sub, payload_json)))
+
+    results = await asyncio.gather(*(job for _, job in jobs), return_exceptions=True)
+    _remove_stale(db, {sub_id for (sub_id, _), stale in zip(jobs, results) if stale is True})
+
 
-        try:
-            if not VAPID_PRIVATE_KEY:
-                logger.warning("VAPID_PRIVATE_KEY not set, skipping push.")
-                return
-
-            # Pass a copy of VAPID_CLAIMS so pywebpush cannot mutate the
-            # module-level dict (pywebpush adds "aud" and "exp" in-place;
-            # without copying, a cached "aud" from a previous endpoint leaks
-            # into all subsequent calls with different endpoints).
-            webpush(
-                subscription_info=sub_info,
-                data=payload_json,
-                vapid_private_key=VAPID_PRIVATE_KEY,
-                vapid_claims=dict(VAPID_CLAIMS)
-            )
-            logger.info(f"Successfully sent push to {sub['endpoint']}")
-        except WebPushException as ex:
-            status_code = getattr(ex.response, 'status_code', 'Unknown')
-            resp_body = getattr(ex.response, 'text', 'No body')
-            logger.error(f"Failed to send push Status: {status_code}, Body: {resp_body}")
-            
-            # Remove subscriptions that are permanently invalid:
-            if status_code in [400, 403, 404, 410]:
-                logger.info(
-                    f"Removing stale subscription {sub['id']} "
-                    f"(HTTP {ex.response.status_code})"
-                )
-                db.execute("DELETE FROM push_subscriptions WHERE id = ?", (sub["id"],))
-                db.commit()
-        except Exception as e:
-            logger.error(f"Unexpected error sending push: {e}")
+def shutdown_push_executor():
+    _push_executor.shutdown(wait=False, cancel_futures=True)
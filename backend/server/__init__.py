@@ -13,7 +13,7 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
-from server.database import init_db
+from server.database import init_db, close_pool
 from server.config import FRONTEND_DIR, PROJECT_DIR, SESSION_SECRET_KEY
 
 
@@ -45,16 +45,24 @@ from tasks.routes import router as tasks_router
 from brain.routes import router as brain_router
 from notifications.routes import router as notifications_router
 from notifications.scheduler import start_scheduler
+from notifications.utils import shutdown_push_executor
+from brain.pdf_text import shutdown_pdf_executor
+from brain.jobs import start_workers, stop_workers
 from gamification.routes import router as gamification_router
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
     scheduler = start_scheduler()
+    start_workers()
     yield
     # Shutdown
+    await stop_workers()
     if scheduler and scheduler.running:
         scheduler.shutdown()
+    shutdown_push_executor()
+    shutdown_pdf_executor()
+    close_pool()
 
 app = FastAPI(title="StudyFlow API", version="1.0.0", lifespan=lifespan)
 
@@ -192,4 +200,5 @@ def serve_frontend_dashboard():
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok", "version": "1.0.0"}
+    from auth.utils import get_session_cache_stats
+    return {"status": "ok", "version": "1.0.0", "auth_cache": get_session_cache_stats()}
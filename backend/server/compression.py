@@ -0,0 +1,50 @@
+"""Transparent compression for large text columns.
+
+Big payloads (extracted file text in text_blobs, pdf_text_cache pages,
+exams.parsed_context, the Auditor draft's gaps and topic_map) are written through pack_text()
+and read back through unpack_text(). Values of at least COMPRESS_MIN_BYTES are
+stored as a BLOB: the MAGIC marker followed by a zlib stream. Anything else,
+including every row written before compression existed, is plain TEXT and
+comes back unchanged, so old and new rows mix freely in the same column.
+
+The marker starts with a NUL byte, which never begins real text, and carries
+a format version so another codec can be added later without a rewrite.
+"""
+
+import json
+import zlib
+
+MAGIC = b"\x00zl1"
+COMPRESS_MIN_BYTES = 512
+COMPRESS_LEVEL = 6
+
+
+def pack_text(text: str | None):
+    """Value to store for `text`: compressed bytes for large text, the text itself otherwise."""
+    if text is None:
+        return None
+    raw = text.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return text
+    packed = MAGIC + zlib.compress(raw, COMPRESS_LEVEL)
+    return packed if len(packed) < len(raw) else text
+
+
+def unpack_text(value) -> str | None:
+    """Inverse of pack_text(); plain TEXT values pass through."""
+    if isinstance(value, (bytes, memoryview)):
+        value = bytes(value)
+        if value.startswith(MAGIC):
+            return zlib.decompress(value[len(MAGIC):]).decode("utf-8")
+        return value.decode("utf-8")
+    return value
+
+
+def pack_json(obj):
+    return pack_text(json.dumps(obj, ensure_ascii=False))
+
+
+def unpack_json(value):
+    text = unpack_text(value)
+    return json.loads(text) if text else None
+
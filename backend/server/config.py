@@ -21,6 +21,19 @@ DB_PATH = os.path.join(BASE_DIR, "study_scheduler.db")
 UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 FRONTEND_DIR = os.path.join(PROJECT_DIR, "frontend")
 
+# ─── Database ────────────────────────────────────────────────
+# Idle SQLite connections kept warm per process (see server/database.py).
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+# Rows copied per transaction when a migration rebuilds a table (server/migrations.py).
+MIGRATION_BATCH_ROWS = int(os.environ.get("MIGRATION_BATCH_ROWS", 5000))
+
+# ─── Auth ────────────────────────────────────────────────────
+# In-process session-token → user cache used by get_current_user.
+# Entries are dropped explicitly on logout/profile changes; the TTL bounds how
+# long another worker process can serve a stale row.
+AUTH_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_CACHE_TTL_SECONDS", 60))
+AUTH_CACHE_MAX_ENTRIES = int(os.environ.get("AUTH_CACHE_MAX_ENTRIES", 2048))
+
 # ─── Environment ─────────────────────────────────────────────
 # Set ENVIRONMENT=production in .env to enable HTTPS-only cookies,
 # strict CORS, and other production hardening.
@@ -49,3 +62,51 @@ VAPID_PRIVATE_KEY = os.environ.get("VAPID_PRIVATE_KEY", "")
 VAPID_CLAIMS = {
     "sub": os.environ.get("VAPID_SUB_EMAIL", "mailto:admin@studyflow.local")
 }
+
+# ─── Notifications ───────────────────────────────────────────
+# Web Push deliveries run on a thread pool; each endpoint gets its own timeout
+# so one slow push service can't hold up the minute tick.
+PUSH_TIMEOUT_SECONDS = float(os.environ.get("PUSH_TIMEOUT_SECONDS", 10))
+PUSH_MAX_WORKERS = int(os.environ.get("PUSH_MAX_WORKERS", 16))
+# Reminder texts are written ahead of time into notification_messages.
+# Max concurrent LLM calls while pre-generating them:
+NOTIF_LLM_CONCURRENCY = int(os.environ.get("NOTIF_LLM_CONCURRENCY", 5))
+# How far ahead blocks get a message, how often the sweep runs, and how long a text is reused.
+NOTIF_PREGEN_HORIZON_HOURS = int(os.environ.get("NOTIF_PREGEN_HORIZON_HOURS", 24))
+NOTIF_PREGEN_INTERVAL_MINUTES = int(os.environ.get("NOTIF_PREGEN_INTERVAL_MINUTES", 30))
+NOTIF_MESSAGE_TTL_HOURS = int(os.environ.get("NOTIF_MESSAGE_TTL_HOURS", 72))
+
+# ─── PDF extraction ──────────────────────────────────────────
+# Large PDFs are split into page ranges and extracted in parallel on a
+# process pool (see brain/pdf_text.py), off the event loop and the GIL.
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", min(4, os.cpu_count() or 1)))
+PDF_PAGES_PER_CHUNK = int(os.environ.get("PDF_PAGES_PER_CHUNK", 40))
+
+# ─── LLM gateway ─────────────────────────────────────────────
+# Upper bounds on concurrent upstream LLM calls (brain/llm.py): across the
+# whole process, and per user so one student can't take every slot.
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 16))
+LLM_MAX_CONCURRENCY_PER_USER = int(os.environ.get("LLM_MAX_CONCURRENCY_PER_USER", 4))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 3))
+
+# ─── Auditor ─────────────────────────────────────────────────
+# Token budget for exam material in an Auditor prompt; files are cleaned,
+# ranked by syllabus-topic coverage and packed to fit (brain/context_packer.py).
+AUDITOR_CONTEXT_TOKENS = int(os.environ.get("AUDITOR_CONTEXT_TOKENS", 60_000))
+
+# ─── Background jobs ─────────────────────────────────────────
+# Auditor / Strategist runs queued in the jobs table (brain/jobs.py).
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+# Idle workers re-check the table this often (picks up jobs queued by other processes).
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", 2))
+# Running jobs refresh a heartbeat; one silent this long belonged to a dead
+# process and is re-queued (checked periodically by every worker process).
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", 60))
+# Finished jobs (and their results) are kept this long for status polling.
+JOB_RETENTION_HOURS = int(os.environ.get("JOB_RETENTION_HOURS", 48))
+
+# ─── Strategist ──────────────────────────────────────────────
+# "local": deterministic day assignment (brain/strategist.py), no LLM call.
+# "llm": the model refines the local plan (falls back to it on failure).
+# /approve-and-schedule can override this per request with "strategist_mode".
+STRATEGIST_MODE = os.environ.get("STRATEGIST_MODE", "local")
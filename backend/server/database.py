@@ -1,381 +1,188 @@
-"""SQLite database — connection + schema + migrations."""
+"""SQLite database — connection pool and init_db (migrations live in server/migrations.py)."""
 
 import sqlite3
 import os
-from server.config import DB_PATH, UPLOAD_DIR
+import queue
+import threading
+from server.config import DB_PATH, UPLOAD_DIR, DB_POOL_SIZE
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its pool.
+
+    Route handlers keep calling db.close() exactly as before; the connection
+    just goes back to the idle queue with its page cache and statement cache
+    still warm instead of being torn down.
+    """
+
+    _pool = None
+    _checked_out = False
+
+    def close(self):
+        if self._pool is None:
+            super().close()
+        elif self._checked_out:
+            # Guard against double close() (several handlers close in both the
+            # error branch and a finally block) handing the same connection
+            # out to two requests.
+            self._pool.release(self)
+
+    def discard(self):
+        """Really close the underlying connection."""
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """Bounded LIFO pool of warm SQLite connections for one database file.
+
+    At most `size` idle connections are kept.  When every pooled connection is
+    checked out a fresh one is opened instead of blocking (a request holds one
+    for get_current_user and one for the handler), and the surplus is closed
+    again on release.
+    """
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self.pid = os.getpid()
+        # LIFO so the most recently used (warmest) connection is reused first.
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self) -> PooledConnection:
+        # timeout=5: retry for up to 5s if another writer holds a lock momentarily,
+        # instead of raising "database is locked" immediately.
+        # check_same_thread=False: FastAPI uses a thread pool; a pooled connection
+        # is only ever checked out by one request at a time, so moving it between
+        # threads is safe.
+        conn = sqlite3.connect(
+            self.path,
+            timeout=5,
+            check_same_thread=False,
+            factory=PooledConnection,
+            cached_statements=256,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        # WAL mode allows concurrent readers and writers without blocking each other.
+        # In the default DELETE (rollback journal) mode, any open reader holds a shared
+        # lock that prevents a writer from acquiring the exclusive lock needed for UPDATE.
+        # The notification scheduler subprocess inherits SQLite FDs from the parent and
+        # holds shared locks, causing PATCH requests to return "database is locked" (500).
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn._pool = self
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn: PooledConnection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self) -> PooledConnection:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+                break
+            if self._is_healthy(conn):
+                break
+            conn.discard()
+        conn._checked_out = True
+        return conn
+
+    def release(self, conn: PooledConnection):
+        conn._checked_out = False
+        try:
+            # Never hand a half-finished transaction to the next request.
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+            self._idle.put_nowait(conn)
+        except (sqlite3.Error, queue.Full):
+            conn.discard()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().discard()
+            except queue.Empty:
+                return
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool() -> ConnectionPool:
+    path = DB_PATH
+    pool = _pools.get(path)
+    # A forked child must not reuse the parent's SQLite handles.
+    if pool is None or pool.pid != os.getpid():
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None or pool.pid != os.getpid():
+                pool = ConnectionPool(path, DB_POOL_SIZE)
+                _pools[path] = pool
+    return pool
 
 
 def get_db():
-    # timeout=5: retry for up to 5s if another writer holds a lock momentarily,
-    # instead of raising "database is locked" immediately.
-    # check_same_thread=False: FastAPI uses a thread pool; each request gets its
-    # own connection so sharing between threads is safe.
-    conn = sqlite3.connect(DB_PATH, timeout=5, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    # WAL mode allows concurrent readers and writers without blocking each other.
-    # In the default DELETE (rollback journal) mode, any open reader holds a shared
-    # lock that prevents a writer from acquiring the exclusive lock needed for UPDATE.
-    # The notification scheduler subprocess inherits SQLite FDs from the parent and
-    # holds shared locks, causing PATCH requests to return "database is locked" (500).
-    conn.execute("PRAGMA journal_mode=WAL")
-    return conn
+    """Check a connection out of the pool.  db.close() returns it."""
+    return _get_pool().acquire()
+
+
+def db_connection():
+    """FastAPI dependency: yield a pooled connection for the lifetime of the request."""
+    db = get_db()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def close_pool():
+    """Close every idle pooled connection (called on shutdown)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
+
+
+def block_start_epoch_sql(start_time: str, user_id: str) -> str:
+    """SQL expression: a block's start_time as UTC epoch seconds.
+
+    The DB holds start times in several formats:
+      - "YYYY-MM-DDTHH:MM:SSZ" or "...+HH:MM" — tz-aware (Enforcer output).
+      - "YYYY-MM-DDTHH:MM:SS" — LOCAL time written by the frontend drag/edit
+        PATCH using toLocalISO().
+      - "YYYY-MM-DD HH:MM:SS" — legacy / SQL datetime() output, also local.
+    Local times are converted with the owner's timezone_offset, which follows
+    JS getTimezoneOffset() (offset = UTC − local, so UTC = local + offset).
+    Unparseable values give NULL.
+    """
+    return f"""CASE
+        WHEN {start_time} LIKE '%Z'
+             OR instr(substr({start_time}, 11), '+') > 0
+             OR instr(substr({start_time}, 11), '-') > 0
+            THEN CAST(strftime('%s', {start_time}) AS INTEGER)
+        ELSE CAST(strftime('%s', {start_time}) AS INTEGER)
+             + 60 * COALESCE((SELECT timezone_offset FROM users WHERE users.id = {user_id}), 0)
+    END"""
 
 
 def init_db():
+    """Create the upload dir and bring the schema up to date (server/migrations.py)."""
+    from server.migrations import migrate
+
     os.makedirs(UPLOAD_DIR, exist_ok=True)
     conn = get_db()
-
-    conn.executescript("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE,
-            wake_up_time TEXT DEFAULT '08:00',
-            sleep_time TEXT DEFAULT '23:00',
-            study_method TEXT DEFAULT 'pomodoro',
-            session_minutes INTEGER DEFAULT 50,
-            break_minutes INTEGER DEFAULT 10,
-            hobby_name TEXT,
-            neto_study_hours REAL DEFAULT 4.0,
-            peak_productivity TEXT DEFAULT 'Morning',
-            study_hours_preference TEXT DEFAULT '["morning", "afternoon"]',
-            buffer_days INTEGER DEFAULT 1,
-            onboarding_completed INTEGER DEFAULT 0,
-            fixed_breaks TEXT DEFAULT '[]',
-            created_at TEXT DEFAULT (datetime('now'))
-        );
-
-        CREATE TABLE IF NOT EXISTS exams (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            subject TEXT NOT NULL,
-            exam_date TEXT NOT NULL,
-            special_needs TEXT,
-            parsed_context TEXT,
-            status TEXT DEFAULT 'upcoming' CHECK(status IN ('upcoming', 'completed', 'cancelled')),
-            created_at TEXT DEFAULT (datetime('now')),
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS exam_files (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            exam_id INTEGER NOT NULL,
-            filename TEXT NOT NULL,
-            file_path TEXT NOT NULL,
-            file_type TEXT NOT NULL CHECK(file_type IN ('syllabus', 'past_exam', 'notes', 'other')),
-            file_size INTEGER,
-            uploaded_at TEXT DEFAULT (datetime('now')),
-            FOREIGN KEY (exam_id) REFERENCES exams(id) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            exam_id INTEGER,
-            title TEXT NOT NULL,
-            topic TEXT,
-            subject TEXT,
-            deadline TEXT,
-            day_date TEXT,
-            sort_order INTEGER DEFAULT 0,
-            priority INTEGER DEFAULT 5,
-            estimated_hours REAL DEFAULT 1.0,
-            difficulty INTEGER DEFAULT 3 CHECK(difficulty BETWEEN 0 AND 5),
-            status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'in_progress', 'done', 'deferred')),
-            is_delayed INTEGER DEFAULT 0,
-            is_padding INTEGER DEFAULT 0,
-            original_date TEXT,
-            linked_task_id INTEGER,
-            created_at TEXT DEFAULT (datetime('now')),
-            FOREIGN KEY (user_id) REFERENCES users(id),
-            FOREIGN KEY (exam_id) REFERENCES exams(id) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS schedule_blocks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            task_id INTEGER,
-            exam_id INTEGER,
-            exam_name TEXT,
-            task_title TEXT,
-            start_time TEXT NOT NULL,
-            end_time TEXT NOT NULL,
-            day_date TEXT,
-            block_type TEXT DEFAULT 'study' CHECK(block_type IN ('study', 'break', 'hobby')),
-            completed INTEGER DEFAULT 0,
-            is_delayed INTEGER DEFAULT 0,
-            is_split INTEGER DEFAULT 0,
-            part_number INTEGER,
-            total_parts INTEGER,
-            FOREIGN KEY (user_id) REFERENCES users(id),
-            FOREIGN KEY (task_id) REFERENCES tasks(id),
-            FOREIGN KEY (exam_id) REFERENCES exams(id) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS push_subscriptions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            endpoint TEXT NOT NULL UNIQUE,
-            p256dh TEXT NOT NULL,
-            auth TEXT NOT NULL,
-            created_at TEXT DEFAULT (datetime('now')),
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS user_xp (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL UNIQUE,
-            total_xp INTEGER DEFAULT 0,
-            current_level INTEGER DEFAULT 1,
-            highest_level_reached INTEGER DEFAULT 1,
-            daily_xp INTEGER DEFAULT 0,
-            daily_xp_date TEXT,
-            tasks_completed INTEGER DEFAULT 0,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS user_streaks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL UNIQUE,
-            current_streak INTEGER DEFAULT 0,
-            longest_streak INTEGER DEFAULT 0,
-            last_login_date TEXT,
-            streak_broken INTEGER DEFAULT 0,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS user_badges (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            badge_key TEXT NOT NULL,
-            earned_at TEXT DEFAULT (datetime('now')),
-            UNIQUE (user_id, badge_key),
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        );
-
-        CREATE INDEX IF NOT EXISTS idx_exams_user_date ON exams(user_id, exam_date);
-        CREATE INDEX IF NOT EXISTS idx_exam_files_exam ON exam_files(exam_id);
-        CREATE INDEX IF NOT EXISTS idx_tasks_exam ON tasks(exam_id);
-        CREATE INDEX IF NOT EXISTS idx_schedule_day ON schedule_blocks(day_date);
-        CREATE INDEX IF NOT EXISTS idx_user_xp_user ON user_xp(user_id);
-        CREATE INDEX IF NOT EXISTS idx_user_streaks_user ON user_streaks(user_id);
-        CREATE INDEX IF NOT EXISTS idx_user_badges_user ON user_badges(user_id);
-    """)
-
-    # Migrations: add auth columns if missing
-    columns = {row[1] for row in conn.execute("PRAGMA table_info(users)").fetchall()}
-    if "password_hash" not in columns:
-        conn.execute("ALTER TABLE users ADD COLUMN password_hash TEXT DEFAULT ''")
-    if "auth_token" not in columns:
-        conn.execute("ALTER TABLE users ADD COLUMN auth_token TEXT")
-    if "google_id" not in columns:
-        conn.execute("ALTER TABLE users ADD COLUMN google_id TEXT")
-    if "google_linked" not in columns:
-        conn.execute("ALTER TABLE users ADD COLUMN google_linked INTEGER DEFAULT 0")
-    if "hobby_name" not in columns:
-        conn.execute("ALTER TABLE users ADD COLUMN hobby_name TEXT")
-    if "neto_study_hours" not in columns:
-        conn.execute("ALTER TABLE users ADD COLUMN neto_study_hours REAL DEFAULT 4.0")
-    if "peak_productivity" not in columns:
-        conn.execute("ALTER TABLE users ADD COLUMN peak_productivity TEXT DEFAULT 'Morning'")
-    if "study_hours_preference" not in columns:
-        conn.execute("ALTER TABLE users ADD COLUMN study_hours_preference TEXT DEFAULT '[\"morning\", \"afternoon\"]'")
-    if "buffer_days" not in columns:
-        conn.execute("ALTER TABLE users ADD COLUMN buffer_days INTEGER DEFAULT 1")
-    if "onboarding_completed" not in columns:
-        conn.execute("ALTER TABLE users ADD COLUMN onboarding_completed INTEGER DEFAULT 0")
-    if "timezone_offset" not in columns:
-        conn.execute("ALTER TABLE users ADD COLUMN timezone_offset INTEGER DEFAULT 0")
-    if "fixed_breaks" not in columns:
-        conn.execute("ALTER TABLE users ADD COLUMN fixed_breaks TEXT DEFAULT '[]'")
-
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_token ON users(auth_token)")
-    # Unique index: only one user per Google ID (CREATE UNIQUE INDEX ignores nulls in SQLite)
-    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_google_id ON users(google_id) WHERE google_id IS NOT NULL")
-
-    # Migrations: add parsed_context to exams if missing
-    exam_columns = {row[1] for row in conn.execute("PRAGMA table_info(exams)").fetchall()}
-    if "parsed_context" not in exam_columns:
-        conn.execute("ALTER TABLE exams ADD COLUMN parsed_context TEXT")
-
-    # Migrations: add calendar columns to tasks if missing
-    task_columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)").fetchall()}
-    if "day_date" not in task_columns:
-        conn.execute("ALTER TABLE tasks ADD COLUMN day_date TEXT")
-    if "sort_order" not in task_columns:
-        conn.execute("ALTER TABLE tasks ADD COLUMN sort_order INTEGER DEFAULT 0")
-    if "is_delayed" not in task_columns:
-        conn.execute("ALTER TABLE tasks ADD COLUMN is_delayed INTEGER DEFAULT 0")
-    if "priority" not in task_columns:
-        conn.execute("ALTER TABLE tasks ADD COLUMN priority INTEGER DEFAULT 5")
-    if "is_padding" not in task_columns:
-        conn.execute("ALTER TABLE tasks ADD COLUMN is_padding INTEGER DEFAULT 0")
-
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_day ON tasks(day_date)")
-
-    # Migrations: update tasks table for status='deferred' and new columns (SQLite table rebuild)
-    if "original_date" not in task_columns:
-        # We need to rebuild the table because SQLite doesn't support ALTER TABLE for CHECK constraints
-        try:
-            conn.execute("PRAGMA foreign_keys = OFF;")
-            conn.execute("BEGIN TRANSACTION;")
-            conn.execute("""
-                CREATE TABLE tasks_new (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    exam_id INTEGER,
-                    title TEXT NOT NULL,
-                    topic TEXT,
-                    subject TEXT,
-                    deadline TEXT,
-                    day_date TEXT,
-                    sort_order INTEGER DEFAULT 0,
-                    priority INTEGER DEFAULT 5,
-                    estimated_hours REAL DEFAULT 1.0,
-                    difficulty INTEGER DEFAULT 3 CHECK(difficulty BETWEEN 0 AND 5),
-                    status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'in_progress', 'done', 'deferred')),
-                    is_delayed INTEGER DEFAULT 0,
-                    is_padding INTEGER DEFAULT 0,
-                    original_date TEXT,
-                    linked_task_id INTEGER,
-                    focus_score INTEGER DEFAULT 5,
-                    dependency_id INTEGER,
-                    created_at TEXT DEFAULT (datetime('now')),
-                    FOREIGN KEY (user_id) REFERENCES users(id),
-                    FOREIGN KEY (exam_id) REFERENCES exams(id) ON DELETE CASCADE
-                );
-            """)
-            
-            # Map existing columns
-            cols_to_copy = ["id", "user_id", "exam_id", "title", "topic", "subject", "deadline", "estimated_hours", "difficulty", "status", "is_delayed", "created_at"]
-            if "day_date" in task_columns: cols_to_copy.append("day_date")
-            if "sort_order" in task_columns: cols_to_copy.append("sort_order")
-            if "priority" in task_columns: cols_to_copy.append("priority")
-            if "is_padding" in task_columns: cols_to_copy.append("is_padding")
-            if "focus_score" in task_columns: cols_to_copy.append("focus_score")
-            if "dependency_id" in task_columns: cols_to_copy.append("dependency_id")
-            
-            cols_str = ", ".join(cols_to_copy)
-            conn.execute(f"INSERT INTO tasks_new ({cols_str}) SELECT {cols_str} FROM tasks;")
-            
-            conn.execute("DROP TABLE tasks;")
-            conn.execute("ALTER TABLE tasks_new RENAME TO tasks;")
-            
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_exam ON tasks(exam_id);")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_day ON tasks(day_date);")
-            
-            conn.execute("COMMIT;")
-            conn.execute("PRAGMA foreign_keys = ON;")
-        except Exception as e:
-            conn.execute("ROLLBACK;")
-            print(f"Tasks migration failed: {e}")
-
-    # Migrations: add is_delayed to schedule_blocks
-    block_columns = {row[1] for row in conn.execute("PRAGMA table_info(schedule_blocks)").fetchall()}
-    if "is_delayed" not in block_columns:
-        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN is_delayed INTEGER DEFAULT 0")
-    if "task_title" not in block_columns:
-        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN task_title TEXT")
-    if "exam_name" not in block_columns:
-        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN exam_name TEXT")
-    if "is_manually_edited" not in block_columns:
-        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN is_manually_edited INTEGER DEFAULT 0")
-    if "deferred_original_day" not in block_columns:
-        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN deferred_original_day TEXT")
-    if "push_notified" not in block_columns:
-        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN push_notified INTEGER DEFAULT 0")
-    if "is_split" not in block_columns:
-        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN is_split INTEGER DEFAULT 0")
-    if "part_number" not in block_columns:
-        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN part_number INTEGER")
-    if "total_parts" not in block_columns:
-        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN total_parts INTEGER")
-
-    # Migrations: add push notification columns to users
-    user_columns = {row[1] for row in conn.execute("PRAGMA table_info(users)").fetchall()}
-    if "push_subscription" not in user_columns:
-        conn.execute("ALTER TABLE users ADD COLUMN push_subscription TEXT")
-    if "notif_timing" not in user_columns:
-        conn.execute("ALTER TABLE users ADD COLUMN notif_timing TEXT DEFAULT 'at_start'")
-    if "notif_per_task" not in user_columns:
-        conn.execute("ALTER TABLE users ADD COLUMN notif_per_task INTEGER DEFAULT 1")
-    if "notif_daily_summary" not in user_columns:
-        conn.execute("ALTER TABLE users ADD COLUMN notif_daily_summary INTEGER DEFAULT 0")
-
-    # Migrations: Split-Brain columns on tasks
-    task_columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)").fetchall()}
-    if "focus_score" not in task_columns:
-        conn.execute("ALTER TABLE tasks ADD COLUMN focus_score INTEGER DEFAULT 5")
-    if "dependency_id" not in task_columns:
-        conn.execute("ALTER TABLE tasks ADD COLUMN dependency_id INTEGER")
-
-    # Migrations: auditor_draft on exams
-    exam_columns = {row[1] for row in conn.execute("PRAGMA table_info(exams)").fetchall()}
-    if "auditor_draft" not in exam_columns:
-        conn.execute("ALTER TABLE exams ADD COLUMN auditor_draft TEXT")
-
-    # Migrations: xp_awarded on schedule_blocks
-    block_columns_xp = {row[1] for row in conn.execute("PRAGMA table_info(schedule_blocks)").fetchall()}
-    if "xp_awarded" not in block_columns_xp:
-        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN xp_awarded INTEGER DEFAULT 0")
-
-    # Add tasks_completed to user_xp if not present (Phase 19.1-03 migration)
-    _xp_cols = {row[1] for row in conn.execute("PRAGMA table_info(user_xp)").fetchall()}
-    if "tasks_completed" not in _xp_cols:
-        conn.execute("ALTER TABLE user_xp ADD COLUMN tasks_completed INTEGER DEFAULT 0")
-        conn.commit()
-
-    if "highest_level_reached" not in _xp_cols:
-        conn.execute("ALTER TABLE user_xp ADD COLUMN highest_level_reached INTEGER DEFAULT 1")
-        # Sync highest_level with current_level for existing rows
-        conn.execute("UPDATE user_xp SET highest_level_reached = current_level")
-        conn.commit()
-
-    # Migrations: extracted_text on exam_files + update CHECK constraint to include summary/sample_exam
-    # SQLite cannot ALTER CHECK constraints, so we must rebuild the table if the constraint is outdated.
-    exam_file_columns = {row[1] for row in conn.execute("PRAGMA table_info(exam_files)").fetchall()}
-    need_check_update = "extracted_text" not in exam_file_columns
-
-    if need_check_update:
-        try:
-            conn.execute("PRAGMA foreign_keys = OFF;")
-            conn.execute("BEGIN TRANSACTION;")
-            conn.execute("""
-                CREATE TABLE exam_files_new (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    exam_id INTEGER NOT NULL,
-                    filename TEXT NOT NULL,
-                    file_path TEXT NOT NULL,
-                    file_type TEXT NOT NULL CHECK(file_type IN ('syllabus', 'summary', 'sample_exam', 'past_exam', 'notes', 'other')),
-                    file_size INTEGER,
-                    uploaded_at TEXT DEFAULT (datetime('now')),
-                    extracted_text TEXT,
-                    FOREIGN KEY (exam_id) REFERENCES exams(id) ON DELETE CASCADE
-                );
-            """)
-
-            # Copy existing data; extracted_text defaults to NULL for old rows
-            existing_ef_cols = [row[1] for row in conn.execute("PRAGMA table_info(exam_files)").fetchall()]
-            cols_to_copy = [c for c in existing_ef_cols if c != "extracted_text"]
-            cols_str = ", ".join(cols_to_copy)
-            conn.execute(f"INSERT INTO exam_files_new ({cols_str}) SELECT {cols_str} FROM exam_files;")
-
-            conn.execute("DROP TABLE exam_files;")
-            conn.execute("ALTER TABLE exam_files_new RENAME TO exam_files;")
-
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_exam_files_exam ON exam_files(exam_id);")
-
-            conn.execute("COMMIT;")
-            conn.execute("PRAGMA foreign_keys = ON;")
-        except Exception as e:
-            conn.execute("ROLLBACK;")
-            print(f"exam_files migration failed: {e}")
-    else:
-        # Table already rebuilt; ensure extracted_text column exists (belt-and-suspenders)
-        if "extracted_text" not in exam_file_columns:
-            conn.execute("ALTER TABLE exam_files ADD COLUMN extracted_text TEXT")
-
-    conn.commit()
-    conn.close()
+    try:
+        migrate(conn)
+    finally:
+        # migrate() switches the connection to autocommit and may toggle
+        # PRAGMA foreign_keys; don't recycle it into the pool.
+        conn.discard()
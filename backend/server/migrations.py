@@ -0,0 +1,700 @@
+"""Schema migrations, versioned with SQLite's PRAGMA user_version.
+
+MIGRATIONS is an ordered list of numbered steps. migrate() reads
+user_version, returns at once if the schema is already current (one PRAGMA on
+every start-up after the first), and otherwise applies each pending step in
+its own BEGIN IMMEDIATE transaction that also bumps user_version, so a step
+is applied completely or not at all. The version is re-read after taking the
+write lock, so several processes starting together apply each step once.
+
+Step 1 is the schema as it stood before versioning, together with the
+column-by-column checks that brought older databases up to it; an existing
+database starts at user_version 0 and passes through it harmlessly. New schema
+changes go in a new step at the end of MIGRATIONS, never into an old one.
+Steps should still be safe to re-run: a step that fails rolls back, stops
+start-up, and runs again from the top next time.
+
+Tables whose constraints change are rebuilt with rebuild_table(), which copies
+rows in batches while triggers keep the copy in step with ongoing writes.
+"""
+
+import logging
+import sqlite3
+
+from server.config import MIGRATION_BATCH_ROWS
+from server.database import block_start_epoch_sql
+
+logger = logging.getLogger(__name__)
+
+
+def _user_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _columns(conn, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _exists(conn, table: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def _script(conn, sql: str):
+    """executescript() without its implicit COMMIT, so a step stays one transaction."""
+    statement = ""
+    for line in sql.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        conn.execute(statement)
+
+
+def rebuild_table(conn, table: str, definition: str, key: str = "id", batch_rows: int = MIGRATION_BATCH_ROWS):
+    """Recreate `table` with a new definition (the part inside CREATE TABLE's parentheses).
+
+    Columns present in both the old and the new table are copied, `batch_rows`
+    rows per transaction, into a shadow table; triggers on the old table
+    mirror inserts, updates and deletes into the shadow meanwhile, so other
+    connections can keep writing. The swap (drop, rename, re-create the old
+    indexes) is one short transaction. An interrupted rebuild resumes from the
+    shadow table on the next run, and a process that finds the shadow table
+    gone mid-copy leaves the swap to the one that got there first.
+
+    `key` must be an INTEGER PRIMARY KEY kept by the new definition. Must be
+    called from inside a migration step; the step's transaction is committed
+    first and a fresh one is open again on return.
+    """
+    shadow = f"{table}_rebuild"
+    conn.execute("COMMIT")
+
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {shadow} ({definition})")
+    old_columns = set(_columns(conn, table))
+    columns = [c for c in _columns(conn, shadow) if c in old_columns]
+    if key not in columns:
+        raise ValueError(f"rebuild of {table}: key column {key!r} missing from the new definition")
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"NEW.{c}" for c in columns)
+    indexes = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+    ).fetchall()]
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {shadow}_insert AFTER INSERT ON {table}
+        BEGIN INSERT OR REPLACE INTO {shadow} ({column_list}) VALUES ({new_values}); END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {shadow}_update AFTER UPDATE ON {table}
+        BEGIN
+            DELETE FROM {shadow} WHERE {key} = OLD.{key};
+            INSERT OR REPLACE INTO {shadow} ({column_list}) VALUES ({new_values});
+        END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {shadow}_delete AFTER DELETE ON {table}
+        BEGIN DELETE FROM {shadow} WHERE {key} = OLD.{key}; END""")
+    conn.execute("COMMIT")
+
+    last = None
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        if not _exists(conn, shadow):  # another process finished the rebuild
+            return
+        bound = "" if last is None else f"WHERE {key} > ?"
+        params = () if last is None else (last,)
+        upper = conn.execute(
+            f"SELECT MAX({key}) FROM (SELECT {key} FROM {table} {bound} ORDER BY {key} LIMIT ?)",
+            (*params, batch_rows),
+        ).fetchone()[0]
+        if upper is None:
+            conn.execute("COMMIT")
+            break
+        lower = "" if last is None else f"{key} > ? AND"
+        conn.execute(
+            f"""INSERT INTO {shadow} ({column_list})
+                SELECT {column_list} FROM {table} AS src
+                WHERE {lower} {key} <= ?
+                  AND NOT EXISTS (SELECT 1 FROM {shadow} WHERE {shadow}.{key} = src.{key})""",
+            (*params, upper),
+        )
+        conn.execute("COMMIT")
+        last = upper
+
+    # Dropping the old table must not cascade into the tables that reference
+    # it, and the pragma only takes effect outside a transaction.
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if _exists(conn, shadow):
+            conn.execute(f"DROP TABLE {table}")
+            conn.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+            for sql in indexes:
+                conn.execute(sql)
+            dangling = conn.execute(f"PRAGMA foreign_key_check({table})").fetchall()
+            if dangling:
+                logger.warning(f"{table} has {len(dangling)} row(s) with dangling foreign keys")
+            logger.info(f"Rebuilt table {table}")
+        conn.execute("COMMIT")
+    finally:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("BEGIN IMMEDIATE")
+
+
+# ─── Step 1: baseline ────────────────────────────────────────
+
+_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE,
+            wake_up_time TEXT DEFAULT '08:00',
+            sleep_time TEXT DEFAULT '23:00',
+            study_method TEXT DEFAULT 'pomodoro',
+            session_minutes INTEGER DEFAULT 50,
+            break_minutes INTEGER DEFAULT 10,
+            hobby_name TEXT,
+            neto_study_hours REAL DEFAULT 4.0,
+            peak_productivity TEXT DEFAULT 'Morning',
+            study_hours_preference TEXT DEFAULT '["morning", "afternoon"]',
+            buffer_days INTEGER DEFAULT 1,
+            onboarding_completed INTEGER DEFAULT 0,
+            fixed_breaks TEXT DEFAULT '[]',
+            created_at TEXT DEFAULT (datetime('now'))
+        );
+
+        CREATE TABLE IF NOT EXISTS exams (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            exam_date TEXT NOT NULL,
+            special_needs TEXT,
+            parsed_context TEXT,
+            status TEXT DEFAULT 'upcoming' CHECK(status IN ('upcoming', 'completed', 'cancelled')),
+            created_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS exam_files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            exam_id INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            file_type TEXT NOT NULL CHECK(file_type IN ('syllabus', 'past_exam', 'notes', 'other')),
+            file_size INTEGER,
+            uploaded_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (exam_id) REFERENCES exams(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS text_blobs (
+            hash TEXT PRIMARY KEY,
+            text TEXT NOT NULL,
+            char_count INTEGER NOT NULL,
+            created_at TEXT DEFAULT (datetime('now'))
+        );
+
+        CREATE TABLE IF NOT EXISTS pdf_text_cache (
+            content_hash TEXT PRIMARY KEY,
+            pages TEXT NOT NULL,
+            page_count INTEGER NOT NULL,
+            created_at TEXT DEFAULT (datetime('now'))
+        );
+
+        CREATE TABLE IF NOT EXISTS auditor_cache (
+            exam_id INTEGER PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (exam_id) REFERENCES exams(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS auditor_drafts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL UNIQUE,
+            version INTEGER NOT NULL DEFAULT 1,
+            gaps TEXT,
+            topic_map TEXT,
+            created_at TEXT DEFAULT (datetime('now')),
+            updated_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS auditor_draft_tasks (
+            draft_id INTEGER NOT NULL,
+            task_index INTEGER NOT NULL,
+            exam_id INTEGER,
+            data TEXT NOT NULL,
+            PRIMARY KEY (draft_id, task_index),
+            FOREIGN KEY (draft_id) REFERENCES auditor_drafts(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            exam_id INTEGER,
+            title TEXT NOT NULL,
+            topic TEXT,
+            subject TEXT,
+            deadline TEXT,
+            day_date TEXT,
+            sort_order INTEGER DEFAULT 0,
+            priority INTEGER DEFAULT 5,
+            estimated_hours REAL DEFAULT 1.0,
+            difficulty INTEGER DEFAULT 3 CHECK(difficulty BETWEEN 0 AND 5),
+            status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'in_progress', 'done', 'deferred')),
+            is_delayed INTEGER DEFAULT 0,
+            is_padding INTEGER DEFAULT 0,
+            original_date TEXT,
+            linked_task_id INTEGER,
+            created_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (exam_id) REFERENCES exams(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS schedule_blocks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            task_id INTEGER,
+            exam_id INTEGER,
+            exam_name TEXT,
+            task_title TEXT,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            day_date TEXT,
+            block_type TEXT DEFAULT 'study' CHECK(block_type IN ('study', 'break', 'hobby')),
+            completed INTEGER DEFAULT 0,
+            is_delayed INTEGER DEFAULT 0,
+            is_split INTEGER DEFAULT 0,
+            part_number INTEGER,
+            total_parts INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (task_id) REFERENCES tasks(id),
+            FOREIGN KEY (exam_id) REFERENCES exams(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS push_subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            endpoint TEXT NOT NULL UNIQUE,
+            p256dh TEXT NOT NULL,
+            auth TEXT NOT NULL,
+            created_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS notification_messages (
+            cache_key TEXT PRIMARY KEY,
+            body TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            expires_at INTEGER NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            idempotency_key TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            payload TEXT,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT DEFAULT (datetime('now')),
+            started_at TEXT,
+            finished_at TEXT,
+            UNIQUE (user_id, idempotency_key),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS user_xp (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL UNIQUE,
+            total_xp INTEGER DEFAULT 0,
+            current_level INTEGER DEFAULT 1,
+            highest_level_reached INTEGER DEFAULT 1,
+            daily_xp INTEGER DEFAULT 0,
+            daily_xp_date TEXT,
+            tasks_completed INTEGER DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS user_streaks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL UNIQUE,
+            current_streak INTEGER DEFAULT 0,
+            longest_streak INTEGER DEFAULT 0,
+            last_login_date TEXT,
+            streak_broken INTEGER DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS user_badges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            badge_key TEXT NOT NULL,
+            earned_at TEXT DEFAULT (datetime('now')),
+            UNIQUE (user_id, badge_key),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_exams_user_date ON exams(user_id, exam_date);
+        CREATE INDEX IF NOT EXISTS idx_exam_files_exam ON exam_files(exam_id);
+        CREATE INDEX IF NOT EXISTS idx_tasks_exam ON tasks(exam_id);
+        CREATE INDEX IF NOT EXISTS idx_schedule_day ON schedule_blocks(day_date);
+        CREATE INDEX IF NOT EXISTS idx_schedule_task ON schedule_blocks(task_id);
+        CREATE INDEX IF NOT EXISTS idx_user_xp_user ON user_xp(user_id);
+        CREATE INDEX IF NOT EXISTS idx_user_streaks_user ON user_streaks(user_id);
+        CREATE INDEX IF NOT EXISTS idx_user_badges_user ON user_badges(user_id);
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);"""
+
+
+def _baseline(conn):
+    _script(conn, _SCHEMA)
+
+    # Migrations: add auth columns if missing
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(users)").fetchall()}
+    if "password_hash" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN password_hash TEXT DEFAULT ''")
+    if "auth_token" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN auth_token TEXT")
+    if "google_id" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN google_id TEXT")
+    if "google_linked" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN google_linked INTEGER DEFAULT 0")
+    if "hobby_name" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN hobby_name TEXT")
+    if "neto_study_hours" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN neto_study_hours REAL DEFAULT 4.0")
+    if "peak_productivity" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN peak_productivity TEXT DEFAULT 'Morning'")
+    if "study_hours_preference" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN study_hours_preference TEXT DEFAULT '[\"morning\", \"afternoon\"]'")
+    if "buffer_days" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN buffer_days INTEGER DEFAULT 1")
+    if "onboarding_completed" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN onboarding_completed INTEGER DEFAULT 0")
+    if "timezone_offset" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN timezone_offset INTEGER DEFAULT 0")
+    if "fixed_breaks" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN fixed_breaks TEXT DEFAULT '[]'")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_token ON users(auth_token)")
+    # Unique index: only one user per Google ID (CREATE UNIQUE INDEX ignores nulls in SQLite)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_google_id ON users(google_id) WHERE google_id IS NOT NULL")
+
+    # Migrations: add parsed_context to exams if missing
+    exam_columns = {row[1] for row in conn.execute("PRAGMA table_info(exams)").fetchall()}
+    if "parsed_context" not in exam_columns:
+        conn.execute("ALTER TABLE exams ADD COLUMN parsed_context TEXT")
+
+    # Migrations: add calendar columns to tasks if missing
+    task_columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)").fetchall()}
+    if "day_date" not in task_columns:
+        conn.execute("ALTER TABLE tasks ADD COLUMN day_date TEXT")
+    if "sort_order" not in task_columns:
+        conn.execute("ALTER TABLE tasks ADD COLUMN sort_order INTEGER DEFAULT 0")
+    if "is_delayed" not in task_columns:
+        conn.execute("ALTER TABLE tasks ADD COLUMN is_delayed INTEGER DEFAULT 0")
+    if "priority" not in task_columns:
+        conn.execute("ALTER TABLE tasks ADD COLUMN priority INTEGER DEFAULT 5")
+    if "is_padding" not in task_columns:
+        conn.execute("ALTER TABLE tasks ADD COLUMN is_padding INTEGER DEFAULT 0")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_day ON tasks(day_date)")
+    # status='deferred' and the new task columns need a different CHECK
+    # constraint, which SQLite can only change by rebuilding the table.
+    if "original_date" not in task_columns:
+        rebuild_table(conn, "tasks", """
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            exam_id INTEGER,
+            title TEXT NOT NULL,
+            topic TEXT,
+            subject TEXT,
+            deadline TEXT,
+            day_date TEXT,
+            sort_order INTEGER DEFAULT 0,
+            priority INTEGER DEFAULT 5,
+            estimated_hours REAL DEFAULT 1.0,
+            difficulty INTEGER DEFAULT 3 CHECK(difficulty BETWEEN 0 AND 5),
+            status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'in_progress', 'done', 'deferred')),
+            is_delayed INTEGER DEFAULT 0,
+            is_padding INTEGER DEFAULT 0,
+            original_date TEXT,
+            linked_task_id INTEGER,
+            focus_score INTEGER DEFAULT 5,
+            dependency_id INTEGER,
+            created_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (exam_id) REFERENCES exams(id) ON DELETE CASCADE
+        """)
+
+    # Migrations: add is_delayed to schedule_blocks
+    block_columns = {row[1] for row in conn.execute("PRAGMA table_info(schedule_blocks)").fetchall()}
+    if "is_delayed" not in block_columns:
+        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN is_delayed INTEGER DEFAULT 0")
+    if "task_title" not in block_columns:
+        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN task_title TEXT")
+    if "exam_name" not in block_columns:
+        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN exam_name TEXT")
+    if "is_manually_edited" not in block_columns:
+        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN is_manually_edited INTEGER DEFAULT 0")
+    if "deferred_original_day" not in block_columns:
+        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN deferred_original_day TEXT")
+    if "push_notified" not in block_columns:
+        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN push_notified INTEGER DEFAULT 0")
+    if "is_split" not in block_columns:
+        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN is_split INTEGER DEFAULT 0")
+    if "part_number" not in block_columns:
+        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN part_number INTEGER")
+    if "total_parts" not in block_columns:
+        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN total_parts INTEGER")
+
+    # Migrations: add push notification columns to users
+    user_columns = {row[1] for row in conn.execute("PRAGMA table_info(users)").fetchall()}
+    if "push_subscription" not in user_columns:
+        conn.execute("ALTER TABLE users ADD COLUMN push_subscription TEXT")
+    if "notif_timing" not in user_columns:
+        conn.execute("ALTER TABLE users ADD COLUMN notif_timing TEXT DEFAULT 'at_start'")
+    if "notif_per_task" not in user_columns:
+        conn.execute("ALTER TABLE users ADD COLUMN notif_per_task INTEGER DEFAULT 1")
+    if "notif_daily_summary" not in user_columns:
+        conn.execute("ALTER TABLE users ADD COLUMN notif_daily_summary INTEGER DEFAULT 0")
+
+    # Migrations: Split-Brain columns on tasks
+    task_columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)").fetchall()}
+    if "focus_score" not in task_columns:
+        conn.execute("ALTER TABLE tasks ADD COLUMN focus_score INTEGER DEFAULT 5")
+    if "dependency_id" not in task_columns:
+        conn.execute("ALTER TABLE tasks ADD COLUMN dependency_id INTEGER")
+
+    # Migrations: auditor_draft on exams
+    exam_columns = {row[1] for row in conn.execute("PRAGMA table_info(exams)").fetchall()}
+    if "auditor_draft" not in exam_columns:
+        conn.execute("ALTER TABLE exams ADD COLUMN auditor_draft TEXT")
+
+    # Migrations: xp_awarded on schedule_blocks
+    block_columns_xp = {row[1] for row in conn.execute("PRAGMA table_info(schedule_blocks)").fetchall()}
+    if "xp_awarded" not in block_columns_xp:
+        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN xp_awarded INTEGER DEFAULT 0")
+
+    # Add tasks_completed to user_xp if not present (Phase 19.1-03 migration)
+    _xp_cols = {row[1] for row in conn.execute("PRAGMA table_info(user_xp)").fetchall()}
+    if "tasks_completed" not in _xp_cols:
+        conn.execute("ALTER TABLE user_xp ADD COLUMN tasks_completed INTEGER DEFAULT 0")
+
+    if "highest_level_reached" not in _xp_cols:
+        conn.execute("ALTER TABLE user_xp ADD COLUMN highest_level_reached INTEGER DEFAULT 1")
+        # Sync highest_level with current_level for existing rows
+        conn.execute("UPDATE user_xp SET highest_level_reached = current_level")
+    # extracted_text on exam_files, and a CHECK constraint that allows
+    # summary/sample_exam: again a rebuild.
+    if "extracted_text" not in _columns(conn, "exam_files"):
+        rebuild_table(conn, "exam_files", """
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            exam_id INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            file_type TEXT NOT NULL CHECK(file_type IN ('syllabus', 'summary', 'sample_exam', 'past_exam', 'notes', 'other')),
+            file_size INTEGER,
+            uploaded_at TEXT DEFAULT (datetime('now')),
+            extracted_text TEXT,
+            FOREIGN KEY (exam_id) REFERENCES exams(id) ON DELETE CASCADE
+        """)
+
+
+# ─── Step 2: exam file text → text_blobs ─────────────────────
+
+def _exam_file_text_blobs(conn):
+    """Exam file text moves out of exam_files into text_blobs (content-addressed,
+    see brain/text_store.py); rows keep only text_hash."""
+    if "text_hash" not in _columns(conn, "exam_files"):
+        conn.execute("ALTER TABLE exam_files ADD COLUMN text_hash TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_exam_files_text_hash ON exam_files(text_hash)")
+    legacy_text_ids = [
+        row[0] for row in conn.execute("SELECT id FROM exam_files WHERE extracted_text IS NOT NULL").fetchall()
+    ]
+    if legacy_text_ids:
+        from brain.text_store import put_text
+        for file_id in legacy_text_ids:  # one document in memory at a time
+            text = conn.execute("SELECT extracted_text FROM exam_files WHERE id = ?", (file_id,)).fetchone()[0]
+            conn.execute(
+                "UPDATE exam_files SET text_hash = ?, extracted_text = NULL WHERE id = ?",
+                (put_text(conn, text), file_id),
+            )
+
+
+# ─── Step 3: Auditor drafts → auditor_drafts ─────────────────
+
+def _auditor_draft_tables(conn):
+    """Auditor drafts move from a JSON copy on every upcoming exam row
+    (exams.auditor_draft) to auditor_drafts / auditor_draft_tasks (brain/drafts.py)."""
+    legacy_draft_users = [row[0] for row in conn.execute(
+        "SELECT DISTINCT user_id FROM exams WHERE auditor_draft IS NOT NULL"
+    ).fetchall()]
+    if not legacy_draft_users:
+        return
+    from brain.drafts import save_draft
+    from server.compression import unpack_json
+    for user_id in legacy_draft_users:
+        row = conn.execute(
+            """SELECT auditor_draft FROM exams
+               WHERE user_id = ? AND status = 'upcoming' AND auditor_draft IS NOT NULL
+               ORDER BY exam_date LIMIT 1""",
+            (user_id,),
+        ).fetchone()
+        has_draft = conn.execute("SELECT 1 FROM auditor_drafts WHERE user_id = ?", (user_id,)).fetchone()
+        if row and not has_draft:
+            try:
+                save_draft(conn, user_id, unpack_json(row[0]) or {})
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.warning(f"Auditor draft migration skipped user {user_id}: {e}")
+        conn.execute("UPDATE exams SET auditor_draft = NULL WHERE user_id = ?", (user_id,))
+
+
+# ─── Step 4: compress large text ─────────────────────────────
+
+def _compress_large_text(conn):
+    """Compress large text values written before server/compression.py."""
+    from server.compression import COMPRESS_MIN_BYTES, pack_text
+    for table, key, column in (
+        ("text_blobs", "hash", "text"),
+        ("pdf_text_cache", "content_hash", "pages"),
+        ("exams", "id", "parsed_context"),
+    ):
+        keys = [row[0] for row in conn.execute(
+            f"SELECT {key} FROM {table} WHERE typeof({column}) = 'text' AND length(CAST({column} AS BLOB)) >= ?",
+            (COMPRESS_MIN_BYTES,),
+        ).fetchall()]
+        for k in keys:  # one value in memory at a time
+            value = conn.execute(f"SELECT {column} FROM {table} WHERE {key} = ?", (k,)).fetchone()[0]
+            conn.execute(f"UPDATE {table} SET {column} = ? WHERE {key} = ?", (pack_text(value), k))
+
+
+# ─── Step 5: schedule_blocks.start_utc_epoch ─────────────────
+
+def _schedule_block_epoch(conn):
+    """start_utc_epoch on schedule_blocks — normalized UTC start for the
+    notification tick's indexed range scan. Triggers keep it current on every
+    block write (including SQL datetime() shifts) and on timezone changes."""
+    if "start_utc_epoch" not in _columns(conn, "schedule_blocks"):
+        conn.execute("ALTER TABLE schedule_blocks ADD COLUMN start_utc_epoch INTEGER")
+        conn.execute(
+            "UPDATE schedule_blocks SET start_utc_epoch = "
+            + block_start_epoch_sql("schedule_blocks.start_time", "schedule_blocks.user_id")
+        )
+    _script(conn, f"""
+        CREATE TRIGGER IF NOT EXISTS trg_schedule_blocks_epoch_insert
+        AFTER INSERT ON schedule_blocks
+        BEGIN
+            UPDATE schedule_blocks
+            SET start_utc_epoch = {block_start_epoch_sql("NEW.start_time", "NEW.user_id")}
+            WHERE id = NEW.id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_schedule_blocks_epoch_update
+        AFTER UPDATE OF start_time, user_id ON schedule_blocks
+        BEGIN
+            UPDATE schedule_blocks
+            SET start_utc_epoch = {block_start_epoch_sql("NEW.start_time", "NEW.user_id")}
+            WHERE id = NEW.id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_users_timezone_block_epoch
+        AFTER UPDATE OF timezone_offset ON users
+        WHEN NEW.timezone_offset IS NOT OLD.timezone_offset
+        BEGIN
+            UPDATE schedule_blocks
+            SET start_utc_epoch = {block_start_epoch_sql("schedule_blocks.start_time", "schedule_blocks.user_id")}
+            WHERE user_id = NEW.id;
+        END;
+
+        CREATE INDEX IF NOT EXISTS idx_schedule_due ON schedule_blocks(push_notified, start_utc_epoch);
+    """)
+
+
+# ─── Step 6: per-user composite indexes ──────────────────────
+
+def _per_user_indexes(conn):
+    """Composite indexes for the per-user access paths. Schedule and task reads
+    filter on user_id first; with only idx_schedule_day / idx_tasks_day they
+    walked every user's rows for a date (or the whole table). Nothing filters
+    on day_date alone, so those two go. schedule_blocks(exam_id) serves the
+    ON DELETE CASCADE from exams, and notification_messages(expires_at) the
+    expiry sweep. scripts/test_query_plans.py guards against new full scans."""
+    _script(conn, """
+        CREATE INDEX IF NOT EXISTS idx_schedule_user_day ON schedule_blocks(user_id, day_date, start_time);
+        CREATE INDEX IF NOT EXISTS idx_schedule_user_edited ON schedule_blocks(user_id, is_manually_edited);
+        CREATE INDEX IF NOT EXISTS idx_schedule_exam ON schedule_blocks(exam_id);
+        CREATE INDEX IF NOT EXISTS idx_tasks_user_status_day ON tasks(user_id, status, day_date, sort_order);
+        CREATE INDEX IF NOT EXISTS idx_push_subscriptions_user ON push_subscriptions(user_id);
+        CREATE INDEX IF NOT EXISTS idx_notification_messages_expires ON notification_messages(expires_at);
+        DROP INDEX IF EXISTS idx_schedule_day;
+        DROP INDEX IF EXISTS idx_tasks_day;
+    """)
+
+
+# ─── Step 7: job heartbeats ──────────────────────────────────
+
+def _job_heartbeat(conn):
+    """heartbeat_at on jobs: refreshed by the worker running the job, so an
+    orphaned job is noticed within JOB_LEASE_SECONDS (brain/jobs.py)."""
+    if "heartbeat_at" not in _columns(conn, "jobs"):
+        conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at TEXT")
+
+
+# ─── Step 8: planned task days ───────────────────────────────
+
+def _task_planned_day(conn):
+    """planned_day on tasks: the day the Enforcer was given for the task, kept
+    apart from day_date (which sync_task_days moves to the task's last block)
+    so regenerating an unchanged schedule reproduces it (brain/persistence.py)."""
+    if "planned_day" not in _columns(conn, "tasks"):
+        conn.execute("ALTER TABLE tasks ADD COLUMN planned_day TEXT")
+
+
+# ─── Runner ──────────────────────────────────────────────────
+
+# (version, description, step). Append only.
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "exam file text in text_blobs", _exam_file_text_blobs),
+    (3, "auditor draft tables", _auditor_draft_tables),
+    (4, "compress large text columns", _compress_large_text),
+    (5, "schedule_blocks.start_utc_epoch", _schedule_block_epoch),
+    (6, "per-user composite indexes", _per_user_indexes),
+    (7, "job heartbeats", _job_heartbeat),
+    (8, "tasks.planned_day", _task_planned_day),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def migrate(conn):
+    """Bring the database up to SCHEMA_VERSION (see module docstring).
+
+    Uses explicit transactions, so it switches `conn` to autocommit mode;
+    pass a connection that is discarded afterwards.
+    """
+    version = _user_version(conn)
+    if version == SCHEMA_VERSION:
+        return
+    if version > SCHEMA_VERSION:
+        logger.warning(f"Database schema is version {version}, newer than this code ({SCHEMA_VERSION})")
+        return
+
+    conn.isolation_level = None
+    for number, description, step in MIGRATIONS:
+        if number <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if _user_version(conn) >= number:  # applied by another process meanwhile
+                conn.execute("COMMIT")
+                continue
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.exception(f"Schema migration {number} ({description}) failed")
+            raise
+        logger.info(f"Applied schema migration {number}: {description}")
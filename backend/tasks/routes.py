@@ -3,7 +3,7 @@
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List
-from server.database import get_db
+from server.database import db_connection
 from auth.utils import get_current_user, verify_csrf_token
 from tasks.schemas import TaskResponse, BlockUpdate
 from gamification.utils import revoke_user_xp, xp_for_block
@@ -12,8 +12,7 @@ router = APIRouter(dependencies=[Depends(verify_csrf_token)])
 
 
 @router.get("/tasks", response_model=List[TaskResponse])
-def get_tasks(current_user: dict = Depends(get_current_user)):
-    db = get_db()
+def get_tasks(current_user: dict = Depends(get_current_user), db=Depends(db_connection)):
     rows = db.execute("""
         SELECT t.*, e.name as exam_name
         FROM tasks t
@@ -21,20 +20,17 @@ def get_tasks(current_user: dict = Depends(get_current_user)):
         WHERE t.user_id = ? AND t.status != 'done'
         ORDER BY t.day_date, t.sort_order
     """, (current_user["id"],)).fetchall()
-    db.close()
     return [TaskResponse(**dict(r)) for r in rows]
 
 
 @router.patch("/tasks/block/{block_id}")
-def update_block(block_id: int, body: BlockUpdate, current_user: dict = Depends(get_current_user)):
+def update_block(block_id: int, body: BlockUpdate, current_user: dict = Depends(get_current_user), db=Depends(db_connection)):
     """Update an individual schedule block's details."""
-    db = get_db()
     
     # 1. Ownership check
     block = db.execute("SELECT * FROM schedule_blocks WHERE id = ? AND user_id = ?",
                        (block_id, current_user["id"])).fetchone()
     if not block:
-        db.close()
         raise HTTPException(status_code=404, detail="Block not found")
 
     # 2. Update block fields
@@ -67,7 +63,6 @@ def update_block(block_id: int, body: BlockUpdate, current_user: dict = Depends(
         updates.append("push_notified = 0")
 
     if not updates:
-        db.close()
         return {"message": "No changes provided"}
         
     params.append(block_id)
@@ -93,22 +88,19 @@ def update_block(block_id: int, body: BlockUpdate, current_user: dict = Depends(
             )
         
     db.commit()
-    db.close()
     return {"message": "Block updated successfully"}
 
 
 @router.delete("/tasks/block/{block_id}")
-def delete_block(block_id: int, current_user: dict = Depends(get_current_user)):
+def delete_block(block_id: int, current_user: dict = Depends(get_current_user), db=Depends(db_connection)):
     """Delete an individual schedule block and handle task status."""
     user_id = current_user["id"]
     tz_offset = current_user.get("timezone_offset", 0) or 0
-    db = get_db()
 
     # 1. Fetch block to know what we are deleting
     block = db.execute("SELECT * FROM schedule_blocks WHERE id = ? AND user_id = ?",
                        (block_id, user_id)).fetchone()
     if not block:
-        db.close()
         raise HTTPException(status_code=404, detail="Block not found")
 
     # 2. Revoke XP for any awarded blocks before deletion
@@ -142,19 +134,16 @@ def delete_block(block_id: int, current_user: dict = Depends(get_current_user)):
         )
 
     db.commit()
-    db.close()
     return {"message": "Task and all associated blocks deleted successfully"}
 
 
 @router.patch("/tasks/block/{block_id}/done")
-def mark_block_done(block_id: int, current_user: dict = Depends(get_current_user)):
-    db = get_db()
+def mark_block_done(block_id: int, current_user: dict = Depends(get_current_user), db=Depends(db_connection)):
     row = db.execute(
         "SELECT id, task_id FROM schedule_blocks WHERE id = ? AND user_id = ?",
         (block_id, current_user["id"])
     ).fetchone()
     if not row:
-        db.close()
         raise HTTPException(status_code=404, detail="Block not found")
 
     db.execute(
@@ -173,19 +162,16 @@ def mark_block_done(block_id: int, current_user: dict = Depends(get_current_user
                 (row["task_id"], current_user["id"])
             )
     db.commit()
-    db.close()
     return {"message": "Block marked as done!"}
 
 
 @router.patch("/tasks/block/{block_id}/undone")
-def mark_block_undone(block_id: int, current_user: dict = Depends(get_current_user)):
-    db = get_db()
+def mark_block_undone(block_id: int, current_user: dict = Depends(get_current_user), db=Depends(db_connection)):
     row = db.execute(
         "SELECT id, task_id FROM schedule_blocks WHERE id = ? AND user_id = ?",
         (block_id, current_user["id"])
     ).fetchone()
     if not row:
-        db.close()
         raise HTTPException(status_code=404, detail="Block not found")
 
     db.execute(
@@ -199,13 +185,11 @@ def mark_block_undone(block_id: int, current_user: dict = Depends(get_current_us
             (row["task_id"], current_user["id"])
         )
     db.commit()
-    db.close()
     return {"message": "Block marked as undone!"}
 
 
 @router.patch("/tasks/{task_id}/done")
-def mark_task_done(task_id: int, current_user: dict = Depends(get_current_user)):
-    db = get_db()
+def mark_task_done(task_id: int, current_user: dict = Depends(get_current_user), db=Depends(db_connection)):
     db.execute(
         "UPDATE tasks SET status = 'done' WHERE id = ? AND user_id = ?",
         (task_id, current_user["id"])
@@ -216,13 +200,11 @@ def mark_task_done(task_id: int, current_user: dict = Depends(get_current_user))
         (task_id, current_user["id"])
     )
     db.commit()
-    db.close()
     return {"message": "Task marked as done!"}
 
 
 @router.patch("/tasks/{task_id}/undone")
-def mark_task_undone(task_id: int, current_user: dict = Depends(get_current_user)):
-    db = get_db()
+def mark_task_undone(task_id: int, current_user: dict = Depends(get_current_user), db=Depends(db_connection)):
     db.execute(
         "UPDATE tasks SET status = 'pending' WHERE id = ? AND user_id = ?",
         (task_id, current_user["id"])
@@ -233,31 +215,26 @@ def mark_task_undone(task_id: int, current_user: dict = Depends(get_current_user
         (task_id, current_user["id"])
     )
     db.commit()
-    db.close()
     return {"message": "Task marked as pending"}
 
 
 @router.post("/tasks/block/{block_id}/defer")
-def defer_block_to_next_day(block_id: int, current_user: dict = Depends(get_current_user)):
+def defer_block_to_next_day(block_id: int, current_user: dict = Depends(get_current_user), db=Depends(db_connection)):
     """Move a schedule block to the next calendar day (push-to-next-day foundation)."""
-    db = get_db()
     block = db.execute(
         "SELECT id, task_id, user_id, day_date, start_time, end_time FROM schedule_blocks WHERE id = ? AND user_id = ?",
         (block_id, current_user["id"])
     ).fetchone()
     if not block:
-        db.close()
         raise HTTPException(status_code=404, detail="Block not found")
 
     day_date = block["day_date"]
     if not day_date:
-        db.close()
         raise HTTPException(status_code=400, detail="Block has no day_date")
 
     try:
         dt = datetime.strptime(day_date, "%Y-%m-%d")
     except ValueError:
-        db.close()
         raise HTTPException(status_code=400, detail="Invalid day_date format")
 
     next_day = (dt + timedelta(days=1)).strftime("%Y-%m-%d")
@@ -293,15 +270,13 @@ def defer_block_to_next_day(block_id: int, current_user: dict = Depends(get_curr
             (next_day, block["task_id"], current_user["id"])
         )
     db.commit()
-    db.close()
     return {"message": "Block deferred to next day", "day_date": next_day}
 
 
 @router.patch("/tasks/{task_id}/shift-time")
-def shift_task_time(task_id: int, body: dict, current_user: dict = Depends(get_current_user)):
+def shift_task_time(task_id: int, body: dict, current_user: dict = Depends(get_current_user), db=Depends(db_connection)):
     """Manually shift a task start/end times via schedule_blocks."""
     minutes = body.get("minutes", 0)
-    db = get_db()
     
     # We update the schedule_blocks directly for manual overrides
     # In a full system, we might update the task itself, but blocks are the source of truth for the hourly view
@@ -314,14 +289,12 @@ def shift_task_time(task_id: int, body: dict, current_user: dict = Depends(get_c
         (f"{minutes:+}", f"{minutes:+}", task_id, current_user["id"])
     )
     db.commit()
-    db.close()
     return {"message": f"Shifted task by {minutes} minutes"}
 
 
 @router.patch("/tasks/{task_id}/duration")
-def update_task_duration(task_id: int, body: dict, current_user: dict = Depends(get_current_user)):
+def update_task_duration(task_id: int, body: dict, current_user: dict = Depends(get_current_user), db=Depends(db_connection)):
     hours = body.get("estimated_hours", 1.0)
-    db = get_db()
     
     # Update task estimation
     db.execute(
@@ -340,5 +313,4 @@ def update_task_duration(task_id: int, body: dict, current_user: dict = Depends(
     )
     
     db.commit()
-    db.close()
     return {"message": "Duration updated"}
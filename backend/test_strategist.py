@@ -7,7 +7,7 @@ sys.path.append(os.getcwd())
 
 from brain.exam_brain import ExamBrain
 
-async def test():
+async def main():
     user = {
         'id': 1, 
         'neto_study_hours': 4.0, 
@@ -33,7 +33,7 @@ async def test():
     brain = ExamBrain(user, exams)
     print(f"Testing model: {brain.model}")
     try:
-        res = await brain.call_strategist(approved_tasks)
+        res = await brain.call_strategist(approved_tasks, mode="llm")
         print('SUCCESS:', res)
     except Exception as e:
         import traceback
@@ -41,4 +41,4 @@ async def test():
         print('FAILURE:', e)
 
 if __name__ == "__main__":
-    asyncio.run(test())
+    asyncio.run(main())
@@ -2,7 +2,7 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 from server.database import get_db
-from auth.utils import get_current_user
+from auth.utils import get_current_user, invalidate_user_session
 from users.schemas import UserResponse, UserUpdate
 
 router = APIRouter()
@@ -24,6 +24,7 @@ def update_profile(body: UserUpdate, current_user: dict = Depends(get_current_us
     values = list(updates.values()) + [current_user["id"]]
     db.execute(f"UPDATE users SET {set_clause} WHERE id = ?", values)
     db.commit()
+    invalidate_user_session(current_user["id"])
 
     row = db.execute("SELECT * FROM users WHERE id = ?", (current_user["id"],)).fetchone()
     db.close()
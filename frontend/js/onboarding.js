@@ -1,7 +1,7 @@
 /* frontend/js/onboarding.js */
 import { getAPI, authFetch, setCurrentUser, setCurrentExams, setCurrentSchedule } from './store.js?v=59';
-import { showScreen, LoadingAnimator } from './ui.js?v=59';
-import { renderAuditorReview } from './tasks.js?v=59';
+import { showScreen, showModal, LoadingAnimator } from './ui.js?v=59';
+import { streamAuditorDraft } from './tasks.js?v=59';
 
 const ONBOARDING_DRAFT_KEY = 'sf_onboarding_draft';
 
@@ -471,6 +471,8 @@ async function submitOnboarding() {
         });
         
         formData.append('onboard_data', JSON.stringify(onboardRequest));
+        // The Auditor is streamed separately below so the review screen can fill progressively.
+        formData.append('run_auditor', 'false');
         
         // CSRF Protection
         const cookies = document.cookie.split(';').reduce((acc, c) => {
@@ -496,17 +498,25 @@ async function submitOnboarding() {
             throw new Error(err.detail || 'Onboarding failed');
         }
         
-        const data = await response.json();
+        await response.json();
 
         // Success!
         clearDraft();
 
-        // Show the Auditor Review screen with the generated roadmap
-        if (data.tasks && data.tasks.length > 0) {
-            window._auditorDraft = data;
-            renderAuditorReview(data);
-            showScreen('screen-auditor-review');
-        } else {
+        // Stream the Auditor; the review screen opens with the first finished exam
+        const animator = new LoadingAnimator('loading');
+        showModal('loading-overlay', true);
+        animator.start();
+        let taskCount = 0;
+        try {
+            taskCount = await streamAuditorDraft(animator);
+        } catch (e) {
+            console.error('Auditor stream failed:', e);
+        }
+
+        if (taskCount === 0) {
+            animator.stop();
+            showModal('loading-overlay', false);
             // Fallback: show success state if no tasks were generated
             document.querySelectorAll('.onb-step').forEach(el => el.style.display = 'none');
             const successEl = document.getElementById('onb-success');
@@ -645,36 +645,104 @@ export async function generateRoadmap() {
     showModal('loading-overlay', true);
     animator.start();
 
-    const API = getAPI();
     try {
-        const res = await authFetch(`${API}/brain/generate-roadmap`, { method: 'POST' });
-        const data = await res.json();
-        if (!res.ok) {
+        const taskCount = await streamAuditorDraft(animator);
+        if (taskCount === 0) {
             animator.stop();
             showModal('loading-overlay', false);
-            alert(data.detail || 'Failed to generate roadmap');
-            return;
+            alert('Failed to generate roadmap');
         }
-
-        animator.stop();
-        showModal('loading-overlay', false);
-
-        // Store auditor draft in memory and navigate to the review screen
-        window._auditorDraft = {
-            tasks: data.tasks || [],
-            gaps: data.gaps || [],
-            topic_map: data.topic_map || {}
-        };
-        renderAuditorReview(window._auditorDraft);
-        showScreen('screen-auditor-review');
-        hideRegenBar();
     } catch (e) {
         animator.stop();
         showModal('loading-overlay', false);
-        alert('Failed to generate roadmap. Check server logs.');
+        alert(e.message || 'Failed to generate roadmap. Check server logs.');
     }
 }
 
+/** Append one exam's Auditor result to the in-memory draft, re-indexing its tasks after the existing ones. */
+function _appendExamAudit(draft, result) {
+    const offset = draft.tasks.length;
+    (result.tasks || []).forEach((task, idx) => {
+        if (task.dependency_id !== null && task.dependency_id !== undefined) {
+            task.dependency_id += offset;
+        }
+        task.task_index = offset + idx;
+        draft.tasks.push(task);
+    });
+    draft.gaps.push(...(result.gaps || []));
+    Object.assign(draft.topic_map, result.topic_map || {});
+}
+
+/**
+ * Run the Auditor through POST /brain/generate-roadmap/stream (Server-Sent Events).
+ * Task titles are shown on the loading overlay as the model writes them; the review
+ * screen opens with the first finished exam and fills in as the others finish.
+ * Resolves with the total number of tasks (0 = nothing generated, overlay still open).
+ */
+export async function streamAuditorDraft(animator) {
+    const API = getAPI();
+    const res = await authFetch(`${API}/brain/generate-roadmap/stream`, { method: 'POST' });
+    if (!res.ok) {
+        const data = await res.json().catch(() => ({}));
+        throw new Error(data.detail || 'Failed to generate roadmap');
+    }
+
+    const draft = { tasks: [], gaps: [], topic_map: {} };
+    let examCount = 1;
+    let examsDone = 0;
+    let previews = 0;
+    let shown = false;
+
+    const handleEvent = (event) => {
+        if (event.type === 'start') {
+            examCount = Math.max(1, event.exam_count || 1);
+        } else if (event.type === 'task') {
+            previews++;
+            if (!shown) {
+                if (animator.interval) clearInterval(animator.interval);
+                const percent = Math.min(95, 10 + (85 * examsDone) / examCount);
+                animator.update(percent, `${previews} tasks · ${event.task.title}`);
+            }
+        } else if (event.type === 'exam' || event.type === 'exam_error') {
+            examsDone++;
+            if (event.type === 'exam') _appendExamAudit(draft, event);
+            if (!shown && draft.tasks.length > 0) {
+                shown = true;
+                animator.stop();
+                showModal('loading-overlay', false);
+                window._auditorDraft = draft;
+                renderAuditorReview(draft);
+                showScreen('screen-auditor-review');
+                hideRegenBar();
+            } else if (shown && event.type === 'exam') {
+                // Topics step keeps the user's rejections; later steps read the draft when opened.
+                _renderWizardStep1(draft);
+            }
+        } else if (event.type === 'done') {
+            draft.version = event.version;
+        } else if (event.type === 'error') {
+            throw new Error(event.detail);
+        }
+    };
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            const data = frame.split('\n').filter(l => l.startsWith('data: ')).map(l => l.slice(6)).join('\n');
+            if (data) handleEvent(JSON.parse(data));
+        }
+    }
+    return draft.tasks.length;
+}
+
 /** Render the Auditor Review Screen as a two-step wizard. */
 export function renderAuditorReview(data) {
     // Reset wizard state
@@ -974,6 +1042,20 @@ function _addSearchTaskFromGap(topic, examId) {
         sort_order: 9999
     };
     window._auditorDraft.tasks.push(searchTask);
+    _saveDraftTasks(window._auditorDraft, [searchTask]);
+}
+
+/** Persist edited/added draft tasks (PATCH /brain/auditor-draft) so they survive a refresh. */
+async function _saveDraftTasks(draft, tasks) {
+    if (draft.version === undefined) return; // draft not stored yet
+    try {
+        const res = await authFetch(`${getAPI()}/brain/auditor-draft`, {
+            method: 'PATCH',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ version: draft.version, tasks })
+        });
+        if (res.ok) draft.version = (await res.json()).version;
+    } catch (_) { /* non-fatal: the edit still applies to this session */ }
 }
 
 /** Navigate wizard: step 1 → step 2 (gaps). */
@@ -999,7 +1081,50 @@ export function wizardBackToStep2() {
     // Gaps already rendered, DOM state preserved
 }
 
-/** Collect approved tasks (excluding rejected) and POST to /brain/approve-and-schedule. */
+function _newIdempotencyKey() {
+    return (window.crypto && crypto.randomUUID)
+        ? crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}
+
+// Give up polling a job after this long (the server re-queues a job whose
+// worker died, so a stuck "running" job resolves itself well before this).
+const BRAIN_JOB_TIMEOUT_MS = 10 * 60 * 1000;
+
+/**
+ * Queue Auditor/Strategist work with POST /brain/jobs and poll until it finishes.
+ * Resolves with the job result; rejects with the server's error message, or
+ * after timeoutMs without a result.
+ * The job keeps running server-side even if this page goes away.
+ */
+export async function runBrainJob(body, idempotencyKey, pollMs = 1500, timeoutMs = BRAIN_JOB_TIMEOUT_MS) {
+    const API = getAPI();
+    const headers = { 'Content-Type': 'application/json' };
+    if (idempotencyKey) headers['Idempotency-Key'] = idempotencyKey;
+    const res = await authFetch(`${API}/brain/jobs`, {
+        method: 'POST',
+        headers,
+        body: JSON.stringify(body)
+    });
+    let job = await res.json();
+    if (!res.ok) throw new Error(job.detail || 'Failed to start');
+
+    const deadline = Date.now() + timeoutMs;
+    while (job.status === 'queued' || job.status === 'running') {
+        if (Date.now() >= deadline) {
+            throw new Error('This is taking longer than expected. Please try again in a few minutes.');
+        }
+        await new Promise(resolve => setTimeout(resolve, pollMs));
+        const poll = await authFetch(`${API}/brain/jobs/${job.job_id}`);
+        const data = await poll.json();
+        if (!poll.ok) throw new Error(data.detail || 'Lost track of the job');
+        job = data;
+    }
+    if (job.status !== 'done') throw new Error(job.error || 'Job failed');
+    return job.result;
+}
+
+/** Collect approved tasks (excluding rejected) and run the Strategist as a background job. */
 export async function approveSchedule() {
     const draft = window._auditorDraft;
     if (!draft || !draft.tasks) {
@@ -1025,17 +1150,17 @@ export async function approveSchedule() {
     animator.start();
 
     const API = getAPI();
+    // One key per approval attempt: a double-click joins the job the first click started.
+    if (!draft._approveKey) draft._approveKey = _newIdempotencyKey();
     try {
-        const res = await authFetch(`${API}/brain/approve-and-schedule`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ approved_tasks: approvedTasks })
-        });
-        const data = await res.json();
-        if (!res.ok) {
+        let data;
+        try {
+            data = await runBrainJob({ kind: 'strategist', approved_tasks: approvedTasks }, draft._approveKey);
+        } catch (e) {
+            draft._approveKey = null;
             animator.stop();
             showModal('loading-overlay', false);
-            alert(data.detail || 'Failed to generate schedule');
+            alert(e.message || 'Failed to generate schedule');
             return;
         }
 
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Benchmark the Enforcer (brain/scheduler.py) and schedule regeneration.
+
+Generates synthetic users (varied wake/sleep times, study preferences, fixed
+breaks, timezones), exams and 50–2000 tasks, then times:
+
+  * generate_multi_exam_schedule      — the pure scheduling hot path
+  * internal_regenerate_schedule      — full DB round trip against a temp
+                                        SQLite file (diff and full rewrite)
+
+and reports p50 / p95 latency plus peak traced allocations per case.
+
+Usage (from the project root):
+    python scripts/bench_scheduler.py                      # run + compare to baseline
+    python scripts/bench_scheduler.py --write-baseline     # record a new baseline
+    python scripts/bench_scheduler.py --sizes 50,500 --repeat 5 --no-db
+
+Timings are machine dependent: record the baseline on the machine that will
+run the comparison. Exits with status 1 when any case's p50 is more than
+--tolerance (default 25%) slower than the baseline.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+from brain.scheduler import generate_multi_exam_schedule  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_scheduler_baseline.json")
+DEFAULT_SIZES = "50,200,500,2000"
+
+USER_PROFILES = [
+    {"wake_up_time": "07:00", "sleep_time": "23:00", "study_hours_preference": '["morning", "afternoon"]',
+     "fixed_breaks": "[]", "hobby_name": "Guitar", "neto_study_hours": 4.0,
+     "peak_productivity": "Morning", "timezone_offset": -180},
+    {"wake_up_time": "09:30", "sleep_time": "01:30", "study_hours_preference": '["afternoon", "night"]',
+     "fixed_breaks": json.dumps([{"days": [0, 2, 4], "start": "12:00", "end": "13:30"},
+                                 {"days": [5], "start": "18:00", "end": "23:00"}]),
+     "hobby_name": None, "neto_study_hours": 6.0, "peak_productivity": "Night", "timezone_offset": 0},
+    {"wake_up_time": "06:15", "sleep_time": "22:00", "study_hours_preference": "[]",
+     "fixed_breaks": json.dumps([{"days": [0, 1, 2, 3, 4], "start": "08:00", "end": "16:00"}]),
+     "hobby_name": "Running", "neto_study_hours": 3.0, "peak_productivity": "Evening", "timezone_offset": 300},
+    {"wake_up_time": "08:00", "sleep_time": "23:30", "study_hours_preference": '["morning", "afternoon", "night"]',
+     "fixed_breaks": json.dumps([{"days": [6], "start": "10:00", "end": "14:00"}]),
+     "hobby_name": "Gym", "neto_study_hours": 8.0, "peak_productivity": "Afternoon", "timezone_offset": 120},
+]
+
+TITLES = ["Read chapter", "Practice problems", "Summary notes", "Simulation exam", "Review mistakes",
+          "סימולציה", "תחקיר", "Flashcards"]
+
+
+def make_case(n_tasks: int, seed: int) -> tuple[dict, list[dict], list[dict]]:
+    """Synthetic (user, exams, tasks) shaped like auditor + strategist output."""
+    rng = random.Random(seed)
+    user = dict(USER_PROFILES[seed % len(USER_PROFILES)], id=1, name="Bench", email=f"bench{seed}@example.com")
+    today = datetime.now(timezone.utc).replace(hour=9, minute=0, second=0, microsecond=0)
+
+    n_exams = max(1, min(6, n_tasks // 60))
+    horizon_days = min(120, 14 + n_tasks // 10)
+    exams = []
+    for i in range(n_exams):
+        exam_day = today + timedelta(days=rng.randint(horizon_days // 3, horizon_days))
+        exams.append({"id": i + 1, "name": f"Exam {i + 1}", "subject": f"Subject {i + 1}",
+                      "exam_date": exam_day.strftime("%Y-%m-%dT%H:%M:%SZ"), "status": "upcoming"})
+
+    tasks = []
+    for i in range(n_tasks):
+        exam = exams[i % n_exams]
+        exam_day = datetime.fromisoformat(exam["exam_date"].replace("Z", "+00:00"))
+        day = today + timedelta(days=rng.randint(-3, max(0, (exam_day - today).days - 1)))
+        tasks.append({
+            "id": i + 1,
+            "exam_id": exam["id"],
+            "exam_name": exam["name"],
+            "title": f"{rng.choice(TITLES)} {i + 1}",
+            "subject": exam["subject"],
+            "estimated_hours": rng.choice([0.5, 0.75, 1.0, 1.5, 2.0, 3.0]),
+            "day_date": day.strftime("%Y-%m-%d"),
+            "sort_order": i,
+            "focus_score": rng.randint(1, 10),
+            "difficulty": rng.randint(1, 5),
+            "is_padding": 1 if rng.random() < 0.05 else 0,
+            "status": "pending",
+        })
+    return user, exams, tasks
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def measure(fn, repeat: int, warmup: int = 1) -> dict:
+    """Time `fn` `repeat` times; a separate traced run records peak allocations."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50_ms": round(_percentile(samples, 50), 3),
+        "p95_ms": round(_percentile(samples, 95), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "peak_alloc_kb": round(peak / 1024, 1),
+        "runs": repeat,
+    }
+
+
+def bench_enforcer(sizes: list[int], repeat: int) -> dict:
+    results = {}
+    for n in sizes:
+        for profile in range(len(USER_PROFILES)):
+            user, exams, tasks = make_case(n, seed=profile)
+            results[f"enforcer/n={n}/profile={profile}"] = measure(
+                lambda: generate_multi_exam_schedule(user, exams, tasks, start_buffer_hours=0.0), repeat
+            )
+    return results
+
+
+def _seed_db(db, user: dict, exams: list[dict], tasks: list[dict]) -> int:
+    cur = db.execute(
+        """INSERT INTO users (name, email, wake_up_time, sleep_time, study_hours_preference,
+               fixed_breaks, hobby_name, neto_study_hours, peak_productivity, timezone_offset)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (user["name"], user["email"], user["wake_up_time"], user["sleep_time"],
+         user["study_hours_preference"], user["fixed_breaks"], user["hobby_name"],
+         user["neto_study_hours"], user["peak_productivity"], user["timezone_offset"]),
+    )
+    user_id = cur.lastrowid
+    exam_ids = {}
+    for e in exams:
+        exam_ids[e["id"]] = db.execute(
+            "INSERT INTO exams (user_id, name, subject, exam_date) VALUES (?, ?, ?, ?)",
+            (user_id, e["name"], e["subject"], e["exam_date"]),
+        ).lastrowid
+    db.executemany(
+        """INSERT INTO tasks (user_id, exam_id, title, subject, day_date, sort_order,
+               estimated_hours, difficulty, focus_score, is_padding)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        [(user_id, exam_ids[t["exam_id"]], t["title"], t["subject"], t["day_date"], t["sort_order"],
+          t["estimated_hours"], t["difficulty"], t["focus_score"], t["is_padding"]) for t in tasks],
+    )
+    db.commit()
+    return user_id
+
+
+def bench_regenerate(sizes: list[int], repeat: int) -> dict:
+    """Time internal_regenerate_schedule against a throwaway SQLite file."""
+    import server.database as database
+    from brain.routes import internal_regenerate_schedule
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        original_path = database.DB_PATH
+        database.DB_PATH = os.path.join(tmp, "bench.db")
+        try:
+            database.init_db()
+            for n in sizes:
+                user, exams, tasks = make_case(n, seed=n)
+                db = database.get_db()
+                try:
+                    user_id = _seed_db(db, user, exams, tasks)
+                    current_user = dict(db.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone())
+                    results[f"regenerate/full/n={n}"] = measure(
+                        lambda: internal_regenerate_schedule(user_id, current_user, db, incremental=False), repeat
+                    )
+                    # Steady state: nothing changed since the previous run, so the diff writes nothing.
+                    changes = db.total_changes
+                    results[f"regenerate/diff/n={n}"] = measure(
+                        lambda: internal_regenerate_schedule(user_id, current_user, db), repeat
+                    )
+                    if db.total_changes != changes:
+                        raise RuntimeError(
+                            f"regenerate/diff/n={n} wrote {db.total_changes - changes} rows with nothing changed"
+                        )
+                finally:
+                    db.close()
+        finally:
+            database.close_pool()
+            database.DB_PATH = original_path
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for case, base in baseline.get("results", {}).items():
+        current = results.get(case)
+        if current is None:
+            continue
+        limit = base["p50_ms"] * (1 + tolerance)
+        if current["p50_ms"] > limit:
+            regressions.append(
+                f"{case}: p50 {current['p50_ms']:.2f}ms > baseline {base['p50_ms']:.2f}ms (+{tolerance:.0%} allowed)"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma separated task counts (default {DEFAULT_SIZES})")
+    parser.add_argument("--repeat", type=int, default=15, help="timed runs per case (default 15)")
+    parser.add_argument("--no-db", action="store_true", help="skip the internal_regenerate_schedule cases")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON path")
+    parser.add_argument("--write-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown vs baseline (default 0.25)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = bench_enforcer(sizes, args.repeat)
+    if not args.no_db:
+        results.update(bench_regenerate(sizes, args.repeat))
+
+    print(f"{'case':<40} {'p50 ms':>10} {'p95 ms':>10} {'peak KB':>10}")
+    for case, r in results.items():
+        print(f"{case:<40} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['peak_alloc_kb']:>10.1f}")
+
+    if args.write_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"recorded_at": datetime.now(timezone.utc).isoformat(), "results": results}, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --write-baseline to record one.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
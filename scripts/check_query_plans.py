@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""CLI for the query-plan check; the check itself lives in test_query_plans.py.
+
+Usage (from the project root):
+    python scripts/check_query_plans.py [--verbose]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_query_plans import main  # noqa: E402
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from brain.strategist import assign_days  # noqa: E402
+
+NOW = datetime(2026, 3, 2, 8, 0)
+USER = {"neto_study_hours": 4.0, "sleep_time": "23:00", "buffer_days": 0}
+
+
+def _exam(exam_id, days_ahead):
+    return {"id": exam_id, "exam_date": (NOW + timedelta(days=days_ahead)).strftime("%Y-%m-%dT09:00:00Z")}
+
+
+def _tasks(n, exam_id=1, hours=1.0, start=0, **extra):
+    return [dict({"task_index": start + i, "title": f"Task {start + i}", "exam_id": exam_id,
+                  "estimated_hours": hours}, **extra) for i in range(n)]
+
+
+def _days(result):
+    return {t["task_index"]: t["day_index"] for t in result}
+
+
+def _load(result):
+    load = defaultdict(float)
+    for t in result:
+        load[t["day_index"]] += t["estimated_hours"]
+    return load
+
+
+def test_buffer_days_cut_off():
+    user = dict(USER, buffer_days=2)
+    result = assign_days(_tasks(60, hours=2.0), [_exam(1, 10)], user, NOW)
+    assert max(t["day_index"] for t in result) <= 10 - 2 - 1
+
+
+def test_dependent_never_before_prerequisite():
+    tasks = _tasks(30, hours=1.5)
+    for t in tasks[1:]:
+        t["dependency_id"] = t["task_index"] - 3 if t["task_index"] >= 3 else None
+    tasks[5]["topic"] = "Simulation"
+    tasks[6]["dependency_id"] = 5
+    tasks[2]["dependency_id"] = 29
+    days = _days(assign_days(tasks, [_exam(1, 12)], USER, NOW))
+    for t in tasks:
+        if t.get("dependency_id") is not None:
+            assert days[t["task_index"]] >= days[t["dependency_id"]], t
+
+
+def test_simulation_late_and_review_early():
+    tasks = _tasks(12)
+    tasks[0]["topic"] = "Simulation"
+    tasks[-1]["topic"] = "review"
+    days = _days(assign_days(tasks, [_exam(1, 10)], USER, NOW))
+    assert days[0] == 9
+    assert days[11] == 0
+    assert max(d for i, d in days.items() if i != 0) < 9
+
+
+def test_daily_quota_and_rest_of_today():
+    late = NOW.replace(hour=21)
+    result = assign_days(_tasks(20, hours=0.5), [_exam(1, 14)], USER, late)
+    load = _load(result)
+    assert load[0] <= 2.0
+    assert all(hours <= USER["neto_study_hours"] for hours in load.values())
+    assert assign_days(_tasks(3), [_exam(1, 14)], USER, NOW.replace(hour=23, minute=30))[0]["day_index"] >= 1
+
+
+def test_earliest_exam_first():
+    later, sooner = _tasks(10, exam_id=1), _tasks(10, exam_id=2, start=10)
+    tasks = [t for pair in zip(later, sooner) for t in pair]
+    days = _days(assign_days(tasks, [_exam(1, 20), _exam(2, 8)], USER, NOW))
+    assert max(days[t["task_index"]] for t in sooner) <= min(days[t["task_index"]] for t in later)
+
+
+def test_dependency_cycle_does_not_recurse():
+    ring = _tasks(3000, hours=0.5)
+    for t in ring:
+        t["dependency_id"] = (t["task_index"] + 1) % len(ring)
+    tasks = ring + _tasks(1, start=len(ring), dependency_id=len(ring))
+    result = assign_days(tasks, [_exam(1, 30)], USER, NOW)
+    assert [t["task_index"] for t in result] == [t["task_index"] for t in tasks]
+
+
+def test_every_task_returned_once():
+    tasks = _tasks(25, exam_id=1) + _tasks(15, exam_id=2, start=25) + _tasks(5, exam_id=99, start=40)
+    tasks[3]["topic"] = "simulation"
+    tasks[30]["dependency_id"] = 4
+    result = assign_days(tasks, [_exam(1, 9), _exam(2, 16)], USER, NOW)
+    assert [t["task_index"] for t in result] == [t["task_index"] for t in tasks]
+    assert all(0 <= t["day_index"] < 16 and 1 <= t["internal_priority"] <= 100 for t in result)
+    assert not any(t["is_padding"] for t in result)
+    assert all("day_index" not in t for t in tasks)
+    assert assign_days([], [_exam(1, 9)], USER, NOW) == []
+
+
+if __name__ == "__main__":
+    test_buffer_days_cut_off()
+    test_dependent_never_before_prerequisite()
+    test_simulation_late_and_review_early()
+    test_daily_quota_and_rest_of_today()
+    test_earliest_exam_first()
+    test_dependency_cycle_does_not_recurse()
+    test_every_task_returned_once()
+    print("strategist checks passed")
@@ -0,0 +1,107 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from brain.context_packer import (  # noqa: E402
+    OMITTED_MARKER, PAGE_BREAK, estimate_tokens, pack_files, split_budget, strip_boilerplate,
+)
+
+
+def _page(n, body):
+    return f"Calculus I — Spring 2025\n{body}\nLecture 3 — page {n}"
+
+
+def test_numbered_exercises_survive():
+    pages = [
+        _page(n, f"Exercise {n}\nCompute the derivative of f(x) = x^{p} + 3x.\nSolution:\nf'(x) = {p}x^{p - 1} + 3")
+        for n, p in ((1, 2), (2, 5), (3, 3))
+    ]
+    text = strip_boilerplate(PAGE_BREAK.join(pages))
+
+    for n, p in ((1, 2), (2, 5), (3, 3)):
+        assert f"Exercise {n}" in text
+        assert f"Compute the derivative of f(x) = x^{p} + 3x." in text
+    assert text.count("Solution:") == 3
+    assert "Calculus I — Spring 2025" not in text
+    assert "page" not in text
+
+
+def test_repeated_body_lines_survive():
+    pages = [
+        _page(n, f"Part {n}: limits.\nQuestion 1\nProve it.\nQuestion 2\nProve it.\nEnd of part {n}.")
+        for n in range(1, 4)
+    ]
+    text = strip_boilerplate(PAGE_BREAK.join(pages))
+
+    assert text.count("Prove it.") == 6
+    assert text.count("Question 1") == 3
+    assert "End of part 3." in text
+
+
+def test_page_number_lines_dropped():
+    topics = ("limits", "derivatives", "integrals")
+    pages = [f"{n}\nSome material on {t}, see page {n}.\nMore on {t}.\n12 | Calculus I\nSlide {n} of 3"
+             for n, t in enumerate(topics, 1)]
+    text = strip_boilerplate(PAGE_BREAK.join(pages))
+
+    assert text.splitlines()[0] == "Some material on limits, see page 1."
+    assert "Slide" not in text
+    assert "Calculus I" not in text
+
+
+def _lecture(n_paragraphs, topic_every=7):
+    paragraphs = []
+    for i in range(n_paragraphs):
+        topic = " Fourier transform convolution theorem." if i % topic_every == 0 else ""
+        paragraphs.append(f"Paragraph {i} on signal processing, sampling and filtering number {i * 31}.{topic} " * 6)
+    return "\n\n".join(paragraphs)
+
+
+def _files():
+    return [
+        {"file_type": "lecture", "filename": "lectures.pdf", "extracted_text": _lecture(300)},
+        {"file_type": "syllabus", "filename": "syllabus.pdf",
+         "extracted_text": "Syllabus: Fourier transform, convolution theorem, sampling."},
+        {"file_type": "past_exam", "filename": "exam2023.pdf", "extracted_text": _lecture(80, topic_every=3)},
+    ]
+
+
+def test_pack_files_stays_within_budget():
+    topics = {"fourier", "transform", "convolution", "theorem", "sampling"}
+    for budget in (500, 2000, 8000):
+        packed = pack_files(_files(), topics, budget)
+        assert estimate_tokens(packed) <= budget, (budget, estimate_tokens(packed))
+
+
+def test_pack_files_marks_omitted_material_and_puts_syllabus_first():
+    packed = pack_files(_files(), {"fourier", "convolution"}, 2000)
+    assert packed.startswith("[SYLLABUS: syllabus.pdf]\nSyllabus: Fourier transform")
+    assert OMITTED_MARKER in packed
+    assert "[LECTURE: lectures.pdf]" in packed
+
+
+def test_pack_files_keeps_everything_that_fits():
+    files = [{"file_type": "lecture", "filename": "a.pdf", "extracted_text": "Short notes on limits."}]
+    packed = pack_files(files, set(), 1000)
+    assert packed == "[LECTURE: a.pdf]\nShort notes on limits."
+    assert OMITTED_MARKER not in packed
+
+
+def test_split_budget():
+    assert split_budget([100, 5000, 200], 3000) == [100, 2700, 200]
+    assert split_budget([5000, 5000], 3000) == [1500, 1500]
+    assert split_budget([100, 200], 3000) == [100, 200]
+    assert sum(split_budget([900, 4000, 7000, 50], 6000)) == 6000
+    assert split_budget([], 3000) == []
+
+
+if __name__ == "__main__":
+    test_numbered_exercises_survive()
+    test_repeated_body_lines_survive()
+    test_page_number_lines_dropped()
+    test_pack_files_stays_within_budget()
+    test_pack_files_marks_omitted_material_and_puts_syllabus_first()
+    test_pack_files_keeps_everything_that_fits()
+    test_split_budget()
+    print("context packer checks passed")
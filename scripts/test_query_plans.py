@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""Query-plan regression test: no SQL statement in the backend scans a whole table.
+
+Collects every SELECT / INSERT / UPDATE / DELETE / WITH string literal from the
+backend's Python modules, runs EXPLAIN QUERY PLAN for each against a throwaway
+database built by init_db() and seeded with a few users' worth of exams, tasks
+and schedule blocks, and reports every plan step that scans a whole table
+("SCAN tasks" rather than "SEARCH tasks USING INDEX ...").
+
+f-string holes are filled with `?` (the `IN ({placeholders})` pattern), an
+empty string (optional `{user_filter}` clauses) or `id = ?` (dynamic SET
+lists), whichever first gives a statement SQLite can prepare.
+
+Usage (from the project root):
+    python -m pytest scripts/test_query_plans.py
+    python scripts/test_query_plans.py              # same check, with a report
+    python scripts/test_query_plans.py --verbose    # also print every plan
+
+Fails on any full scan not listed in ALLOWED_SCANS and on any statement that
+cannot be prepared and is not listed in ALLOWED_SKIPS.
+"""
+
+import argparse
+import ast
+import itertools
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(PROJECT_DIR, "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+# Not request-path code: schema setup and offline tooling.
+EXCLUDED = {"server/database.py", "server/migrations.py", "test_strategist.py", "eval"}
+
+SQL_START = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|REPLACE)\b")
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+BINDINGS = re.compile(r"uses (\d+), and there are")
+
+# (file, table scanned, start of the normalised statement) -> why the scan is fine.
+# Empty today; add an entry only for a scan that is cheaper than an index.
+ALLOWED_SCANS: dict[tuple[str, str, str], str] = {}
+
+# (file, start of the normalised statement, `?` for holes) -> why it can't be checked.
+ALLOWED_SKIPS = {
+    ("brain/persistence.py", "INSERT INTO schedule_blocks (user_id, ?, push_notified) VALUES (?)"):
+        "column list built from BLOCK_COLUMNS; INSERT ... VALUES reads no table",
+    ("brain/persistence.py", "INSERT INTO tasks (user_id, ?) VALUES (?)"):
+        "column list built from TASK_COLUMNS; INSERT ... VALUES reads no table",
+}
+
+HOLE_FILLERS = ("?", "", "id = ?")
+MAX_HOLES = 4
+
+
+def _normalise(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def _literal_sql(node) -> list[str] | None:
+    """Candidate SQL texts of a str / f-string node (one per way of filling
+    its holes, see HOLE_FILLERS), or None if it isn't SQL."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        variants = [node.value]
+    elif isinstance(node, ast.JoinedStr):
+        parts = [v.value if isinstance(v, ast.Constant) else None for v in node.values]
+        holes = parts.count(None)
+        fillings = itertools.product(HOLE_FILLERS, repeat=holes) if holes <= MAX_HOLES else [("?",) * holes]
+        variants = []
+        for filling in fillings:
+            fill = iter(filling)
+            variants.append("".join(p if p is not None else next(fill) for p in parts))
+    else:
+        return None
+    return variants if SQL_START.match(variants[0]) else None
+
+
+def collect_statements() -> list[tuple[str, int, list[str]]]:
+    """(relative path, line, candidate sql texts) for every SQL literal in the backend."""
+    statements = []
+    for root, dirs, files in os.walk(BACKEND_DIR):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for name in sorted(files):
+            if not name.endswith(".py"):
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, BACKEND_DIR).replace(os.sep, "/")
+            if rel in EXCLUDED or rel.split("/")[0] in EXCLUDED:
+                continue
+            with open(path, encoding="utf-8") as f:
+                tree = ast.parse(f.read(), filename=rel)
+            # The literal pieces of an f-string are checked as part of the f-string.
+            pieces = {id(v) for n in ast.walk(tree) if isinstance(n, ast.JoinedStr) for v in n.values}
+            for node in ast.walk(tree):
+                if id(node) in pieces:
+                    continue
+                variants = _literal_sql(node)
+                if variants is not None:
+                    statements.append((rel, node.lineno, variants))
+    return statements
+
+
+def seed(db):
+    """A few users with exams, tasks, blocks and push subscriptions."""
+    for u in range(1, 6):
+        db.execute("INSERT INTO users (id, name, email, auth_token) VALUES (?, ?, ?, ?)",
+                   (u, f"user{u}", f"user{u}@example.com", f"token{u}"))
+        db.execute("INSERT INTO push_subscriptions (user_id, endpoint, p256dh, auth) VALUES (?, ?, 'k', 'a')",
+                   (u, f"https://push.example.com/{u}"))
+        for e in range(3):
+            exam_id = db.execute(
+                "INSERT INTO exams (user_id, name, subject, exam_date) VALUES (?, ?, ?, ?)",
+                (u, f"Exam {e}", f"Subject {e}", f"2099-0{e + 1}-15"),
+            ).lastrowid
+            for t in range(20):
+                day = f"2099-01-{t % 28 + 1:02d}"
+                task_id = db.execute(
+                    """INSERT INTO tasks (user_id, exam_id, title, day_date, sort_order, status)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (u, exam_id, f"Task {t}", day, t, "done" if t % 4 == 0 else "pending"),
+                ).lastrowid
+                db.execute(
+                    """INSERT INTO schedule_blocks (user_id, task_id, exam_id, start_time, end_time, day_date)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (u, task_id, exam_id, f"{day}T10:00:00", f"{day}T11:00:00", day),
+                )
+    db.commit()
+
+
+def explain(db, sql: str) -> list[str] | None:
+    """The plan steps of `sql` (every parameter bound to NULL), or None if it can't be prepared."""
+    params = ()
+    for _ in range(2):
+        try:
+            return [row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        except sqlite3.ProgrammingError as e:
+            match = BINDINGS.search(str(e))
+            if not match:
+                return None
+            params = (None,) * int(match.group(1))
+        except sqlite3.Error:
+            return None
+    return None
+
+
+def _allowed(rel: str, table: str, sql: str) -> bool:
+    normalised = _normalise(sql)
+    return any(
+        rel == a_rel and table == a_table and normalised.startswith(a_sql)
+        for a_rel, a_table, a_sql in ALLOWED_SCANS
+    )
+
+
+def _skip_reason(rel: str, sql: str) -> str | None:
+    normalised = _normalise(sql)
+    return next(
+        (reason for (a_rel, a_sql), reason in ALLOWED_SKIPS.items() if rel == a_rel and normalised.startswith(a_sql)),
+        None,
+    )
+
+
+def check_plans(verbose: bool = False) -> dict:
+    """Explain every backend statement against a seeded throwaway database.
+
+    Returns {"checked": n, "scans": [...], "skipped": [...], "unexpected_skips": [...]},
+    each list entry a printable "file:line  ..." line.
+    """
+    import server.database as database
+
+    report = {"checked": 0, "scans": [], "skipped": [], "unexpected_skips": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        original_path = database.DB_PATH
+        database.DB_PATH = os.path.join(tmp, "plans.db")
+        try:
+            database.init_db()
+            db = database.get_db()
+            try:
+                # No ANALYZE: the app never runs it, so production plans come
+                # from SQLite's default estimates, as here.
+                seed(db)
+                for rel, line, variants in collect_statements():
+                    sql, plan = next(
+                        ((v, p) for v in variants if (p := explain(db, v)) is not None), (variants[0], None)
+                    )
+                    where = f"{rel}:{line}  {_normalise(sql)[:80]}"
+                    if plan is None:
+                        reason = _skip_reason(rel, sql)
+                        report["skipped"].append(f"{where}  ({reason or 'NOT ALLOWED'})")
+                        if reason is None:
+                            report["unexpected_skips"].append(where)
+                        continue
+                    report["checked"] += 1
+                    if verbose:
+                        print(f"{rel}:{line}  {_normalise(sql)[:100]}")
+                        for step in plan:
+                            print(f"    {step}")
+                    for table in (m.group(1) for m in map(FULL_SCAN.match, plan) if m):
+                        if not _allowed(rel, table, sql):
+                            report["scans"].append(f"{rel}:{line}  SCAN {table}  {_normalise(sql)[:80]}")
+            finally:
+                db.close()
+        finally:
+            database.close_pool()
+            database.DB_PATH = original_path
+    return report
+
+
+def test_no_unexpected_full_scans():
+    report = check_plans()
+    assert not report["scans"], "full table scans:\n" + "\n".join(report["scans"])
+    assert not report["unexpected_skips"], (
+        "statements that could not be checked (add to ALLOWED_SKIPS with a reason, or make them "
+        "preparable):\n" + "\n".join(report["unexpected_skips"])
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--verbose", action="store_true", help="print the plan of every statement")
+    args = parser.parse_args()
+
+    report = check_plans(verbose=args.verbose)
+    print(f"Checked {report['checked']} statements, skipped {len(report['skipped'])}.")
+    if report["skipped"]:
+        print("\nSKIPPED (could not be prepared):")
+        for line in report["skipped"]:
+            print(f"  {line}")
+    if report["scans"]:
+        print("\nFULL TABLE SCANS:")
+        for line in report["scans"]:
+            print(f"  {line}")
+    if report["scans"] or report["unexpected_skips"]:
+        return 1
+    print("\nNo unexpected full table scans or skips.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
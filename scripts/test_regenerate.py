@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(SCRIPTS_DIR), "backend"))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from bench_scheduler import _seed_db, make_case  # noqa: E402
+
+
+def _with_seeded_user(check, n_tasks=200):
+    """Run check(db, user_id, current_user, regenerate) against a throwaway database."""
+    import server.database as database
+    from brain.routes import internal_regenerate_schedule
+
+    with tempfile.TemporaryDirectory() as tmp:
+        original_path = database.DB_PATH
+        database.DB_PATH = os.path.join(tmp, "regenerate.db")
+        try:
+            database.init_db()
+            db = database.get_db()
+            try:
+                user, exams, tasks = make_case(n_tasks, seed=n_tasks)
+                user_id = _seed_db(db, user, exams, tasks)
+                current_user = dict(db.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone())
+                check(db, user_id, lambda: internal_regenerate_schedule(user_id, current_user, db))
+            finally:
+                db.close()
+        finally:
+            database.close_pool()
+            database.DB_PATH = original_path
+
+
+def test_unchanged_regeneration_writes_nothing():
+    def check(db, user_id, regenerate):
+        regenerate()
+        blocks = db.execute("SELECT * FROM schedule_blocks WHERE user_id = ? ORDER BY id", (user_id,)).fetchall()
+        before = db.total_changes
+        regenerate()
+        regenerate()
+        assert db.total_changes == before, f"{db.total_changes - before} rows written with nothing changed"
+        after = db.execute("SELECT * FROM schedule_blocks WHERE user_id = ? ORDER BY id", (user_id,)).fetchall()
+        assert [tuple(r) for r in after] == [tuple(r) for r in blocks]
+
+    _with_seeded_user(check)
+
+
+def test_moved_task_is_planned_on_its_new_day():
+    def check(db, user_id, regenerate):
+        regenerate()
+        task = db.execute(
+            "SELECT id, day_date FROM tasks WHERE user_id = ? AND day_date IS NOT NULL ORDER BY id LIMIT 1", (user_id,)
+        ).fetchone()
+        db.execute("UPDATE tasks SET day_date = '2000-01-01' WHERE id = ?", (task["id"],))
+        db.commit()
+        regenerate()
+        planned = db.execute("SELECT planned_day FROM tasks WHERE id = ?", (task["id"],)).fetchone()["planned_day"]
+        assert planned == "2000-01-01"
+
+    _with_seeded_user(check, n_tasks=50)
+
+
+if __name__ == "__main__":
+    test_unchanged_regeneration_writes_nothing()
+    test_moved_task_is_planned_on_its_new_day()
+    print("regeneration checks passed")